@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+from datetime import datetime
+
+from container_fields import DATE_FORMAT, EXCEL_FILE, FIELDS, load_settings, parse_date, save_settings, sheet_layout
+from fill_index import file_stamp
+from sheet_stream import is_header_row, iter_field_rows, open_workbook_stream
+from workbook_meta import visible_sheet_names
+
+ARCHIVE_DIR = 'archive'
+INDEX_FILE = 'index.json'
+# Workbook lưu trữ: mỗi sheet có dòng tiêu đề FIELDS ở dòng 1, dữ liệu từ dòng 2 cột A (không có STT)
+ARCHIVE_SETTINGS = {'sheets': {}}
+# Số dòng đầu sheet được dò để tìm dòng tiêu đề
+HEADER_SCAN_ROWS = 50
+
+
+def default_cutoff(months_to_keep, today=None):
+    # Ngày đầu của tháng cách đây months_to_keep tháng: dòng có NGÀY LẤY trước ngày này được lưu trữ
+    today = today or datetime.now()
+    month = today.year * 12 + today.month - 1 - months_to_keep
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+class ArchiveIndex:
+    # Chỉ mục phân vùng archive/index.json: {tháng 'YYYY-MM': {'file', 'stamp', 'sheets': {sheet: số dòng}}}
+    def __init__(self, root=ARCHIVE_DIR, workbook=EXCEL_FILE):
+        self.root = root
+        self.base = os.path.splitext(os.path.basename(workbook))[0]
+        self.path = os.path.join(root, INDEX_FILE)
+        self.months = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.months = json.load(f).get('months', {})
+        except (OSError, ValueError):
+            self.months = {}
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'months': self.months}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def file_path(self, month):
+        return os.path.join(self.root, f'{self.base}_{month}.xlsx')
+
+    def months_between(self, date_from=None, date_to=None):
+        # Các tháng đã lưu trữ giao với khoảng ngày (None = không giới hạn)
+        lo = date_from.strftime('%Y-%m') if date_from else None
+        hi = date_to.strftime('%Y-%m') if date_to else None
+        return [m for m in sorted(self.months) if (lo is None or m >= lo) and (hi is None or m <= hi)]
+
+    def iter_rows(self, month, sheet_names=None):
+        # Đọc tuần tự đúng một workbook lưu trữ: (sheet, dòng, [giá trị theo FIELDS])
+        entry = self.months.get(month)
+        if entry is None:
+            return
+        wb = open_workbook_stream(self.file_path(month))
+        try:
+            for sheet_name in entry['sheets']:
+                if sheet_names and sheet_name not in sheet_names:
+                    continue
+                for row, values in iter_field_rows(wb, sheet_name, ARCHIVE_SETTINGS):
+                    yield sheet_name, row, values
+        finally:
+            wb.close()
+
+    def read_rows(self, month, sheet_name):
+        return [values for _, _, values in self.iter_rows(month, [sheet_name])]
+
+    def write_month(self, month, rows_by_sheet):
+        # Thêm các dòng vào workbook của tháng (tạo mới nếu chưa có), lưu qua file tạm
+        from openpyxl import Workbook, load_workbook
+        path = self.file_path(month)
+        os.makedirs(self.root, exist_ok=True)
+        if os.path.exists(path):
+            wb = load_workbook(path)
+        else:
+            wb = Workbook()
+            wb.remove(wb.active)
+        entry = self.months.setdefault(month, {'file': os.path.basename(path), 'sheets': {}})
+        for sheet_name, rows in rows_by_sheet.items():
+            if sheet_name in wb.sheetnames:
+                ws = wb[sheet_name]
+            else:
+                ws = wb.create_sheet(sheet_name)
+                ws.append(FIELDS)
+            for values in rows:
+                ws.append(list(values))
+            entry['sheets'][sheet_name] = ws.max_row - 1
+        tmp_path = path + '.tmp'
+        wb.save(tmp_path)
+        os.replace(tmp_path, path)
+        entry['stamp'] = file_stamp(path)
+
+
+def find_data_row(excel_mgr, sheet_name, start_col, end):
+    # Dòng dữ liệu đầu tiên: ngay sau dòng tiêu đề cuối cùng ở đầu sheet, hoặc dòng có dữ liệu đầu tiên
+    # nếu sheet không có tiêu đề. Không dựa vào start_row vì start_row chỉ là chỗ bắt đầu dò dòng trống.
+    nrows = min(end - 1, HEADER_SCAN_ROWS)
+    if nrows <= 0:
+        return 1
+    block = excel_mgr.read_rows(sheet_name, 1, start_col, nrows, len(FIELDS))
+    header_rows = [r for r, values in enumerate(block, start=1) if is_header_row(values)]
+    if header_rows:
+        return header_rows[-1] + 1
+    for r, values in enumerate(block, start=1):
+        if any(v not in (None, '') for v in values):
+            return r
+    return 1
+
+
+def split_sheet(excel_mgr, settings, sheet_name, cutoff):
+    # Một lần đọc cả vùng dữ liệu; trả về (dòng đầu, số dòng đã đọc, {tháng: [dòng cũ]}, [dòng giữ lại])
+    start_row, start_col, stt_offset = sheet_layout(settings, sheet_name)
+    excel_mgr.get_last_empty_row(sheet_name, start_row, start_col, len(FIELDS))  # bảo đảm đã có chỉ mục
+    end = excel_mgr.fill_index.get(sheet_name, start_col).end
+    first_row = find_data_row(excel_mgr, sheet_name, start_col, end)
+    nrows = end - first_row
+    if nrows <= 0:
+        return first_row, 0, {}, []
+    block = excel_mgr.read_rows(sheet_name, first_row, start_col - stt_offset, nrows, len(FIELDS) + stt_offset)
+    old, keep = {}, []
+    for line in block:
+        values = list(line[stt_offset:])
+        if all(v in (None, '') for v in values):
+            continue  # dòng trống giữa bảng bị dồn lại
+        date = parse_date(values[0])
+        if date is not None and date < cutoff:
+            old.setdefault(date.strftime('%Y-%m'), []).append(values)
+        else:
+            keep.append(values)
+    return first_row, nrows, old, keep
+
+
+def archive_before(excel_mgr, settings, sheet_names, cutoff, index):
+    # Chuyển các dòng có NGÀY LẤY < cutoff sang workbook lưu trữ theo tháng rồi dồn lại từng sheet
+    # (một lần đọc + một lần ghi mỗi sheet, đánh lại STT). Workbook lưu trữ được lưu trước khi xoá
+    # khỏi file đang dùng nên nếu dừng giữa chừng dữ liệu không bị mất.
+    # Trả về {sheet: {'archived', 'kept', 'start_row'}} để người gọi cập nhật settings.json
+    plans = {}
+    by_month = {}
+    for sheet_name in sheet_names:
+        first_row, nrows, old, keep = split_sheet(excel_mgr, settings, sheet_name, cutoff)
+        if not old:
+            continue
+        plans[sheet_name] = (first_row, nrows, keep)
+        for month, rows in old.items():
+            by_month.setdefault(month, {})[sheet_name] = rows
+    for month, rows_by_sheet in sorted(by_month.items()):
+        index.write_month(month, rows_by_sheet)
+    index.save()
+    result = {}
+    for sheet_name, (first_row, nrows, keep) in plans.items():
+        start_row, start_col, stt_offset = sheet_layout(settings, sheet_name)
+        width = len(FIELDS) + stt_offset
+        block = [([str(i + 1)] if stt_offset else []) + values for i, values in enumerate(keep)]
+        block += [[None] * width for _ in range(nrows - len(keep))]
+        excel_mgr.write_rows(sheet_name, first_row, start_col - stt_offset, block)
+        archived = sum(len(rows.get(sheet_name, [])) for rows in by_month.values())
+        result[sheet_name] = {
+            'archived': archived,
+            'kept': len(keep),
+            'start_row': min(start_row, first_row + len(keep)),
+        }
+    if result:
+        excel_mgr.save()
+    return result
+
+
+def apply_result(settings, result):
+    # Kéo start_row về cuối vùng dữ liệu đã dồn; first_row cũ (nếu có) không còn được dùng
+    for sheet_name, info in result.items():
+        s = settings.setdefault('sheets', {}).setdefault(sheet_name, {'start_row': 2, 'start_col': 1})
+        s.pop('first_row', None)
+        s['start_row'] = info['start_row']
+
+
+def describe_result(result, cutoff):
+    if not result:
+        return f'Không có dòng nào trước ngày {cutoff.strftime(DATE_FORMAT)} cần lưu trữ.'
+    lines = [f'Đã lưu trữ các dòng trước ngày {cutoff.strftime(DATE_FORMAT)}:']
+    for sheet_name, info in result.items():
+        lines.append(f'- {sheet_name}: chuyển {info["archived"]} dòng, còn lại {info["kept"]} dòng')
+    return '\n'.join(lines)
+
+
+def main():
+    from excel_manager import ExcelManager
+    parser = argparse.ArgumentParser(description='Chuyển dữ liệu cũ sang workbook lưu trữ theo tháng (đóng tool nhập liệu trước khi chạy)')
+    parser.add_argument('--before', help='Ngày mốc dd/mm/yyyy; mặc định giữ lại số tháng trong settings "archive"')
+    parser.add_argument('--workbook', default=EXCEL_FILE)
+    args = parser.parse_args()
+    settings = load_settings()
+    if args.before:
+        cutoff = parse_date(args.before)
+        if cutoff is None:
+            parser.error('Ngày không hợp lệ, nhập theo dạng dd/mm/yyyy')
+    else:
+        cutoff = default_cutoff(settings.get('archive', {}).get('months_to_keep', 6))
+    index = ArchiveIndex(settings.get('archive', {}).get('dir', ARCHIVE_DIR), args.workbook)
+    sheet_names = visible_sheet_names(args.workbook)
+    excel_mgr = ExcelManager(args.workbook, backend=settings.get('backend', 'xlwings'))
+    try:
+        result = archive_before(excel_mgr, settings, sheet_names, cutoff, index)
+    finally:
+        excel_mgr.close()
+    apply_result(settings, result)
+    save_settings(settings)
+    print(describe_result(result, cutoff))
+
+
+if __name__ == '__main__':
+    main()
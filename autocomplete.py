@@ -0,0 +1,237 @@
+import bisect
+import heapq
+import json
+import os
+import threading
+import tkinter as tk
+
+from container_fields import FIELDS, cell_to_str, fold_text, sheet_layout
+
+AUTOCOMPLETE_FIELDS = ('BK No', 'SEAL', 'NƠI LẤY CONT', 'NƠI HẠ CONT')
+MAX_SCAN = 500  # số khoá tối đa duyệt cho một tiền tố trước khi xếp hạng
+
+_FIELD_POS = {field: FIELDS.index(field) for field in AUTOCOMPLETE_FIELDS}
+_FIRST_POS = min(_FIELD_POS.values())
+_WIDTH = max(_FIELD_POS.values()) - _FIRST_POS + 1
+_HEADERS = {field: fold_text(field) for field in AUTOCOMPLETE_FIELDS}
+
+
+class PrefixIndex:
+    # Mảng đã sắp xếp [(khoá bỏ dấu, giá trị)] để tìm theo tiền tố bằng bisect; counts dùng để xếp hạng
+    def __init__(self, keys=None, counts=None):
+        self.keys = keys or []
+        self.counts = counts or {}
+
+    def add(self, value, n=1):
+        if value in self.counts:
+            self.counts[value] += n
+            return
+        self.counts[value] = n
+        bisect.insort(self.keys, (fold_text(value), value))
+
+    def remove(self, value):
+        count = self.counts.get(value)
+        if count is None:
+            return
+        if count > 1:
+            self.counts[value] = count - 1
+            return
+        del self.counts[value]
+        key = (fold_text(value), value)
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+
+    def suggest(self, text, limit=8):
+        prefix = fold_text(text)
+        if not prefix:
+            return []
+        i = bisect.bisect_left(self.keys, (prefix,))
+        matches = []
+        for folded, value in self.keys[i:i + MAX_SCAN]:
+            if not folded.startswith(prefix):
+                break
+            matches.append(value)
+        # Giá trị dùng nhiều hơn đứng trước
+        return heapq.nsmallest(limit, matches, key=lambda v: (-self.counts[v], v))
+
+
+class AutocompleteIndex:
+    # Chỉ mục gợi ý cho các cột AUTOCOMPLETE_FIELDS trên mọi sheet, lưu cạnh file Excel
+    def __init__(self, path=None):
+        self.path = path
+        self.fields = {field: PrefixIndex() for field in AUTOCOMPLETE_FIELDS}
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+
+    def _values(self, rows):
+        # rows theo thứ tự FIELDS -> [(cột, giá trị)] bỏ ô rỗng
+        for values in rows:
+            for field, pos in _FIELD_POS.items():
+                value = cell_to_str(values[pos]) if pos < len(values) else ''
+                if value:
+                    yield field, value
+
+    def add_rows(self, rows):
+        with self.lock:
+            for field, value in self._values(rows):
+                self.fields[field].add(value)
+
+    def remove_rows(self, rows):
+        with self.lock:
+            for field, value in self._values(rows):
+                self.fields[field].remove(value)
+
+    def suggest(self, field, text, limit=8):
+        with self.lock:
+            return self.fields[field].suggest(text, limit)
+
+    def build(self, excel_mgr, settings, sheet_names):
+        # Chạy trên luồng ghi nền: một lần đọc khối (BK No .. NƠI HẠ CONT) cho mỗi sheet
+        try:
+            counts = {field: {} for field in AUTOCOMPLETE_FIELDS}
+            for sheet_name in sheet_names:
+                _, start_col, _ = sheet_layout(settings, sheet_name)
+                last_row = excel_mgr.last_row(sheet_name)
+                if not last_row:
+                    continue
+                block = excel_mgr.read_rows(sheet_name, 1, start_col + _FIRST_POS, last_row, _WIDTH)
+                rows = [[None] * _FIRST_POS + list(line) for line in block]
+                for field, value in self._values(rows):
+                    counts[field][value] = counts[field].get(value, 0) + 1
+            fields = {}
+            for field, field_counts in counts.items():
+                # Bỏ tiêu đề cột; chỉ bỏ dấu một lần cho mỗi giá trị khác nhau
+                keys = [(fold_text(value), value) for value in field_counts]
+                keys = sorted(k for k in keys if k[0] != _HEADERS[field])
+                fields[field] = PrefixIndex(keys, {v: field_counts[v] for _, v in keys})
+            with self.lock:
+                # Giữ lại các giá trị vừa nhập trong lúc đang dựng
+                for field, index in self.fields.items():
+                    for value, n in index.counts.items():
+                        if value not in fields[field].counts:
+                            fields[field].add(value, n)
+                self.fields = fields
+        finally:
+            self.ready.set()
+
+    def load(self, stamp):
+        # Dùng lại chỉ mục đã lưu nếu file Excel chưa đổi (cùng mtime/size)
+        if not self.path or stamp is None or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('stamp') != stamp:
+            return False
+        fields = {}
+        for field in AUTOCOMPLETE_FIELDS:
+            # Lưu sẵn khoá bỏ dấu theo thứ tự nên không phải sắp xếp lại khi mở
+            item = data.get('fields', {}).get(field, {'keys': [], 'values': [], 'counts': []})
+            fields[field] = PrefixIndex(list(zip(item['keys'], item['values'])), dict(zip(item['values'], item['counts'])))
+        with self.lock:
+            self.fields = fields
+        self.ready.set()
+        return True
+
+    def start_loading(self, stamp, fallback):
+        # Đọc bản lưu ở luồng riêng để không chặn giao diện; không dùng được thì gọi fallback() (dựng lại)
+        def run():
+            if not self.load(stamp):
+                fallback()
+        threading.Thread(target=run, name='autocomplete-load', daemon=True).start()
+
+    def save(self, stamp):
+        if not self.path or stamp is None or not self.ready.is_set():
+            return
+        with self.lock:
+            data = {
+                'stamp': stamp,
+                'fields': {
+                    field: {
+                        'keys': [k for k, _ in index.keys],
+                        'values': [v for _, v in index.keys],
+                        'counts': [index.counts[v] for _, v in index.keys],
+                    }
+                    for field, index in self.fields.items()
+                },
+            }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(data, ensure_ascii=False))
+        os.replace(tmp_path, self.path)
+
+
+class AutocompleteEntry(tk.Entry):
+    # Ô nhập có danh sách gợi ý bật ra bên dưới; ↑/↓ để chọn, Enter/Tab để nhận, Esc để đóng
+    def __init__(self, master, suggest, **kwargs):
+        super().__init__(master, **kwargs)
+        self.suggest = suggest
+        self.popup = None
+        self.listbox = None
+        self.bind('<KeyRelease>', self.on_key)
+        self.bind('<Down>', lambda e: self.move(1))
+        self.bind('<Up>', lambda e: self.move(-1))
+        self.bind('<Return>', self.accept)
+        self.bind('<Tab>', self.accept)
+        self.bind('<Escape>', lambda e: self.hide())
+        self.bind('<FocusOut>', lambda e: self.after(150, self.hide))
+
+    def on_key(self, event):
+        if event.keysym in ('Up', 'Down', 'Return', 'Tab', 'Escape', 'Shift_L', 'Shift_R', 'Control_L', 'Control_R'):
+            return
+        values = self.suggest(self.get())
+        if not values or values == [self.get()]:
+            self.hide()
+            return
+        self.show(values)
+
+    def show(self, values):
+        if self.popup is None:
+            self.popup = tk.Toplevel(self)
+            self.popup.wm_overrideredirect(True)
+            self.listbox = tk.Listbox(self.popup, height=8, exportselection=False)
+            self.listbox.pack(fill='both', expand=True)
+            self.listbox.bind('<ButtonRelease-1>', self.accept)
+        self.listbox.delete(0, tk.END)
+        for value in values:
+            self.listbox.insert(tk.END, value)
+        self.listbox.configure(height=len(values), width=max(int(self['width']), max(len(v) for v in values)))
+        self.popup.wm_geometry(f'+{self.winfo_rootx()}+{self.winfo_rooty() + self.winfo_height()}')
+        self.popup.deiconify()
+        self.popup.lift()
+
+    def hide(self):
+        if self.popup is not None:
+            self.popup.withdraw()
+
+    def visible(self):
+        return self.popup is not None and self.popup.winfo_viewable()
+
+    def move(self, step):
+        if not self.visible():
+            return
+        size = self.listbox.size()
+        current = self.listbox.curselection()
+        index = (current[0] + step) % size if current else (0 if step > 0 else size - 1)
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(index)
+        self.listbox.see(index)
+        return 'break'
+
+    def accept(self, event=None):
+        if not self.visible():
+            return
+        current = self.listbox.curselection()
+        if not current:
+            if event is not None and event.keysym == 'Tab':
+                self.hide()
+                return
+            current = (0,)
+        self.delete(0, tk.END)
+        self.insert(0, self.listbox.get(current[0]))
+        self.hide()
+        self.icursor(tk.END)
+        return 'break'
@@ -0,0 +1,206 @@
+import re
+import tkinter as tk
+from tkinter import messagebox, ttk
+
+from bulk_import import is_valid_container
+from container_fields import FIELDS, fold_text, format_row
+from duplicate_index import describe_duplicates
+
+_CONTAINER_POS = FIELDS.index('MÃ SỐ CONTAINER')
+_SEAL_POS = FIELDS.index('SEAL')
+_QUANTITY_POS = FIELDS.index('Số lượng')
+# Dòng dán vào không có tab/dấu phẩy: mã container (có thể có khoảng trắng) rồi đến SEAL
+_PAIR_RE = re.compile(r'^([A-Za-z]{4}\s?\d{6}\s?\d)\s*(.*)$')
+_HEADER = fold_text('MÃ SỐ CONTAINER').replace(' ', '')
+
+
+def normalize_container(text):
+    return text.replace(' ', '').upper()
+
+
+def parse_pairs(text):
+    # Mỗi dòng một cặp "container SEAL", cách nhau bởi tab (dán từ Excel), dấu phẩy/chấm phẩy hoặc khoảng trắng
+    pairs = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        parts = [part.strip() for part in re.split(r'[\t,;]', line)]
+        if len(parts) == 1:
+            match = _PAIR_RE.match(line)
+            parts = [match.group(1), match.group(2)] if match else line.split(None, 1)
+        container = normalize_container(parts[0])
+        if fold_text(container).replace(' ', '') == _HEADER:
+            continue  # dòng tiêu đề
+        pairs.append((container, parts[1] if len(parts) > 1 else ''))
+    return pairs
+
+
+def check_pairs(pairs, dup_index=None):
+    # [(loại, thông báo)] cho từng cặp: loại 'error' (sai mã, trùng trong lô) chặn việc lưu,
+    # 'duplicate' (đã có trong workbook) chỉ cần xác nhận như form nhập tay; cặp để trống trả về ('', '')
+    seen = {}
+    results = []
+    for i, (container, seal) in enumerate(pairs):
+        if not container and not seal:
+            results.append(('', ''))
+            continue
+        errors = []
+        if not container:
+            errors.append('thiếu MÃ SỐ CONTAINER')
+        elif not is_valid_container(container):
+            errors.append('sai định dạng/chữ số kiểm tra ISO 6346')
+        for field, value in (('MÃ SỐ CONTAINER', container), ('SEAL', seal)):
+            if not value:
+                continue
+            if (field, value) in seen:
+                errors.append(f'{field} trùng với dòng {seen[field, value] + 1}')
+            else:
+                seen[field, value] = i
+        if errors:
+            results.append(('error', '; '.join(errors)))
+            continue
+        values = [''] * len(FIELDS)
+        values[_CONTAINER_POS], values[_SEAL_POS] = container, seal
+        duplicates = dup_index.find_duplicates(values) if dup_index else []
+        results.append(('duplicate', describe_duplicates(duplicates).replace('\n', '; ')) if duplicates else ('', 'OK'))
+    return results
+
+
+def build_rows(form_values, pairs):
+    # form_values theo thứ tự FIELDS lấy từ form (các cột dùng chung); mỗi cặp thành một dòng Số lượng 1
+    rows = []
+    for container, seal in pairs:
+        values = list(form_values)
+        values[_CONTAINER_POS] = container
+        values[_SEAL_POS] = seal
+        values[_QUANTITY_POS] = '1'
+        rows.append(format_row(values))
+    return rows
+
+
+class BatchEntryWindow(tk.Toplevel):
+    # Lưới tạm các cặp container/SEAL của một booking: quét/gõ từng cặp (Enter để thêm) hoặc dán cả danh sách.
+    # Các cột còn lại lấy từ form chính; on_commit(pairs) ghi cả lô và trả về True nếu đã lưu
+    def __init__(self, master, dup_index, on_commit, slots=1, pairs=None):
+        super().__init__(master)
+        self.title('Nhập nhiều container')
+        self.dup_index = dup_index
+        self.on_commit = on_commit
+        pairs = list(pairs or [])
+        self.pairs = pairs + [('', '')] * max(0, slots - len(pairs))
+        tk.Label(self, text='MÃ SỐ CONTAINER').grid(row=0, column=0, padx=5, pady=3)
+        tk.Label(self, text='SEAL').grid(row=0, column=1, padx=5, pady=3)
+        self.container_entry = tk.Entry(self, width=20)
+        self.container_entry.grid(row=1, column=0, padx=5, pady=3)
+        self.seal_entry = tk.Entry(self, width=20)
+        self.seal_entry.grid(row=1, column=1, padx=5, pady=3)
+        tk.Button(self, text='Thêm', command=self.add_current, width=8).grid(row=1, column=2, padx=5, pady=3)
+        # Máy quét mã vạch gửi Enter sau mỗi mã: container -> SEAL -> thêm vào lưới
+        self.container_entry.bind('<Return>', lambda e: self.seal_entry.focus_set())
+        self.seal_entry.bind('<Return>', lambda e: self.add_current())
+        self.tree = ttk.Treeview(self, columns=('no', 'container', 'seal', 'status'), show='headings', height=15)
+        for col_id, title, width in (('no', '#', 40), ('container', 'MÃ SỐ CONTAINER', 140), ('seal', 'SEAL', 120), ('status', 'Kiểm tra', 320)):
+            self.tree.heading(col_id, text=title)
+            self.tree.column(col_id, width=width, anchor='w' if col_id == 'status' else 'center')
+        self.tree.tag_configure('error', background='#f8d0d0')
+        self.tree.tag_configure('duplicate', background='#fff3b0')
+        self.tree.grid(row=2, column=0, columnspan=3, padx=5, pady=3, sticky='nsew')
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+        self.tree.bind('<Delete>', lambda e: self.remove_selected())
+        buttons = tk.Frame(self)
+        buttons.grid(row=3, column=0, columnspan=3, pady=5)
+        tk.Button(buttons, text='Dán danh sách', command=self.paste).pack(side='left', padx=5)
+        tk.Button(buttons, text='Xoá dòng', command=self.remove_selected).pack(side='left', padx=5)
+        tk.Button(buttons, text='Lưu tất cả', command=self.commit, width=15).pack(side='left', padx=5)
+        self.summary_var = tk.StringVar()
+        tk.Label(self, textvariable=self.summary_var, fg='gray').grid(row=4, column=0, columnspan=3, pady=3)
+        self.grid_rowconfigure(2, weight=1)
+        self.grid_columnconfigure(2, weight=1)
+        self.render()
+        self.container_entry.focus_set()
+
+    def filled(self):
+        return [pair for pair in self.pairs if pair != ('', '')]
+
+    def render(self):
+        self.tree.delete(*self.tree.get_children())
+        results = check_pairs(self.pairs, self.dup_index)
+        for i, (pair, (kind, message)) in enumerate(zip(self.pairs, results)):
+            self.tree.insert('', tk.END, iid=str(i), values=(i + 1, pair[0], pair[1], message), tags=(kind,) if kind else ())
+        kinds = [kind for kind, _ in results]
+        empty = len(self.pairs) - len(self.filled())
+        self.summary_var.set(f'{len(self.filled())} container, {kinds.count("error")} lỗi, {kinds.count("duplicate")} trùng trong workbook'
+                             + (f', {empty} ô trống' if empty else '')
+                             + ('' if self.dup_index.ready.is_set() else ' (chưa kiểm tra trùng: đang đọc file Excel)'))
+        return results
+
+    def add_current(self):
+        # Ghi vào dòng đang chọn (sửa) hoặc ô trống đầu tiên, hết ô trống thì thêm dòng mới
+        pair = (normalize_container(self.container_entry.get()), self.seal_entry.get().strip())
+        if pair == ('', ''):
+            return
+        selected = self.tree.selection()
+        if selected:
+            index = int(selected[0])
+        else:
+            index = next((i for i, p in enumerate(self.pairs) if p == ('', '')), len(self.pairs))
+        if index == len(self.pairs):
+            self.pairs.append(pair)
+        else:
+            self.pairs[index] = pair
+        self.container_entry.delete(0, tk.END)
+        self.seal_entry.delete(0, tk.END)
+        self.render()
+        self.tree.see(str(index))
+        self.container_entry.focus_set()
+
+    def on_select(self, event=None):
+        selected = self.tree.selection()
+        if not selected:
+            return
+        container, seal = self.pairs[int(selected[0])]
+        self.container_entry.delete(0, tk.END)
+        self.container_entry.insert(0, container)
+        self.seal_entry.delete(0, tk.END)
+        self.seal_entry.insert(0, seal)
+
+    def remove_selected(self):
+        selected = {int(iid) for iid in self.tree.selection()}
+        self.pairs = [pair for i, pair in enumerate(self.pairs) if i not in selected]
+        self.render()
+
+    def paste(self):
+        try:
+            pairs = parse_pairs(self.clipboard_get())
+        except tk.TclError:
+            pairs = []
+        if not pairs:
+            messagebox.showinfo('Dán danh sách', 'Clipboard không có cặp container/SEAL nào.', parent=self)
+            return
+        # Điền vào các ô trống trước rồi mới thêm dòng
+        empty = [i for i, p in enumerate(self.pairs) if p == ('', '')]
+        for i, pair in zip(empty, pairs):
+            self.pairs[i] = pair
+        self.pairs.extend(pairs[len(empty):])
+        self.render()
+
+    def commit(self):
+        self.tree.selection_remove(*self.tree.selection())
+        results = self.render()
+        pairs = self.filled()
+        if not pairs:
+            messagebox.showinfo('Nhập nhiều container', 'Chưa có container nào.', parent=self)
+            return
+        errors = [(i, message) for i, (kind, message) in enumerate(results) if kind == 'error']
+        if errors:
+            lines = [f'Dòng {i + 1}: {message}' for i, message in errors[:10]]
+            messagebox.showerror('Nhập nhiều container', 'Sửa các dòng lỗi trước khi lưu:\n' + '\n'.join(lines), parent=self)
+            return
+        duplicates = [(i, message) for i, (kind, message) in enumerate(results) if kind == 'duplicate']
+        if duplicates:
+            lines = [f'Dòng {i + 1}: {message}' for i, message in duplicates[:10]]
+            if not messagebox.askyesno('Trùng dữ liệu', '\n'.join(lines) + '\n\nVẫn lưu cả lô?', parent=self):
+                return
+        if self.on_commit(pairs):
+            self.destroy()
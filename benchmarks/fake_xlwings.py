@@ -0,0 +1,154 @@
+import time
+from collections import Counter
+
+
+class CallStats:
+    # Đếm số lần gọi qua "COM" (round trip) và số ô đã truyền; latency_ms mô phỏng độ trễ mỗi lần gọi
+    def __init__(self, latency_ms=0.0, save_latency_ms=0.0):
+        self.latency = latency_ms / 1000
+        self.save_latency = save_latency_ms / 1000
+        self.calls = Counter()
+        self.cells = 0
+
+    def hit(self, kind, cells=0):
+        self.calls[kind] += 1
+        self.cells += cells
+        if self.latency:
+            time.sleep(self.latency)
+
+    @property
+    def round_trips(self):
+        return sum(self.calls.values())
+
+    def snapshot(self):
+        return self.round_trips, self.cells
+
+
+class FakeRange:
+    def __init__(self, sheet, first, last=None):
+        self.sheet = sheet
+        self.first = first
+        self.last = last or first
+        self.ndim = None
+
+    def options(self, ndim=None, **kwargs):
+        self.ndim = ndim
+        return self
+
+    @property
+    def value(self):
+        (r1, c1), (r2, c2) = self.first, self.last
+        self.sheet.book.stats.hit('range.value.get', (r2 - r1 + 1) * (c2 - c1 + 1))
+        block = [[self.sheet.get(r, c) for c in range(c1, c2 + 1)] for r in range(r1, r2 + 1)]
+        if self.ndim == 2:
+            return block
+        # Giống xlwings: một ô -> giá trị, một dòng/cột -> danh sách
+        if len(block) == 1 and len(block[0]) == 1:
+            return block[0][0]
+        if len(block) == 1:
+            return block[0]
+        if c1 == c2:
+            return [line[0] for line in block]
+        return block
+
+    @value.setter
+    def value(self, values):
+        if not isinstance(values, (list, tuple)):
+            values = [[values]]
+        elif values and not isinstance(values[0], (list, tuple)):
+            values = [values]
+        self.sheet.book.stats.hit('range.value.set', sum(len(line) for line in values))
+        r1, c1 = self.first
+        for r, line in enumerate(values, start=r1):
+            for c, value in enumerate(line, start=c1):
+                self.sheet.set(r, c, value)
+
+
+class FakeCell:
+    def __init__(self, row):
+        self.row = row
+
+
+class FakeUsedRange:
+    def __init__(self, last_row):
+        self.last_cell = FakeCell(last_row)
+
+
+class FakeSheet:
+    # Dữ liệu lưu theo dòng: rows[r - 1][c - 1]
+    def __init__(self, book, name, rows=None):
+        self.book = book
+        self.name = name
+        self.rows = rows if rows is not None else []
+
+    def range(self, first, last=None):
+        return FakeRange(self, first, last)
+
+    @property
+    def used_range(self):
+        self.book.stats.hit('used_range')
+        return FakeUsedRange(max(1, len(self.rows)))
+
+    def get(self, row, col):
+        if row > len(self.rows):
+            return None
+        line = self.rows[row - 1]
+        return line[col - 1] if col <= len(line) else None
+
+    def set(self, row, col, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        line = self.rows[row - 1]
+        if len(line) < col:
+            line.extend([None] * (col - len(line)))
+        line[col - 1] = value
+
+
+class FakeSheets:
+    def __init__(self, book):
+        self.book = book
+        self.items = []
+
+    def __getitem__(self, key):
+        self.book.stats.hit('sheets.get')
+        if isinstance(key, int):
+            return self.items[key]
+        for ws in self.items:
+            if ws.name == key:
+                return ws
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(list(self.items))
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, name, after=None):
+        self.book.stats.hit('sheets.add')
+        ws = FakeSheet(self.book, name)
+        self.items.append(ws)
+        return ws
+
+
+class FakeBook:
+    # Thay cho xlwings.Book: đủ các thuộc tính mà XlwingsBackend dùng
+    def __init__(self, stats=None):
+        self.stats = stats or CallStats()
+        self.sheets = FakeSheets(self)
+        self.saves = 0
+
+    def add_sheet(self, name, rows):
+        # Nạp dữ liệu sẵn (không tính là round trip)
+        ws = FakeSheet(self, name, rows)
+        self.sheets.items.append(ws)
+        return ws
+
+    def save(self):
+        self.stats.hit('book.save')
+        self.saves += 1
+        if self.stats.save_latency:
+            time.sleep(self.stats.save_latency)
+
+    def close(self):
+        pass
@@ -0,0 +1,108 @@
+import argparse
+import json
+import random
+from datetime import date, timedelta
+
+from benchmarks.fake_xlwings import FakeBook
+from bulk_import import container_check_digit
+from container_fields import DATE_FORMAT, FIELDS
+
+SHEET_NAMES = ['DANH ICH', 'HAO SAM', 'I.N.G.DR', 'FENTAI', 'WIN WOOD', 'TAN PHAT', 'MINH LONG', 'VIET HUNG']
+NHA_XE = ['HNP', 'TAN CANG', 'VINATRANS', 'SAO MAI', 'PHU AN']
+SIZES = ['20', '40', '45']
+LOCATIONS = ['CAT LAI', 'ICD PHUOC LONG', 'ICD TANAMEXCO', 'CANG SP-ITC', 'KCN SONG THAN', 'KCN VSIP 1', 'KHO BINH DUONG']
+OWNERS = ['MSKU', 'TCLU', 'CMAU', 'HLXU', 'OOLU', 'EGHU']
+
+
+def container_number(rng):
+    code = rng.choice(OWNERS) + f'{rng.randrange(10 ** 6):06d}'
+    return code + str(container_check_digit(code))
+
+
+def synthetic_rows(company, count, seed=0, first_day=date(2025, 1, 1), rows_per_day=40):
+    # Các dòng theo thứ tự FIELDS, lưu dạng chuỗi giống như tool ghi vào Excel
+    rng = random.Random(seed)
+    days = {}
+    for i in range(count):
+        day = i // rows_per_day
+        if day not in days:
+            days[day] = (first_day + timedelta(days=day)).strftime(DATE_FORMAT)
+        yield [
+            days[day],
+            company,
+            rng.choice(NHA_XE),
+            f'BK{seed:02d}{i:07d}',
+            container_number(rng),
+            f'SL{rng.randrange(10 ** 8):08d}',
+            rng.choice(('X', 'N')),
+            '1',
+            rng.choice(SIZES),
+            rng.choice(LOCATIONS),
+            rng.choice(LOCATIONS),
+        ]
+
+
+def default_layout(sheet_count, rows):
+    # Sheet chẵn theo kiểu "DANH ICH": cột A là STT, 2 dòng tiêu đề, dữ liệu từ dòng 4 cột B
+    layout = {}
+    for i in range(sheet_count):
+        name = SHEET_NAMES[i] if i < len(SHEET_NAMES) else f'SHEET {i + 1}'
+        if i % 2 == 0:
+            layout[name] = {'rows': rows, 'start_row': 4, 'start_col': 2}
+        else:
+            layout[name] = {'rows': rows, 'start_row': 2, 'start_col': 1}
+    return layout
+
+
+def build_settings(layout):
+    return {'sheets': {name: {'start_row': s['start_row'], 'start_col': s['start_col']} for name, s in layout.items()}}
+
+
+def sheet_rows(name, spec, seed=0):
+    # Toàn bộ các dòng của sheet, kể cả tiêu đề
+    stt = spec['start_col'] == 2
+    header = (['STT'] if stt else []) + FIELDS
+    if stt:
+        rows = [[f'BẢNG KÊ CONTAINER - {name}'], [], header]
+    else:
+        rows = [header]
+    for i, values in enumerate(synthetic_rows(name, spec['rows'], seed=seed)):
+        rows.append(([str(i + 1)] if stt else []) + values)
+    return rows
+
+
+def fake_book(layout, stats=None, seed=0):
+    book = FakeBook(stats)
+    for i, (name, spec) in enumerate(layout.items()):
+        book.add_sheet(name, sheet_rows(name, spec, seed=seed + i))
+    return book
+
+
+def write_workbook(path, layout, seed=0):
+    # Ghi bằng openpyxl write_only để tạo được file vài trăm nghìn dòng mà không tốn nhiều bộ nhớ
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    for i, (name, spec) in enumerate(layout.items()):
+        ws = wb.create_sheet(name)
+        for line in sheet_rows(name, spec, seed=seed + i):
+            ws.append(line)
+    wb.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tạo workbook giả lập NHAPCONTAINER.xlsx để đo hiệu năng')
+    parser.add_argument('output', help='Đường dẫn file .xlsx cần tạo')
+    parser.add_argument('--rows', type=int, default=10000, help='Số dòng dữ liệu mỗi sheet')
+    parser.add_argument('--sheets', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    layout = default_layout(args.sheets, args.rows)
+    write_workbook(args.output, layout, seed=args.seed)
+    settings_path = args.output + '.settings.json'
+    with open(settings_path, 'w', encoding='utf-8') as f:
+        json.dump(build_settings(layout), f, ensure_ascii=False, indent=2)
+    print(f'Đã tạo {args.output} ({args.sheets} sheet x {args.rows} dòng), cài đặt vị trí nhập: {settings_path}')
+
+
+if __name__ == '__main__':
+    main()
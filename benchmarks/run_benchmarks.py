@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fake_xlwings import CallStats
+from benchmarks.generate_workbook import build_settings, default_layout, fake_book, write_workbook
+from container_fields import FIELDS, sheet_layout
+from duplicate_index import DuplicateIndex
+from excel_manager import ExcelManager, XlwingsBackend
+from write_queue import WriteBehindQueue
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+PREVIEW_BLOCK_ROWS = 100
+
+
+def measure(stats, name, run, setup=None, repeat=3, warmup=True):
+    # Chạy nháp một lần (cache sheet, ...) để số round trip không phụ thuộc vào repeat;
+    # đo thời gian (không bật tracemalloc), số round trip/ô của lần chạy cuối, rồi chạy thêm một lần để lấy bộ nhớ đỉnh
+    if warmup:
+        if setup:
+            setup()
+        run()
+    walls = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        trips, cells = stats.snapshot()
+        started = time.perf_counter()
+        run()
+        walls.append((time.perf_counter() - started) * 1000)
+        trips, cells = stats.round_trips - trips, stats.cells - cells
+    if setup:
+        setup()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'op': name,
+        'wall_ms': round(min(walls), 3),
+        'wall_ms_median': round(statistics.median(walls), 3),
+        'round_trips': trips,
+        'cells': cells,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def bench_size(rows, sheet_count, latency_ms, save_latency_ms, workdir, repeat, with_file):
+    layout = default_layout(sheet_count, rows)
+    settings = build_settings(layout)
+    sheet_names = list(layout)
+    stats = CallStats(latency_ms, save_latency_ms)
+    book = fake_book(layout, stats)
+    path = os.path.join(workdir, f'bench_{rows}.xlsx')
+    journal_path = path + '.journal'
+    sheet_name = sheet_names[0]  # sheet kiểu "DANH ICH" có cột STT
+    start_row, start_col, stt_offset = sheet_layout(settings, sheet_name)
+    num_fields = len(FIELDS)
+    results = []
+
+    def factory():
+        return ExcelManager(path, XlwingsBackend(path, book=book))
+
+    def locate(excel_mgr):
+        # Giống DataEntryApp.refresh_preview
+        row = excel_mgr.get_last_empty_row(sheet_name, start_row, start_col, num_fields)
+        return row, excel_mgr.last_row(sheet_name)
+
+    def startup():
+        # Mở backend, tìm dòng nhập tiếp theo (dựng chỉ mục từ đầu), nạp khối đầu tiên của lưới xem trước
+        writer = WriteBehindQueue(factory, journal_path)
+        writer.wait_ready()
+        row, _ = writer.call(locate)
+        writer.call('read_rows', sheet_name, max(1, row - PREVIEW_BLOCK_ROWS // 2), start_col - stt_offset, PREVIEW_BLOCK_ROWS, num_fields + stt_offset)
+        writer.close()
+
+    results.append(measure(stats, 'startup', startup, repeat=repeat))
+
+    writer = WriteBehindQueue(factory, journal_path, max_delay=3600, max_ops=10 ** 6)
+    writer.wait_ready()
+    try:
+        results.append(measure(
+            stats, 'get_last_empty_row_cold',
+            lambda: writer.call('get_last_empty_row', sheet_name, start_row, start_col, num_fields),
+            setup=lambda: writer.call('clear_last_empty_row_cache', sheet_name), repeat=repeat))
+        results.append(measure(
+            stats, 'get_last_empty_row_warm',
+            lambda: writer.call('get_last_empty_row', sheet_name, start_row, start_col, num_fields), repeat=repeat))
+        results.append(measure(
+            stats, 'preview_rows',
+            lambda: writer.call('preview_rows', sheet_name, start_row, start_col, num_fields), repeat=repeat))
+
+        def preview_block():
+            row, _ = writer.call(locate)
+            writer.call('read_rows', sheet_name, max(1, row - PREVIEW_BLOCK_ROWS // 2), start_col - stt_offset, PREVIEW_BLOCK_ROWS, num_fields + stt_offset)
+
+        results.append(measure(stats, 'preview_block', preview_block, repeat=repeat))
+
+        new_row = ['01/01/2026', sheet_name, 'HNP', 'BKBENCH', 'MSKU0000000', 'SLBENCH', 'X', '1', '40', 'CAT LAI', 'CAT LAI']
+
+        def save_data():
+            # Giống DataEntryApp.save_data: cấp dòng + ghi nền, rồi lưu ngay
+            writer.append(sheet_name, start_row, start_col, [list(new_row)], stt_offset)
+            writer.flush()
+
+        results.append(measure(stats, 'save_data', save_data, repeat=repeat))
+
+        def delete_previous_row():
+            # Giống DataEntryApp.delete_previous_row: đọc dòng trước dòng nhập tiếp theo rồi xoá cả ô STT
+            row = writer.call('get_last_empty_row', sheet_name, start_row, start_col, num_fields) - 1
+            values = writer.call('read_rows', sheet_name, row, start_col, 1, num_fields)[0]
+            if all(v in (None, '') for v in values):
+                return
+            writer.submit('clear_rows', sheet_name, row, start_col - stt_offset, 1, num_fields + stt_offset)
+            writer.flush()
+
+        results.append(measure(stats, 'delete_previous_row', delete_previous_row, repeat=repeat))
+
+        def dup_index_build():
+            DuplicateIndex().build(writer.call(lambda excel_mgr: excel_mgr), settings, sheet_names)
+
+        # Chạy trực tiếp trên luồng hiện tại vì hàng đợi đang rảnh (trong app chạy qua call_async)
+        results.append(measure(stats, 'dup_index_build', dup_index_build, repeat=1, warmup=False))
+    finally:
+        writer.close()
+
+    if with_file:
+        from query_engine import ColumnStore
+        from workbook_meta import read_sheet_states
+        xlsx_path = os.path.join(workdir, f'bench_{rows}_file.xlsx')
+        write_workbook(xlsx_path, layout)
+        results.append(measure(stats, 'sheet_names', lambda: read_sheet_states(xlsx_path), repeat=repeat))
+        results.append(measure(stats, 'column_store_load', lambda: ColumnStore(xlsx_path, settings).load(sheet_names), repeat=1, warmup=False))
+
+    for result in results:
+        result['rows'] = rows
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # Hồi quy: số round trip tăng, hoặc thời gian chậm hơn baseline quá tolerance (tỉ lệ)
+    old = {(r['rows'], r['op']): r for r in baseline['results']}
+    problems = []
+    for r in results:
+        b = old.get((r['rows'], r['op']))
+        if b is None:
+            continue
+        if r['round_trips'] > b['round_trips']:
+            problems.append(f"{r['op']} @ {r['rows']} dòng: round trip {b['round_trips']} -> {r['round_trips']}")
+        if r['wall_ms'] > b['wall_ms'] * (1 + tolerance) and r['wall_ms'] - b['wall_ms'] > 1:
+            problems.append(f"{r['op']} @ {r['rows']} dòng: {b['wall_ms']} ms -> {r['wall_ms']} ms")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Đo hiệu năng các thao tác chính trên workbook giả lập (không cần Excel)')
+    parser.add_argument('--rows', type=int, nargs='+', default=list(DEFAULT_SIZES), help='Số dòng mỗi sheet (có thể nhiều giá trị)')
+    parser.add_argument('--sheets', type=int, default=5)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Độ trễ giả lập cho mỗi lần gọi COM')
+    parser.add_argument('--save-latency-ms', type=float, default=0.0, help='Độ trễ giả lập thêm khi lưu workbook')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--with-file', action='store_true', help='Tạo thêm file .xlsx thật để đo đọc tên sheet và nạp ColumnStore')
+    parser.add_argument('--output', help='Ghi kết quả JSON ra file thay vì stdout')
+    parser.add_argument('--baseline', help='File JSON kết quả cũ để so sánh')
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    args = parser.parse_args()
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            results.extend(bench_size(rows, args.sheets, args.latency_ms, args.save_latency_ms, workdir, args.repeat, args.with_file))
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sheets': args.sheets,
+        'latency_ms': args.latency_ms,
+        'save_latency_ms': args.save_latency_ms,
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        for line in problems:
+            print(line, file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+import argparse
+import csv
+import os
+import re
+
+from container_fields import (DATE_FORMAT, EXCEL_FILE, FIELDS, cell_to_str, fold_text,
+                              format_row, load_settings, parse_date, sheet_layout)
+from duplicate_index import describe_duplicates
+
+CHUNK_SIZE = 2000
+CONTAINER_RE = re.compile(r'^[A-Z]{4}\d{7}$')
+
+# Giá trị chữ cái theo ISO 6346 (bỏ qua các bội số của 11)
+_LETTER_VALUES = {}
+_value = 10
+for _letter in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
+    if _value % 11 == 0:
+        _value += 1
+    _LETTER_VALUES[_letter] = _value
+    _value += 1
+_WEIGHTS = [2 ** i for i in range(10)]
+
+
+def container_check_digit(code):
+    # Chữ số kiểm tra của 10 ký tự đầu mã container theo ISO 6346
+    total = sum((_LETTER_VALUES[ch] if ch.isalpha() else int(ch)) * w for ch, w in zip(code[:10], _WEIGHTS))
+    return total % 11 % 10
+
+
+def is_valid_container(code):
+    return bool(CONTAINER_RE.match(code)) and container_check_digit(code) == int(code[10])
+
+
+def map_columns(header):
+    # Ghép tiêu đề file nguồn với FIELDS, không phân biệt hoa thường/dấu/khoảng trắng thừa
+    folded = [fold_text(h) if h is not None else '' for h in header]
+    mapping = {}
+    for field in FIELDS:
+        key = fold_text(field)
+        if key in folded:
+            mapping[field] = folded.index(key)
+    return mapping
+
+
+def read_source(path, source_sheet=None, chunk_size=CHUNK_SIZE):
+    # Đọc file nguồn theo từng khúc; mỗi khúc là danh sách (số dòng nguồn, [giá trị theo FIELDS])
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        f = open(path, 'r', encoding='utf-8-sig', newline='')
+        rows = csv.reader(f)
+        close = f.close
+    elif ext in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=True)
+        ws = wb[source_sheet] if source_sheet else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        close = wb.close
+    else:
+        raise ValueError(f'Không hỗ trợ định dạng file: {ext}')
+    try:
+        header = next(rows, None)
+        if header is None:
+            return
+        mapping = map_columns(header)
+        if 'MÃ SỐ CONTAINER' not in mapping:
+            raise ValueError('File nguồn thiếu cột MÃ SỐ CONTAINER')
+        chunk = []
+        for line_no, line in enumerate(rows, start=2):
+            values = [cell_to_str(line[mapping[field]]) if field in mapping and mapping[field] < len(line) else ''
+                      for field in FIELDS]
+            if not any(values):
+                continue
+            chunk.append((line_no, values))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        close()
+
+
+def fill_defaults(columns, sheet_name):
+    # Giá trị mặc định giống form nhập tay
+    defaults = {'CTY': sheet_name, 'Loại hình': 'Xuất', 'Số lượng': '1'}
+    for field, default in defaults.items():
+        columns[field] = [v or default for v in columns[field]]
+    columns['MÃ SỐ CONTAINER'] = [v.replace(' ', '').upper() for v in columns['MÃ SỐ CONTAINER']]
+
+
+def validate_columns(columns, line_nos, seen_containers):
+    # Kiểm tra theo từng cột cho cả khúc; trả về danh sách lỗi của từng dòng
+    n = len(columns['MÃ SỐ CONTAINER'])
+    errors = [[] for _ in range(n)]
+    dates = list(map(parse_date, columns['NGÀY LẤY']))
+    valid_containers = list(map(is_valid_container, columns['MÃ SỐ CONTAINER']))
+    for i in [i for i, d in enumerate(dates) if d is None]:
+        errors[i].append(f'NGÀY LẤY không hợp lệ: "{columns["NGÀY LẤY"][i]}"')
+    for i in [i for i, ok in enumerate(valid_containers) if not ok]:
+        errors[i].append(f'MÃ SỐ CONTAINER sai định dạng/chữ số kiểm tra ISO 6346: "{columns["MÃ SỐ CONTAINER"][i]}"')
+    for i, code in enumerate(columns['MÃ SỐ CONTAINER']):
+        if valid_containers[i]:
+            if code in seen_containers:
+                errors[i].append(f'MÃ SỐ CONTAINER bị trùng trong file (dòng {seen_containers[code]})')
+            else:
+                seen_containers[code] = line_nos[i]
+    columns['NGÀY LẤY'] = [d.strftime(DATE_FORMAT) if d else v for d, v in zip(dates, columns['NGÀY LẤY'])]
+    return errors
+
+
+def prepare_import(path, sheet_name, source_sheet=None, dup_index=None):
+    # Đọc + chuẩn hoá + kiểm tra toàn bộ file; trả về (các dòng hợp lệ đã format, các dòng bị loại)
+    # Nếu có dup_index thì loại luôn các container/SEAL đã có trong workbook
+    valid = []
+    rejects = []
+    seen = {}
+    for chunk in read_source(path, source_sheet):
+        line_nos = [line_no for line_no, _ in chunk]
+        columns = {field: [values[i] for _, values in chunk] for i, field in enumerate(FIELDS)}
+        fill_defaults(columns, sheet_name)
+        errors = validate_columns(columns, line_nos, seen)
+        rows = list(zip(*[columns[field] for field in FIELDS]))
+        for line_no, values, row_errors in zip(line_nos, rows, errors):
+            if dup_index is not None and not row_errors:
+                duplicates = dup_index.find_duplicates(values)
+                if duplicates:
+                    row_errors.append(describe_duplicates(duplicates).replace('\n', '; '))
+            if row_errors:
+                rejects.append((line_no, '; '.join(row_errors), list(values)))
+            else:
+                valid.append(format_row(values))
+    return valid, rejects
+
+
+def write_error_report(path, rejects):
+    report_path = os.path.splitext(path)[0] + '.errors.csv'
+    with open(report_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Dòng', 'Lỗi'] + FIELDS)
+        for line_no, message, values in rejects:
+            writer.writerow([line_no, message] + values)
+    return report_path
+
+
+def append_rows(writer, settings, sheet_name, rows, dup_index=None, on_written=None):
+    # Ghi rows (đã format theo FIELDS) thành một khối liền nhau bắt đầu từ dòng trống tiếp theo của sheet.
+    # on_written(sheet, dòng đầu, các dòng) được gọi sau khi ghi để cập nhật các bộ đệm khác
+    start_row, start_col, stt_offset = sheet_layout(settings, sheet_name)
+    first_row = writer.append(sheet_name, start_row, start_col, rows, stt_offset)
+    if dup_index is not None:
+        dup_index.add_rows(sheet_name, first_row, rows)
+    if on_written is not None:
+        on_written(sheet_name, first_row, rows)
+    return first_row
+
+
+def import_file(path, sheet_name, settings, writer, source_sheet=None, dup_index=None, on_written=None):
+    # Trả về (dòng đầu, số dòng đã nhập, các dòng bị loại, file báo lỗi hoặc None)
+    valid, rejects = prepare_import(path, sheet_name, source_sheet, dup_index)
+    first_row = append_rows(writer, settings, sheet_name, valid, dup_index, on_written) if valid else None
+    report_path = write_error_report(path, rejects) if rejects else None
+    return first_row, len(valid), rejects, report_path
+
+
+def main():
+    from excel_manager import ExcelManager
+    from write_queue import WriteBehindQueue
+    parser = argparse.ArgumentParser(description='Nhập danh sách container từ file CSV/XLSX vào NHAPCONTAINER.xlsx')
+    parser.add_argument('source', help='File CSV hoặc XLSX có dòng tiêu đề trùng tên các cột trên form')
+    parser.add_argument('--sheet', required=True, help='Sheet đích trong workbook')
+    parser.add_argument('--source-sheet', help='Sheet cần đọc trong file XLSX nguồn (mặc định sheet đầu tiên)')
+    parser.add_argument('--workbook', default=EXCEL_FILE)
+    args = parser.parse_args()
+    settings = load_settings()
+    backend = settings.get('backend', 'xlwings')
+    writer = WriteBehindQueue(lambda: ExcelManager(args.workbook, backend=backend), args.workbook + '.journal')
+    try:
+        first_row, count, rejects, report_path = import_file(args.source, args.sheet, settings, writer, args.source_sheet)
+    finally:
+        writer.close()
+    if count:
+        print(f'Đã nhập {count} dòng vào sheet {args.sheet} từ dòng {first_row}.')
+    else:
+        print('Không có dòng hợp lệ nào để nhập.')
+    if rejects:
+        print(f'{len(rejects)} dòng bị loại, xem chi tiết tại {report_path}')
+
+
+if __name__ == '__main__':
+    main()
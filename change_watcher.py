@@ -0,0 +1,163 @@
+import threading
+import time
+import zipfile
+import zlib
+import xml.etree.ElementTree as ET
+
+from container_fields import FIELDS, sheet_layout
+from fill_index import file_stamp
+from workbook_meta import read_sheet_parts
+
+WATCH_INTERVAL_MS = 1000  # chu kỳ kiểm tra file Excel (chỉ một lần os.stat nếu file chưa đổi)
+SHARED_STRINGS = 'xl/sharedStrings.xml'
+BLOCK_ROWS = 256  # so sánh theo khối, chỉ so từng dòng trong khối bị đổi
+
+
+def strings_prefix_crc(data, count):
+    # CRC của count phần tử <si> đầu tiên trong sharedStrings.xml; None nếu có ít hơn count phần tử
+    if count == 0:
+        return 0
+    start = data.find(b'<si')
+    if start < 0:
+        return None
+    end = start
+    for _ in range(count):
+        end = data.find(b'</si>', end)
+        if end < 0:
+            return None
+        end += len(b'</si>')
+    return zlib.crc32(data[start:end])
+
+
+def read_snapshot(path):
+    # CRC xml của từng sheet có sẵn trong mục lục zip (không phải giải nén) và nội dung sharedStrings.xml
+    with zipfile.ZipFile(path) as archive:
+        names = set(archive.namelist())
+        sheets = {name: archive.getinfo(part).CRC for name, part in read_sheet_parts(archive).items() if part in names}
+        strings = archive.read(SHARED_STRINGS) if SHARED_STRINGS in names else b''
+    return sheets, strings
+
+
+def make_baseline(sheets, strings):
+    count = strings.count(b'</si>')
+    return sheets, count, strings_prefix_crc(strings, count)
+
+
+def changed_sheets(baseline, sheets, strings):
+    # Các sheet có thể đã đổi nội dung so với baseline. Sheet có xml giữ nguyên vẫn đọc ra như cũ
+    # nếu bảng chuỗi dùng chung chỉ được thêm vào cuối; bảng chuỗi bị sắp xếp lại thì coi mọi sheet là đổi
+    if baseline is None:
+        return set(sheets)
+    old_sheets, count, crc = baseline
+    if strings_prefix_crc(strings, count) != crc:
+        return set(sheets)
+    return {name for name, value in sheets.items() if old_sheets.get(name) != value}
+
+
+def diff_rows(old, new):
+    # Trả về [(vị trí đầu, [dòng cũ], [dòng mới])], mỗi phần tử là một dải dòng liên tiếp bị đổi
+    size = max(len(old), len(new))
+    old = old + [[None] * len(FIELDS) for _ in range(size - len(old))]
+    new = new + [[None] * len(FIELDS) for _ in range(size - len(new))]
+    runs = []
+    for block in range(0, size, BLOCK_ROWS):
+        if old[block:block + BLOCK_ROWS] == new[block:block + BLOCK_ROWS]:
+            continue
+        for i in range(block, min(block + BLOCK_ROWS, size)):
+            if old[i] == new[i]:
+                continue
+            if runs and runs[-1][0] + len(runs[-1][1]) == i:
+                runs[-1][1].append(old[i])
+                runs[-1][2].append(new[i])
+            else:
+                runs.append((i, [old[i]], [new[i]]))
+    return runs
+
+
+class ChangeWatcher:
+    # Phát hiện file Excel bị sửa bên ngoài tool: mtime/size trước, sau đó CRC xml từng sheet trong file xlsx.
+    # Chỉ sheet bị đổi mới được đọc lại và so sánh để cập nhật chỉ mục/bộ đệm đúng các dòng thay đổi
+    def __init__(self, path, settings, sheet_names, writer):
+        self.path = path
+        self.settings = settings
+        self.sheet_names = sheet_names
+        self.writer = writer
+        self.stamp = None
+        self.baseline = None  # (CRC từng sheet, số chuỗi dùng chung, CRC bảng chuỗi) của file lần gần nhất
+
+    def poll(self):
+        # Gọi định kỳ. Trả về Future kết quả refresh() nếu file bị sửa bên ngoài tool, ngược lại None
+        excel_mgr = self.writer.excel_mgr
+        stamp = file_stamp(self.path)
+        if excel_mgr is None or stamp is None or stamp == self.stamp:
+            return None
+        self.stamp = stamp
+        if stamp == excel_mgr.saved_stamp:
+            # Do chính tool vừa lưu (hoặc vừa mở file): chỉ ghi nhận mốc so sánh mới
+            self.writer.call_async(self.take_baseline)
+            return None
+        return self.writer.call_async(self.refresh)
+
+    def take_baseline(self, excel_mgr):
+        stamp = excel_mgr.saved_stamp
+        if file_stamp(self.path) != stamp:
+            return
+        try:
+            sheets, strings = read_snapshot(self.path)
+        except (OSError, KeyError, zipfile.BadZipFile, ET.ParseError):
+            return
+        # Bỏ qua nếu file lại bị đổi trong lúc đọc: giữ mốc cũ thì chỉ so sánh thừa, không bỏ sót
+        if file_stamp(self.path) == stamp:
+            self.baseline = make_baseline(sheets, strings)
+
+    def read_sheet(self, excel_mgr, sheet_name):
+        # Một lần đọc khối FIELDS của cả sheet
+        _, start_col, _ = sheet_layout(self.settings, sheet_name)
+        last_row = excel_mgr.last_row(sheet_name)
+        if not last_row:
+            return []
+        return [list(line) for line in excel_mgr.read_rows(sheet_name, 1, start_col, last_row, len(FIELDS))]
+
+    def refresh(self, excel_mgr):
+        # Chạy trên luồng ghi: đọc lại workbook, phát lại các thao tác chưa lưu, cập nhật chỉ mục dòng trống.
+        # Trả về {sheet: [(dòng đầu, [dòng cũ], [dòng mới]), ...]} (theo thứ tự FIELDS) cho các dòng bị sửa
+        if file_stamp(self.path) == excel_mgr.saved_stamp:
+            return {}
+        try:
+            sheets, strings = read_snapshot(self.path)
+        except (OSError, KeyError, zipfile.BadZipFile, ET.ParseError):
+            # File đang được ghi dở: lần kiểm tra sau thử lại
+            self.stamp = None
+            return {}
+        changed = changed_sheets(self.baseline, sheets, strings)
+        changed = [name for name in self.sheet_names if name in changed]
+        old = {name: self.read_sheet(excel_mgr, name) for name in changed}
+        self.writer.reload_workbook(excel_mgr)
+        self.baseline = make_baseline(sheets, strings)
+        changes = {}
+        for name in changed:
+            _, start_col, _ = sheet_layout(self.settings, name)
+            runs = []
+            for offset, old_rows, new_rows in diff_rows(old[name], self.read_sheet(excel_mgr, name)):
+                excel_mgr.fill_index.update(name, offset + 1, start_col, new_rows)
+                runs.append((offset + 1, old_rows, new_rows))
+            if runs:
+                changes[name] = runs
+        return changes
+
+    def start(self, on_change=None):
+        # Dùng khi không có giao diện (máy chủ nhập liệu): kiểm tra định kỳ trên luồng riêng
+        def run():
+            while True:
+                time.sleep(WATCH_INTERVAL_MS / 1000)
+                future = self.poll()
+                if future is None:
+                    continue
+                try:
+                    changes = future.result()
+                except Exception as e:
+                    self.writer.error = f'Không đọc lại được file Excel: {e}'
+                    continue
+                if changes and on_change:
+                    on_change(changes)
+        threading.Thread(target=run, name='change-watcher', daemon=True).start()
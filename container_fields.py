@@ -0,0 +1,98 @@
+import json
+import os
+import unicodedata
+from datetime import datetime
+
+EXCEL_FILE = 'NHAPCONTAINER.xlsx'
+SETTINGS_FILE = 'settings.json'
+
+FIELDS = [
+    'NGÀY LẤY',
+    'CTY',
+    'NHÀ XE',
+    'BK No',
+    'MÃ SỐ CONTAINER',
+    'SEAL',
+    'Loại hình',
+    'Số lượng',
+    'Kích cỡ',
+    'NƠI LẤY CONT',
+    'NƠI HẠ CONT'
+]
+
+# "Xuất"/"Nhập" trên form được lưu thành X/N trong Excel
+LOAI_HINH_CODES = {'Xuất': 'X', 'Nhập': 'N'}
+
+DATE_FORMAT = '%d/%m/%Y'
+DATE_INPUT_FORMATS = ('%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y-%m-%d', '%d/%m/%y')
+
+
+def load_settings():
+    if os.path.exists(SETTINGS_FILE):
+        with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {"sheets": {}}
+
+
+def save_settings(settings):
+    with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(settings, f, ensure_ascii=False, indent=2)
+
+
+def sheet_layout(settings, sheet_name):
+    # Trả về (start_row, start_col, stt_offset); start_col == 2 (B) nghĩa là cột A là STT
+    s = settings.get('sheets', {}).get(sheet_name, {"start_row": 2, "start_col": 1})
+    start_row = s.get('start_row', 2)
+    start_col = s.get('start_col', 1)
+    stt_offset = 1 if start_col == 2 else 0
+    return start_row, start_col, stt_offset
+
+
+def fold_text(text):
+    # Bỏ dấu tiếng Việt, viết hoa, gộp khoảng trắng: 'Mã số  container ' -> 'MA SO CONTAINER'
+    text = str(text)
+    if not text.isascii():  # chuỗi không dấu (BK No, SEAL, ...) bỏ qua bước chuẩn hoá Unicode
+        text = unicodedata.normalize('NFD', text)
+        text = ''.join(ch for ch in text if unicodedata.category(ch) != 'Mn')
+        text = text.replace('đ', 'd').replace('Đ', 'D')
+    return ' '.join(text.upper().split())
+
+
+def row_bytes(row_no, values):
+    # Số dòng và nội dung một dòng dạng bytes để băm (báo cáo tháng, xuất dữ liệu)
+    return json.dumps([row_no] + [cell_to_str(v) for v in values], ensure_ascii=False).encode('utf-8')
+
+
+def cell_to_str(value):
+    # Giá trị ô Excel -> chuỗi như khi nhập tay (10000.0 -> '10000', ngày -> dd/mm/yyyy)
+    if value is None:
+        return ''
+    if hasattr(value, 'strftime'):
+        return value.strftime(DATE_FORMAT)
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def parse_date(value):
+    # Ô ngày trong Excel có thể là datetime hoặc chuỗi dd/mm/yyyy; trả về None nếu không đọc được
+    if hasattr(value, 'year'):
+        return datetime(value.year, value.month, value.day)
+    text = cell_to_str(value)
+    for fmt in DATE_INPUT_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def format_row(values):
+    # values theo thứ tự FIELDS; luôn lưu dạng chuỗi để tránh bị thành số thực
+    data = []
+    for field, value in zip(FIELDS, values):
+        if field == 'Loại hình':
+            data.append(LOAI_HINH_CODES.get(value, str(value)))
+        else:
+            data.append(str(value))
+    return data
@@ -1,40 +1,29 @@
+import time
+STARTED_AT = time.perf_counter()  # mốc tính thời gian khởi động
 import tkinter as tk
-from tkinter import messagebox, ttk
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
+from tkinter import filedialog, messagebox, simpledialog, ttk
 from datetime import datetime
 import os
-import json
 import re
-import xlwings as xw
+from archive import ARCHIVE_DIR, ArchiveIndex, apply_result, archive_before, default_cutoff, describe_result
+from autocomplete import AUTOCOMPLETE_FIELDS, AutocompleteEntry, AutocompleteIndex
+from batch_entry import BatchEntryWindow, build_rows
+from bulk_import import append_rows, import_file
+from change_watcher import WATCH_INTERVAL_MS, ChangeWatcher
+from container_fields import DATE_FORMAT, EXCEL_FILE, FIELDS, format_row, load_settings, parse_date, save_settings, sheet_layout
+from duplicate_index import DuplicateIndex, describe_duplicates
+from entry_server import EntryClient
 from excel_manager import ExcelManager
+from fill_index import file_stamp
+from instrumentation import Instrumentation, format_snapshot
+from monthly_report import build_month_summary, summary_block, summary_sheet_name, summary_table
+from preview_grid import PreviewGrid, static_loader
+from query_engine import ColumnStore
+from startup_timing import StartupTimer
+from workbook_meta import visible_sheet_names
+from write_queue import WriteBehindQueue
 
-EXCEL_FILE = 'NHAPCONTAINER.xlsx'
-SETTINGS_FILE = 'settings.json'
-
-FIELDS = [
-    'NGÀY LẤY',
-    'CTY',
-    'NHÀ XE',
-    'BK No',
-    'MÃ SỐ CONTAINER',
-    'SEAL',
-    'Loại hình',
-    'Số lượng',
-    'Kích cỡ',
-    'NƠI LẤY CONT',
-    'NƠI HẠ CONT'
-]
-
-def load_settings():
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {"sheets": {}}
-
-def save_settings(settings):
-    with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(settings, f, ensure_ascii=False, indent=2)
+INSTRUMENTATION_LOG_MS = 60000  # chu kỳ ghi số liệu đo đạc ra instrumentation.jsonl
 
 def col_letter_to_index(col):
     # Chuyển chữ cái cột Excel (A, B, AA, ...) thành số thứ tự (1, 2, 27, ...)
@@ -45,17 +34,37 @@ def col_letter_to_index(col):
             num = num * 26 + (ord(c) - ord('A') + 1)
     return num
 
+def col_index_to_letter(col_num):
+    # Chuyển số thứ tự cột (1, 2, 27, ...) thành chữ cái Excel (A, B, AA, ...)
+    col_letter = ''
+    while col_num > 0:
+        col_num, rem = divmod(col_num - 1, 26)
+        col_letter = chr(rem + ord('A')) + col_letter
+    return col_letter
+
 class DataEntryApp:
     def __init__(self, master):
         self.master = master
+        self.startup_timer = StartupTimer(STARTED_AT)
+        self.startup_timer.mark('imports')
         master.title('Tool nhập liệu Container |                                                                            Chế tạo bởi Minh Quang')
         # Powered by MinhQuang3tarots (hidden signature)
         self.master._minhquang3tarots = 'Powered by MinhQuang3tarots'
         self.entries = {}
+        # Load settings
+        self.settings = load_settings()
+        # Đo đạc (settings.json "instrumentation": true); khi tắt không bọc hàm nào
+        self.instrumentation = Instrumentation() if self.settings.get('instrumentation') else None
+        if self.instrumentation:
+            # refresh_preview chỉ gửi yêu cầu đọc nên được đo riêng, từ lúc bấm tới khi lưới đã nạp xong (show_preview)
+            self.instrumentation.instrument_handlers(self, ('save_data', 'save_batch', 'undo_last_entry', 'delete_previous_row'))
         # Thêm menu bar
         self.menu_bar = tk.Menu(master)
         # File menu
         file_menu = tk.Menu(self.menu_bar, tearoff=0)
+        file_menu.add_command(label='Nhập từ file CSV/XLSX...', command=self.import_from_file)
+        file_menu.add_command(label='Nhập nhiều container...', command=self.open_batch_window)
+        file_menu.add_command(label='Lưu trữ dữ liệu cũ...', command=self.run_archive)
         file_menu.add_command(label='Đóng', command=self.on_close)
         self.menu_bar.add_cascade(label='File', menu=file_menu)
         # Setting menu
@@ -63,16 +72,48 @@ class DataEntryApp:
         setting_menu.add_command(label='Cài đặt vị trí nhập', command=self.open_settings_window)
         setting_menu.add_command(label='Hoàn tác', command=self.undo_last_entry)
         self.menu_bar.add_cascade(label='Setting', menu=setting_menu)
+        # Tra cứu menu
+        query_menu = tk.Menu(self.menu_bar, tearoff=0)
+        query_menu.add_command(label='Lọc dữ liệu...', command=self.open_query_window)
+        query_menu.add_command(label='Báo cáo tháng...', command=self.run_monthly_report)
+        query_menu.add_command(label='Xem dữ liệu lưu trữ...', command=self.view_archive)
+        self.menu_bar.add_cascade(label='Tra cứu', menu=query_menu)
         master.config(menu=self.menu_bar)
-        # Load sheet names
-        if os.path.exists(EXCEL_FILE):
-            wb = load_workbook(EXCEL_FILE, read_only=True)
-            self.sheet_names = [ws.title for ws in wb.worksheets if ws.sheet_state == 'visible']
-            wb.close()
+        # Load sheet names: đọc thẳng workbook.xml (có cache theo mtime/size), không mở cả workbook
+        self.sheet_names = visible_sheet_names(EXCEL_FILE) if os.path.exists(EXCEL_FILE) else []
+        self.startup_timer.mark('sheet_names')
+        # ExcelManager do luồng ghi nền sở hữu (backend chọn trong settings.json: "xlwings" hoặc "openpyxl").
+        # Thao tác ghi được ghi nhật ký rồi trả về ngay, workbook được lưu gộp theo "write_behind"
+        backend = self.settings.get('backend', 'xlwings')
+        write_behind = self.settings.get('write_behind', {})
+        instrumentation = self.instrumentation
+
+        def open_excel():
+            excel_mgr = ExcelManager(EXCEL_FILE, backend=backend)
+            if instrumentation:
+                instrumentation.instrument_manager(excel_mgr)
+            return excel_mgr
+
+        if self.settings.get('server'):
+            # Nhiều máy nhập cùng workbook: máy chủ (entry_server.py) giữ Excel, tool chỉ gửi yêu cầu
+            self.writer = EntryClient(self.settings['server'])
         else:
-            self.sheet_names = []
-        # Initialize ExcelManager here
-        self.excel_mgr = ExcelManager(EXCEL_FILE)
+            self.writer = WriteBehindQueue(
+                open_excel,
+                EXCEL_FILE + '.journal',
+                max_delay=write_behind.get('max_delay', 2.0),
+                max_ops=write_behind.get('max_ops', 50),
+            )
+        # Excel được mở ở luồng nền; form hiện ra ngay, thao tác đầu tiên cần Excel sẽ chờ luồng này
+        # Phát hiện file bị sửa trực tiếp trong Excel (chế độ máy chủ thì máy chủ tự theo dõi)
+        self.change_watcher = None if isinstance(self.writer, EntryClient) else ChangeWatcher(EXCEL_FILE, self.settings, self.sheet_names, self.writer)
+        self.dup_index = DuplicateIndex()
+        # Bộ đệm dạng cột của mọi sheet cho chức năng lọc, nạp ở luồng riêng từ file trên đĩa
+        self.column_store = ColumnStore(EXCEL_FILE, self.settings)
+        # Gợi ý khi gõ cho BK No/SEAL/nơi lấy/hạ cont; dùng lại bản lưu trên đĩa nếu file Excel chưa đổi
+        self.autocomplete = AutocompleteIndex(EXCEL_FILE + '.autocomplete.json')
+        # Dữ liệu cũ đã chuyển sang workbook lưu trữ theo tháng (archive/index.json)
+        self.archive_index = ArchiveIndex(self.settings.get('archive', {}).get('dir', ARCHIVE_DIR), EXCEL_FILE)
         # Sheet selection
         tk.Label(master, text='Chọn sheet:').grid(row=0, column=0, padx=5, pady=3, sticky='e')
         self.sheet_var = tk.StringVar()
@@ -105,6 +146,8 @@ class DataEntryApp:
             elif field == 'Kích cỡ':
                 entry = ttk.Combobox(master, values=['40', '20', '45'], state='readonly')
                 entry.set('40')
+            elif field in AUTOCOMPLETE_FIELDS:
+                entry = AutocompleteEntry(master, lambda text, f=field: self.autocomplete.suggest(f, text), width=30)
             else:
                 entry = tk.Entry(master, width=30)
             entry.grid(row=idx+1, column=1, padx=5, pady=3)
@@ -121,26 +164,42 @@ class DataEntryApp:
         self.last_entry_info = None
         # Bind sheet selection to update CTY
         self.sheet_combo.bind('<<ComboboxSelected>>', self.update_cty_by_sheet)
-        # Load settings
-        self.settings = load_settings()
         # Add Excel preview frame
         self.preview_frame = tk.Frame(master)
         self.preview_frame.grid(row=0, column=3, rowspan=len(FIELDS)+3, padx=10, pady=5, sticky='n')
         tk.Label(self.preview_frame, text='Xem trước dữ liệu Excel').pack()
-        self.preview_text = tk.Text(self.preview_frame, width=150, height=30, font=('Consolas', 10), wrap='none', xscrollcommand=None)
-        self.preview_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        # Thêm thanh scroll ngang
-        xscroll = tk.Scrollbar(self.preview_frame, orient='horizontal', command=self.preview_text.xview)
-        xscroll.pack(side=tk.BOTTOM, fill=tk.X)
-        self.preview_text.config(xscrollcommand=xscroll.set)
+        self.preview_status_var = tk.StringVar()
+        tk.Label(self.preview_frame, textvariable=self.preview_status_var, fg='gray').pack()
+        # Lưới cuộn được cả sheet, chỉ đọc các khối dòng đang xem (có cache + đọc trước)
+        self.preview_grid = PreviewGrid(self.preview_frame, height=30)
+        self.preview_grid.pack(fill=tk.BOTH, expand=True)
+        self.preview_source = None
         self.refresh_button = tk.Button(self.preview_frame, text='Làm mới', command=self.refresh_preview)
         self.refresh_button.pack(pady=5)
         # Bind sheet selection chỉ 1 lần
         self.sheet_combo.bind('<<ComboboxSelected>>', self.on_sheet_change)
+        # Một booking nhiều container: nhập các cột chung trên form, container/SEAL trên lưới
+        self.batch_button = tk.Button(master, text='Nhập nhiều container...', command=self.open_batch_window)
+        self.batch_button.grid(row=len(FIELDS)+2, column=0, pady=5, sticky='e')
         # Thêm nút Xoá dòng trước đó
         self.delete_prev_button = tk.Button(master, text='Xoá dòng trước đó', command=self.delete_previous_row)
         self.delete_prev_button.grid(row=len(FIELDS)+2, column=1, pady=5, sticky='w')
+        # Trạng thái ghi nền: số dòng đang chờ lưu / đã lưu vào workbook
+        self.write_status_var = tk.StringVar()
+        tk.Label(master, textvariable=self.write_status_var, fg='gray').grid(row=len(FIELDS)+3, column=0, columnspan=2, pady=3)
+        self.update_write_status()
+        self.startup_timer.mark('ui')
+        self.preview_token = 0
         self.refresh_preview()
+        # Chỉ mục container/BK No/SEAL trên mọi sheet, dựng ở luồng nền sau lần xem trước đầu tiên
+        self.writer.call_async(self.dup_index.build, self.settings, self.sheet_names)
+        self.autocomplete.start_loading(file_stamp(EXCEL_FILE), lambda: self.writer.call_async(self.autocomplete.build, self.settings, self.sheet_names))
+        self.column_store.start_loading(self.sheet_names)
+        master.bind_all('<Control-Shift-D>', self.open_debug_window)
+        if self.change_watcher:
+            self.master.after(WATCH_INTERVAL_MS, self.check_external_changes)
+        if self.instrumentation:
+            self.master.after(INSTRUMENTATION_LOG_MS, self.write_instrumentation_log)
         # Kéo dài cửa sổ chính
        
 
@@ -179,7 +238,7 @@ class DataEntryApp:
                     col = col_letter_to_index(col_e.get())
                     if row < 1: row = 1
                     if col < 1: col = 1
-                    self.settings['sheets'][sheet] = {"start_row": row, "start_col": col}
+                    self.settings['sheets'].setdefault(sheet, {}).update(start_row=row, start_col=col)
                 except Exception:
                     continue
             save_settings(self.settings)
@@ -190,97 +249,96 @@ class DataEntryApp:
         self.update_cty_by_sheet()
         self.refresh_preview()
 
+    def when_done(self, future, callback):
+        # Chờ kết quả từ luồng Excel mà không chặn vòng lặp Tk
+        if future.done():
+            callback(future)
+        else:
+            self.master.after(20, self.when_done, future, callback)
+
     def refresh_preview(self):
-        self.preview_text.delete('1.0', tk.END)
         sheet_name = self.sheet_var.get() or (self.sheet_names[0] if self.sheet_names else None)
         if not sheet_name:
-            self.preview_text.insert(tk.END, 'Không tìm thấy file hoặc sheet!')
+            self.preview_status_var.set('Không tìm thấy file hoặc sheet!')
             return
+        started = time.perf_counter()
+        s = self.settings.get('sheets', {}).get(sheet_name, {"start_row": 2, "start_col": 1})
+        start_row = s.get('start_row', 2)
+        start_col = s.get('start_col', 1)
+        num_fields = len(FIELDS)
+        # Nếu có cột STT ở cột A (start_col == 2) thì hiển thị thêm cột STT
+        stt_offset = 1 if start_col == 2 else 0
+        preview_num_fields = num_fields + stt_offset
+        preview_start_col = start_col - stt_offset
+        if not self.writer.ready.is_set():
+            self.preview_status_var.set('Đang mở file Excel...')
+
+        def locate(excel_mgr):
+            # Dòng nhập tiếp theo và dòng cuối đang dùng của sheet
+            row = excel_mgr.get_last_empty_row(sheet_name, start_row, start_col, num_fields)
+            return row, excel_mgr.last_row(sheet_name)
+
+        # Chỉ hiển thị kết quả của lần làm mới gần nhất
+        self.preview_token += 1
+        token = self.preview_token
+        future = self.writer.call_async(locate)
+        self.when_done(future, lambda f: token == self.preview_token and self.show_preview(f, sheet_name, stt_offset, preview_start_col, preview_num_fields, started))
+
+    def show_preview(self, future, sheet_name, stt_offset, preview_start_col, preview_num_fields, started):
         try:
-            s = self.settings.get('sheets', {}).get(sheet_name, {"start_row": 2, "start_col": 1})
-            start_row = s.get('start_row', 2)
-            start_col = s.get('start_col', 1)
-            num_fields = len(FIELDS)
-            # Nếu có cột STT ở cột A (start_col == 2), cần ghi STT tự động
-            stt_offset = 1 if start_col == 2 else 0
-            true_start_col = start_col + stt_offset
-            # Lấy thêm cột STT (A) nếu có
-            preview_num_fields = num_fields + stt_offset
-            preview_start_col = start_col - stt_offset if stt_offset else start_col
-            cell_cache, row, min_row, max_row = self.excel_mgr.preview_rows(sheet_name, start_row, preview_start_col, preview_num_fields)
-            col_widths = []
-            preview_rows = list(range(min_row, max_row + 1))
-            for idx, c in enumerate(range(preview_start_col, preview_start_col + preview_num_fields)):
-                col_letter = get_column_letter(c)
-                max_len = len(col_letter)
-                for r in preview_rows:
-                    val = cell_cache.get((r, c))
-                    val_str = str(val) if val is not None else ''
-                    if len(val_str) > max_len:
-                        max_len = len(val_str)
-                col_widths.append(max(max_len, 5))
-            header = []
-            for idx, c in enumerate(range(preview_start_col, preview_start_col + preview_num_fields)):
-                col_letter = ''
-                col_num = c
-                while col_num > 0:
-                    col_num, rem = divmod(col_num - 1, 26)
-                    col_letter = chr(rem + ord('A')) + col_letter
-                if stt_offset and idx == 0:
-                    header.append('STT'.center(col_widths[idx]))
-                else:
-                    header.append(col_letter.center(col_widths[idx]))
-            header_line = '| ' + ' | '.join(header) + ' |\n'
-            sep_line = '+-' + '-+-'.join(['-' * w for w in col_widths]) + '-+\n'
-            lines = []
-            lines.append('    ' + sep_line)
-            lines.append('    ' + header_line)
-            lines.append('    ' + sep_line)
-            for r in preview_rows:
-                row_cells = []
-                for idx, c in enumerate(range(preview_start_col, preview_start_col + preview_num_fields)):
-                    val = cell_cache.get((r, c))
-                    # Luôn hiển thị giá trị dưới dạng chuỗi, không hiển thị .0
-                    if val is None:
-                        val_str = ''
-                    else:
-                        val_str = str(val)
-                        # Nếu là số thực nhưng là số nguyên (10000.0), chuyển thành '10000'
-                        if isinstance(val, float) and val.is_integer():
-                            val_str = str(int(val))
-                    pad = col_widths[idx] - len(val_str)
-                    left = pad // 2
-                    right = pad - left
-                    cell_content = ' ' * left + val_str + ' ' * right
-                    row_cells.append(cell_content)
-                line = '| ' + ' | '.join(row_cells) + ' |'
-                if r == row:
-                    lines.append(f'>>> {line}\n')
-                else:
-                    lines.append(f'   {line}\n')
-                lines.append('    ' + sep_line)
-            self.preview_text.insert(tk.END, ''.join(lines))
+            row, last_row = future.result()
         except Exception as e:
-            self.preview_text.insert(tk.END, f'Lỗi khi đọc file: {e}')
+            self.preview_status_var.set(f'Lỗi khi đọc file: {e}')
+            return
+        headers = [col_index_to_letter(c) for c in range(preview_start_col, preview_start_col + preview_num_fields)]
+        if stt_offset:
+            headers[0] = 'STT'
+
+        def loader(first_row, count):
+            return self.writer.call_async('read_rows', sheet_name, first_row, preview_start_col, count, preview_num_fields)
+
+        # Cho cuộn thêm một đoạn dưới dòng nhập tiếp theo
+        self.preview_grid.set_source(loader, max(last_row, row + 50), headers, highlight=row)
+        self.preview_grid.show_row(row)
+        self.preview_source = sheet_name
+        self.preview_status_var.set(f'Sheet {sheet_name}: dòng nhập tiếp theo là {row}')
+        if self.instrumentation and started is not None:
+            # Toàn bộ chi phí làm mới: locate, chờ luồng Excel, dựng lưới và nạp các khối đang hiển thị
+            self.preview_grid.when_loaded(lambda: self.instrumentation.record('ui.refresh_preview', (time.perf_counter() - started) * 1000))
+        if not self.startup_timer.logged:
+            self.startup_timer.mark('backend_ready', at=self.writer.ready_at)
+            self.startup_timer.mark('first_preview')
+            self.startup_timer.log()
+
+    def update_preview_rows(self, sheet_name, first_row, rows):
+        # Sau khi ghi/xoá: chỉ vẽ lại các dòng thay đổi thay vì đọc lại cả vùng xem trước
+        if self.preview_source != sheet_name:
+            return
+        s = self.settings.get('sheets', {}).get(sheet_name, {"start_row": 2, "start_col": 1})
+        next_row = self.writer.next_free(sheet_name, s.get('start_col', 1), s.get('start_row', 2))
+        self.preview_grid.update_rows(first_row, rows)
+        if next_row is not None:
+            self.preview_grid.set_highlight(next_row)
+            self.preview_grid.show_row(next_row)
+            self.preview_status_var.set(f'Sheet {sheet_name}: dòng nhập tiếp theo là {next_row}')
+
+    def confirm_unchecked_duplicates(self):
+        # Chỉ mục trùng được dựng ở luồng nền lúc mở tool: chưa xong thì hỏi trước khi lưu mà không kiểm tra trùng
+        if self.dup_index.ready.is_set():
+            return True
+        return messagebox.askyesno('Chưa kiểm tra được trùng', 'Đang đọc file Excel để dựng chỉ mục nên chưa kiểm tra được container/SEAL trùng.\n\nVẫn lưu?')
 
     def save_data(self):
-        data = []
-        for field in FIELDS:
-            if field == 'Loại hình':
-                value = self.entries[field].get()
-                if value == 'Xuất':
-                    data.append('X')
-                elif value == 'Nhập':
-                    data.append('N')
-                else:
-                    data.append(str(value))
-            else:
-                # Luôn lưu dưới dạng chuỗi để tránh bị thành số thực
-                data.append(str(self.entries[field].get()))
+        data = format_row([self.entries[field].get() for field in FIELDS])
         sheet_name = self.sheet_var.get()
         if not sheet_name:
             messagebox.showerror('Lỗi', 'Vui lòng chọn sheet!')
             return
+        if not self.confirm_unchecked_duplicates():
+            return
+        duplicates = self.dup_index.find_duplicates(data)
+        if duplicates and not messagebox.askyesno('Trùng dữ liệu', describe_duplicates(duplicates) + '\n\nVẫn lưu dòng này?'):
+            return
         try:
             s = self.settings.get('sheets', {}).get(sheet_name, {"start_row": 2, "start_col": 1})
             start_row = s.get('start_row', 2)
@@ -288,20 +346,17 @@ class DataEntryApp:
             num_fields = len(FIELDS)
             stt_offset = 1 if start_col == 2 else 0
             true_start_col = start_col  # Sửa: không cộng offset, luôn bắt đầu từ start_col
-            ws = self.excel_mgr.get_sheet(sheet_name)
-            row = self.excel_mgr.get_last_empty_row(sheet_name, start_row, start_col, num_fields)
-            if stt_offset:
-                ws.range((row, 1)).value = str(row - start_row + 1)  # STT vào cột A
-            for i, value in enumerate(data):
-                ws.range((row, true_start_col + i)).value = str(value)
-            self.excel_mgr.save()
-            self.excel_mgr.clear_last_empty_row_cache(sheet_name)
+            row_values = [str(value) for value in data]
+            # Cấp dòng và ghi cả dòng (kể cả STT) vào hàng đợi; workbook được lưu ở luồng nền
+            row = self.writer.append(sheet_name, start_row, true_start_col, [row_values], stt_offset)
+            self.dup_index.add_rows(sheet_name, row, [data])
+            self.notify_rows_written(sheet_name, row, [data])
             self.last_entry_info = {
                 'sheet': sheet_name,
                 'row': row,
-                'start_col': true_start_col,
-                'num_fields': len(data),
-                'values': data.copy()
+                'start_col': true_start_col - stt_offset,
+                'num_fields': num_fields + stt_offset,
+                'rows': [data.copy()]
             }
             messagebox.showinfo('Thành công', f'Đã lưu dữ liệu vào dòng {row}!')
             for entry in self.entries.values():
@@ -311,7 +366,8 @@ class DataEntryApp:
                 self.entries['NGÀY LẤY'].insert(0, today_str)
             if 'Loại hình' in self.entries:
                 self.entries['Loại hình'].set('Xuất')
-            self.refresh_preview()
+            written = ([str(row - start_row + 1)] if stt_offset else []) + row_values
+            self.update_preview_rows(sheet_name, row, [written])
         except Exception as e:
             messagebox.showerror('Lỗi', f'Không thể lưu dữ liệu: {e}')
 
@@ -324,9 +380,13 @@ class DataEntryApp:
             row = self.last_entry_info['row']
             start_col = self.last_entry_info['start_col']
             num_fields = self.last_entry_info['num_fields']
-            values = self.last_entry_info['values']
-            self.excel_mgr.undo_row(sheet, row, start_col, num_fields)
-            self.excel_mgr.save()
+            # Một lần nhập nhiều container được hoàn tác cả lô (một lần xoá khối)
+            rows = self.last_entry_info['rows']
+            values = rows[0]
+            self.writer.submit('clear_rows', sheet, row, start_col, len(rows), num_fields)
+            self.dup_index.remove_rows(sheet, row, rows)
+            self.autocomplete.remove_rows(rows)
+            self.notify_rows_written(sheet, row, [[None] * len(FIELDS) for _ in rows])
             for idx, field in enumerate(FIELDS):
                 entry = self.entries[field]
                 entry.delete(0, tk.END)
@@ -336,11 +396,50 @@ class DataEntryApp:
             self.settings['sheets'][sheet]['start_row'] = row
             save_settings(self.settings)
             self.last_entry_info = None
-            messagebox.showinfo('Hoàn tác', f'Đã hoàn tác dòng {row} trên sheet {sheet}! Dữ liệu đã được trả lại vào form và đã xoá khỏi Excel.')
-            self.refresh_preview()
+            where = f'dòng {row}' if len(rows) == 1 else f'{len(rows)} dòng {row}-{row + len(rows) - 1}'
+            messagebox.showinfo('Hoàn tác', f'Đã hoàn tác {where} trên sheet {sheet}! Dữ liệu đã được trả lại vào form và đã xoá khỏi Excel.')
+            self.update_preview_rows(sheet, row, [[None] * num_fields for _ in rows])
+            if len(rows) > 1:
+                self.open_batch_window([(r[FIELDS.index('MÃ SỐ CONTAINER')], r[FIELDS.index('SEAL')]) for r in rows])
         except Exception as e:
             messagebox.showerror('Lỗi', f'Không thể hoàn tác: {e}')
 
+    def open_batch_window(self, pairs=None):
+        # "Số lượng" N trên form tạo sẵn N ô container/SEAL
+        try:
+            slots = int(self.entries['Số lượng'].get())
+        except ValueError:
+            slots = 1
+        BatchEntryWindow(self.master, self.dup_index, self.save_batch, slots=slots, pairs=pairs)
+
+    def save_batch(self, pairs):
+        # Cả lô là một khối dòng liền nhau: một lần cấp dòng + ghi, gộp vào một lần lưu workbook,
+        # một lần vẽ lại xem trước và hoàn tác cả lô. Trả về True nếu đã lưu
+        sheet_name = self.sheet_var.get()
+        if not sheet_name:
+            messagebox.showerror('Lỗi', 'Vui lòng chọn sheet!')
+            return False
+        if not self.confirm_unchecked_duplicates():
+            return False
+        rows = build_rows([self.entries[field].get() for field in FIELDS], pairs)
+        try:
+            start_row, start_col, stt_offset = sheet_layout(self.settings, sheet_name)
+            row = append_rows(self.writer, self.settings, sheet_name, rows, self.dup_index, self.notify_rows_written)
+        except Exception as e:
+            messagebox.showerror('Lỗi', f'Không thể lưu dữ liệu: {e}')
+            return False
+        self.last_entry_info = {
+            'sheet': sheet_name,
+            'row': row,
+            'start_col': start_col - stt_offset,
+            'num_fields': len(FIELDS) + stt_offset,
+            'rows': rows,
+        }
+        written = [([str(row + i - start_row + 1)] if stt_offset else []) + values for i, values in enumerate(rows)]
+        self.update_preview_rows(sheet_name, row, written)
+        messagebox.showinfo('Thành công', f'Đã lưu {len(rows)} container vào dòng {row}-{row + len(rows) - 1}!')
+        return True
+
     def delete_previous_row(self):
         sheet_name = self.sheet_var.get()
         if not sheet_name:
@@ -350,33 +449,293 @@ class DataEntryApp:
         start_row = s.get('start_row', 2)
         start_col = s.get('start_col', 1)
         num_fields = len(FIELDS)
-        # Nếu bảng có cột STT ở cột A, cần dịch start_col sang phải 1 cột
-        stt_offset = 1 if start_col == 2 else 0  # Nếu start_col là 2 (B), thì offset 1 cho cột A là STT
-        true_start_col = start_col + stt_offset
+        # Nếu bảng có cột STT ở cột A thì dữ liệu bắt đầu từ start_col, xoá luôn cả ô STT
+        stt_offset = 1 if start_col == 2 else 0  # Nếu start_col là 2 (B), thì cột A là STT
+        clear_col = start_col - stt_offset
         # Xác định dòng ngay trước dòng bắt đầu nhập liệu (start_row - 1)
         prev_row = start_row - 1
         if prev_row < 1:
             messagebox.showinfo('Thông báo', 'Không còn dòng nào để xoá!')
             return
         try:
-            ws = self.excel_mgr.get_sheet(sheet_name)
-            is_empty = all(ws.range((prev_row, true_start_col + i)).value in (None, '') for i in range(num_fields))
+            values = self.writer.call('read_rows', sheet_name, prev_row, start_col, 1, num_fields)[0]
+            is_empty = all(value in (None, '') for value in values)
             if is_empty:
                 messagebox.showinfo('Thông báo', f'Dòng {prev_row} đã trống!')
                 return
-            for i in range(num_fields):
-                ws.range((prev_row, true_start_col + i)).value = None
-            self.excel_mgr.save()
-            self.excel_mgr.clear_last_empty_row_cache(sheet_name)
+            self.writer.submit('clear_rows', sheet_name, prev_row, clear_col, 1, num_fields + stt_offset)
+            self.dup_index.remove_rows(sheet_name, prev_row, [values])
+            self.autocomplete.remove_rows([values])
+            self.notify_rows_written(sheet_name, prev_row, [[None] * len(FIELDS)])
             self.settings['sheets'][sheet_name]['start_row'] = prev_row
             save_settings(self.settings)
             messagebox.showinfo('Thành công', f'Đã xoá dữ liệu dòng {prev_row} trên sheet {sheet_name}! Vị trí nhập liệu sẽ bắt đầu lại từ dòng này.')
-            self.refresh_preview()
+            self.update_preview_rows(sheet_name, prev_row, [[None] * (num_fields + stt_offset)])
         except Exception as e:
             messagebox.showerror('Lỗi', f'Không thể xoá dòng {prev_row}: {e}')
 
+    def import_from_file(self):
+        sheet_name = self.sheet_var.get()
+        if not sheet_name:
+            messagebox.showerror('Lỗi', 'Vui lòng chọn sheet!')
+            return
+        path = filedialog.askopenfilename(
+            title='Chọn file danh sách container',
+            filetypes=[('Excel/CSV', '*.xlsx *.xlsm *.csv'), ('Tất cả', '*.*')])
+        if not path or not self.confirm_unchecked_duplicates():
+            return
+        try:
+            first_row, count, rejects, report_path = import_file(path, sheet_name, self.settings, self.writer, dup_index=self.dup_index, on_written=self.notify_rows_written)
+        except Exception as e:
+            messagebox.showerror('Lỗi', f'Không thể nhập file: {e}')
+            return
+        message = f'Đã nhập {count} dòng vào sheet {sheet_name}' + (f' từ dòng {first_row}.' if count else '.')
+        if rejects:
+            message += f'\n{len(rejects)} dòng bị loại, xem chi tiết tại:\n{report_path}'
+        messagebox.showinfo('Nhập từ file', message)
+        self.refresh_preview()
+
+    def run_monthly_report(self):
+        month = simpledialog.askstring('Báo cáo tháng', 'Tháng cần tổng hợp (YYYY-MM):', initialvalue=datetime.now().strftime('%Y-%m'))
+        if not month:
+            return
+        try:
+            datetime.strptime(month.strip(), '%Y-%m')
+        except ValueError:
+            messagebox.showerror('Lỗi', 'Tháng không hợp lệ, nhập theo dạng YYYY-MM')
+            return
+        month = month.strip()
+        sheet_name = summary_sheet_name(month)
+
+        # Lưu các thao tác đang chờ rồi mới đọc file để tổng hợp
+        try:
+            self.writer.flush()
+        except Exception as e:
+            messagebox.showerror('Lỗi', f'Không thể lưu các thao tác đang chờ, chưa tạo báo cáo: {e}')
+            return
+
+        def build(excel_mgr):
+            counts, pick, drop = build_month_summary(EXCEL_FILE, self.settings, month, archive_index=self.archive_index)
+            return sum(counts.values()), summary_block(excel_mgr, sheet_name, summary_table(month, counts, pick, drop))
+
+        def done(future):
+            if future.exception() is not None:
+                messagebox.showerror('Lỗi', f'Không thể tạo báo cáo: {future.exception()}')
+                return
+            total, table = future.result()
+            # Bảng tổng hợp được ghi qua nhật ký như mọi thao tác ghi khác, kể cả việc tạo sheet
+            # (nếu chết trước lần lưu tới, lần mở sau phát lại được cả hai)
+            try:
+                self.writer.submit('ensure_sheet', sheet_name)
+                self.writer.submit('write_rows', sheet_name, 1, 1, table)
+            except Exception as e:
+                messagebox.showerror('Lỗi', f'Không thể ghi báo cáo: {e}')
+                return
+            messagebox.showinfo('Báo cáo tháng', f'Đã ghi {total} container vào sheet {sheet_name}.')
+
+        self.write_status_var.set(f'Đang tổng hợp tháng {month}...')
+        self.when_done(self.writer.call_async(build), done)
+
+    def run_archive(self):
+        if isinstance(self.writer, EntryClient):
+            messagebox.showinfo('Lưu trữ dữ liệu cũ', 'Đang dùng máy chủ nhập liệu: dừng máy chủ rồi chạy "python archive.py" trên máy chủ.')
+            return
+        default = default_cutoff(self.settings.get('archive', {}).get('months_to_keep', 6)).strftime(DATE_FORMAT)
+        text = simpledialog.askstring('Lưu trữ dữ liệu cũ', 'Chuyển các dòng có NGÀY LẤY trước ngày (dd/mm/yyyy):', initialvalue=default)
+        if not text:
+            return
+        cutoff = parse_date(text.strip())
+        if cutoff is None:
+            messagebox.showerror('Lỗi', 'Ngày không hợp lệ, nhập theo dạng dd/mm/yyyy')
+            return
+        if not messagebox.askyesno('Lưu trữ dữ liệu cũ', f'Chuyển mọi dòng trước ngày {cutoff.strftime(DATE_FORMAT)} sang thư mục lưu trữ và dồn lại các sheet?'):
+            return
+        # Lưu hết thao tác đang chờ để nhật ký không còn thao tác nào ghi theo vị trí dòng cũ
+        try:
+            self.writer.flush()
+        except Exception as e:
+            messagebox.showerror('Lỗi', f'Không thể lưu các thao tác đang chờ, chưa lưu trữ: {e}')
+            return
+        settings, sheet_names, index = self.settings, list(self.sheet_names), self.archive_index
+
+        def done(future):
+            if future.exception() is not None:
+                messagebox.showerror('Lỗi', f'Không thể lưu trữ: {future.exception()}')
+                return
+            result = future.result()
+            if result:
+                apply_result(self.settings, result)
+                save_settings(self.settings)
+                # Các dòng đã đổi vị trí: dựng lại chỉ mục trùng, bộ đệm lọc và lưới xem trước
+                self.last_entry_info = None
+                self.dup_index = DuplicateIndex()
+                self.writer.call_async(self.dup_index.build, self.settings, self.sheet_names)
+                self.column_store = ColumnStore(EXCEL_FILE, self.settings)
+                self.column_store.start_loading(self.sheet_names)
+                self.refresh_preview()
+            messagebox.showinfo('Lưu trữ dữ liệu cũ', describe_result(result, cutoff))
+
+        self.write_status_var.set('Đang lưu trữ dữ liệu cũ...')
+        self.when_done(self.writer.call_async(lambda excel_mgr: archive_before(excel_mgr, settings, sheet_names, cutoff, index)), done)
+
+    def view_archive(self):
+        # Xem dữ liệu một tháng đã lưu trữ của sheet đang chọn trên lưới xem trước
+        sheet_name = self.sheet_var.get()
+        months = sorted(self.archive_index.months)
+        if not months:
+            messagebox.showinfo('Dữ liệu lưu trữ', 'Chưa có dữ liệu nào được lưu trữ.')
+            return
+        month = simpledialog.askstring('Dữ liệu lưu trữ', f'Tháng cần xem (YYYY-MM), có: {", ".join(months)}', initialvalue=months[-1])
+        if not month or month.strip() not in self.archive_index.months:
+            return
+        month = month.strip()
+        rows = self.archive_index.read_rows(month, sheet_name)
+        self.preview_token += 1
+        self.preview_source = None
+        self.preview_grid.set_source(static_loader(rows), len(rows), FIELDS)
+        self.preview_grid.scroll_to(1)
+        self.preview_status_var.set(f'Lưu trữ {month} - {sheet_name}: {len(rows)} dòng - bấm "Làm mới" để quay lại sheet')
+
+    def check_external_changes(self):
+        future = self.change_watcher.poll()
+        if future is not None:
+            self.when_done(future, self.apply_external_changes)
+        self.master.after(WATCH_INTERVAL_MS, self.check_external_changes)
+
+    def apply_external_changes(self, future):
+        # Chỉ cập nhật các dòng bị sửa bên ngoài tool; chỉ mục dòng trống đã được cập nhật trên luồng Excel
+        try:
+            changes = future.result()
+        except Exception as e:
+            self.preview_status_var.set(f'Không đọc lại được file Excel: {e}')
+            return
+        for sheet_name, runs in changes.items():
+            for first_row, old_rows, new_rows in runs:
+                self.dup_index.remove_rows(sheet_name, first_row, old_rows)
+                self.dup_index.add_rows(sheet_name, first_row, new_rows)
+                self.autocomplete.remove_rows(old_rows)
+                self.autocomplete.add_rows(new_rows)
+                self.column_store.update_rows(sheet_name, first_row, new_rows)
+                info = self.last_entry_info
+                if info and info['sheet'] == sheet_name and first_row < info['row'] + len(info['rows']) and info['row'] < first_row + len(new_rows):
+                    # Dòng vừa nhập đã bị sửa tay: không hoàn tác đè lên nữa
+                    self.last_entry_info = None
+        if self.preview_source in changes:
+            self.refresh_preview()
+
+    def notify_rows_written(self, sheet_name, first_row, rows):
+        # Cập nhật các bộ đệm trong bộ nhớ sau khi tool ghi/xoá dữ liệu (rows theo thứ tự FIELDS, dòng rỗng = đã xoá)
+        self.column_store.update_rows(sheet_name, first_row, rows)
+        self.autocomplete.add_rows(rows)
+
+    def open_query_window(self):
+        win = tk.Toplevel(self.master)
+        win.title('Lọc dữ liệu')
+        inputs = {}
+        options = [
+            ('Từ ngày (dd/mm/yyyy)', 'date_from', None),
+            ('Đến ngày (dd/mm/yyyy)', 'date_to', None),
+            ('CTY', 'cty', 'CTY'),
+            ('NHÀ XE', 'nha_xe', 'NHÀ XE'),
+            ('Kích cỡ', 'size', 'Kích cỡ'),
+            ('Loại hình', 'loai_hinh', 'Loại hình'),
+            ('Nơi lấy/hạ cont', 'location', None),
+        ]
+        for idx, (label, key, field) in enumerate(options):
+            tk.Label(win, text=label).grid(row=idx, column=0, padx=5, pady=3, sticky='e')
+            if field:
+                entry = ttk.Combobox(win, values=[''] + self.column_store.distinct(field), state='readonly', width=27)
+            else:
+                entry = tk.Entry(win, width=30)
+            entry.grid(row=idx, column=1, padx=5, pady=3)
+            inputs[key] = entry
+
+        def run_query():
+            if not self.column_store.ready.is_set():
+                messagebox.showinfo('Lọc dữ liệu', 'Đang nạp dữ liệu từ file Excel, vui lòng thử lại sau giây lát.', parent=win)
+                return
+            criteria = {key: entry.get().strip() for key, entry in inputs.items()}
+            for key in ('date_from', 'date_to'):
+                if criteria[key]:
+                    criteria[key] = parse_date(criteria[key])
+                    if criteria[key] is None:
+                        messagebox.showerror('Lỗi', 'Ngày không hợp lệ, nhập theo dạng dd/mm/yyyy', parent=win)
+                        return
+            started = time.perf_counter()
+
+            def finish(future=None):
+                if future is not None and future.exception() is not None:
+                    messagebox.showerror('Lỗi', f'Không thể nạp dữ liệu lưu trữ: {future.exception()}')
+                    return
+                results = self.column_store.query(**{k: v for k, v in criteria.items() if v})
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.show_query_results(results, elapsed_ms)
+
+            if not criteria['date_from']:
+                finish()
+                return
+            # Lọc theo ngày cũ: nạp thêm đúng các tháng lưu trữ nằm trong khoảng ngày ở luồng riêng rồi mới lọc
+            self.preview_status_var.set('Đang nạp dữ liệu lưu trữ...')
+            self.when_done(self.column_store.load_archive_async(self.archive_index, criteria['date_from'], criteria['date_to'] or None), finish)
+
+        tk.Button(win, text='Lọc', command=run_query, width=15).grid(row=len(options), column=0, columnspan=2, pady=5)
+
+    def show_query_results(self, results, elapsed_ms):
+        # Hiển thị kết quả lọc trên lưới xem trước; bấm "Làm mới" để quay lại sheet đang chọn
+        rows = [[sheet, row] + values for sheet, row, values in results]
+        self.preview_token += 1
+        self.preview_source = None
+        self.preview_grid.set_source(static_loader(rows), len(rows), ['Sheet', 'Dòng'] + FIELDS)
+        self.preview_grid.scroll_to(1)
+        self.preview_status_var.set(f'{len(rows)} kết quả ({elapsed_ms:.1f} ms) - bấm "Làm mới" để quay lại sheet')
+
+    def update_write_status(self):
+        status = self.writer.status()
+        if status['error']:
+            text = status['error']
+        elif not status['ready']:
+            text = 'Đang mở file Excel...'
+        elif status['pending']:
+            text = f'Đang chờ lưu: {status["pending"]} thao tác'
+        else:
+            text = 'Đã lưu tất cả vào Excel'
+        self.write_status_var.set(text)
+        self.master.after(500, self.update_write_status)
+
+    def open_debug_window(self, event=None):
+        # Cửa sổ ẩn (Ctrl+Shift+D): số liệu đo đạc cập nhật mỗi giây
+        if not self.instrumentation:
+            messagebox.showinfo('Debug', 'Chưa bật đo đạc: đặt "instrumentation": true trong settings.json rồi mở lại tool.')
+            return
+        win = tk.Toplevel(self.master)
+        win.title('Debug - đo đạc')
+        text = tk.Text(win, width=90, height=35, font=('Courier New', 9))
+        text.pack(fill='both', expand=True)
+        buttons = tk.Frame(win)
+        buttons.pack(pady=3)
+        tk.Button(buttons, text='Ghi log', command=self.instrumentation.write_log).pack(side='left', padx=5)
+        tk.Button(buttons, text='Đặt lại', command=self.instrumentation.reset).pack(side='left', padx=5)
+
+        def refresh():
+            if not win.winfo_exists():
+                return
+            text.delete('1.0', tk.END)
+            text.insert('1.0', f'Khởi động: {self.startup_timer.summary()}\n\n' + format_snapshot(self.instrumentation.snapshot()))
+            win.after(1000, refresh)
+
+        refresh()
+
+    def write_instrumentation_log(self):
+        self.instrumentation.write_log()
+        self.master.after(INSTRUMENTATION_LOG_MS, self.write_instrumentation_log)
+
     def on_close(self):
-        self.excel_mgr.close()
+        # Lưu nốt các thao tác còn chờ rồi mới đóng Excel
+        self.writer.close()
+        # Lưu chỉ mục gợi ý kèm dấu hiệu của file Excel vừa được lưu
+        self.autocomplete.save(file_stamp(EXCEL_FILE))
+        if self.instrumentation:
+            self.instrumentation.write_log()
         self.master.destroy()
 
 def main():
@@ -0,0 +1,90 @@
+import threading
+
+from container_fields import FIELDS, cell_to_str, sheet_layout
+
+# Các cột được đánh chỉ mục; chỉ container và SEAL bị coi là trùng (một BK No có nhiều container)
+INDEXED_FIELDS = ('BK No', 'MÃ SỐ CONTAINER', 'SEAL')
+DUPLICATE_FIELDS = ('MÃ SỐ CONTAINER', 'SEAL')
+
+_FIELD_POS = {field: FIELDS.index(field) for field in INDEXED_FIELDS}
+_FIRST_POS = min(_FIELD_POS.values())
+_WIDTH = max(_FIELD_POS.values()) - _FIRST_POS + 1
+
+
+def normalize_key(value):
+    return cell_to_str(value).replace(' ', '').upper()
+
+
+class DuplicateIndex:
+    # Chỉ mục băm {cột: {giá trị: {(sheet, dòng), ...}}} trên tất cả các sheet
+    def __init__(self):
+        self.index = {field: {} for field in INDEXED_FIELDS}
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        # Bỏ qua dòng tiêu đề của bảng khi dựng chỉ mục
+        self._headers = {field: normalize_key(field) for field in INDEXED_FIELDS}
+
+    def _update(self, sheet_name, first_row, rows, add):
+        # rows là các dòng dữ liệu theo thứ tự FIELDS (không gồm STT)
+        with self.lock:
+            for offset, values in enumerate(rows):
+                location = (sheet_name, first_row + offset)
+                for field, pos in _FIELD_POS.items():
+                    key = normalize_key(values[pos]) if pos < len(values) else ''
+                    if not key or key == self._headers[field]:
+                        continue
+                    bucket = self.index[field]
+                    if add:
+                        bucket.setdefault(key, set()).add(location)
+                    elif key in bucket:
+                        bucket[key].discard(location)
+                        if not bucket[key]:
+                            del bucket[key]
+
+    def add_rows(self, sheet_name, first_row, rows):
+        self._update(sheet_name, first_row, rows, add=True)
+
+    def remove_rows(self, sheet_name, first_row, rows):
+        self._update(sheet_name, first_row, rows, add=False)
+
+    def lookup(self, field, value):
+        with self.lock:
+            return sorted(self.index[field].get(normalize_key(value), ()))
+
+    def find_duplicates(self, values):
+        # Trả về [(cột, giá trị, [(sheet, dòng), ...])] cho các giá trị đã có trong workbook
+        found = []
+        for field in DUPLICATE_FIELDS:
+            value = values[FIELDS.index(field)]
+            locations = self.lookup(field, value) if normalize_key(value) else []
+            if locations:
+                found.append((field, value, locations))
+        return found
+
+    def build_sheet(self, excel_mgr, sheet_name, start_col):
+        # Một lần đọc khối cho cả 3 cột BK No/container/SEAL của sheet
+        last_row = excel_mgr.last_row(sheet_name)
+        if not last_row:
+            return
+        block = excel_mgr.read_rows(sheet_name, 1, start_col + _FIRST_POS, last_row, _WIDTH)
+        rows = [[None] * _FIRST_POS + list(line) for line in block]
+        self.add_rows(sheet_name, 1, rows)
+
+    def build(self, excel_mgr, settings, sheet_names):
+        # Chạy trên luồng ghi nền (qua WriteBehindQueue.call_async) nên không chặn giao diện
+        try:
+            for sheet_name in sheet_names:
+                _, start_col, _ = sheet_layout(settings, sheet_name)
+                self.build_sheet(excel_mgr, sheet_name, start_col)
+        finally:
+            self.ready.set()
+
+
+def describe_duplicates(duplicates):
+    lines = []
+    for field, value, locations in duplicates:
+        where = ', '.join(f'{sheet} dòng {row}' for sheet, row in locations[:5])
+        if len(locations) > 5:
+            where += f' (+{len(locations) - 5})'
+        lines.append(f'{field} "{value}" đã có ở: {where}')
+    return '\n'.join(lines)
@@ -0,0 +1,238 @@
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from container_fields import DATE_FORMAT, EXCEL_FILE, load_settings
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Thao tác ghi đi qua nhật ký của WriteBehindQueue
+SUBMIT_METHODS = ('write_rows', 'clear_rows', 'ensure_sheet')
+# Phương thức ExcelManager máy khách được gọi trực tiếp (chạy trên luồng Excel của máy chủ): chỉ đọc
+# và ensure_sheet; ghi phải qua /submit để vào nhật ký, lưu qua /flush
+CALL_METHODS = ('read_rows', 'read_cell', 'last_row', 'get_last_empty_row', 'ensure_sheet')
+# Chu kỳ cập nhật trạng thái máy chủ ở phía máy khách (giây)
+STATUS_INTERVAL = 0.5
+
+
+def json_default(value):
+    # Ô ngày trong Excel -> chuỗi dd/mm/yyyy
+    if hasattr(value, 'strftime'):
+        return value.strftime(DATE_FORMAT)
+    return str(value)
+
+
+class EntryRequestHandler(BaseHTTPRequestHandler):
+    # Mỗi yêu cầu chạy ở một luồng riêng; thứ tự ghi và cấp phát dòng do WriteBehindQueue đảm bảo
+    def do_GET(self):
+        if self.path == '/status':
+            self.reply(200, self.server.writer.status())
+        else:
+            self.reply(404, {'error': f'Không có đường dẫn {self.path}'})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self.reply(400, {'error': 'Dữ liệu gửi lên không phải JSON'})
+            return
+        handler = {
+            '/append': self.handle_append,
+            '/submit': self.handle_submit,
+            '/call': self.handle_call,
+            '/flush': self.handle_flush,
+            '/next_free': self.handle_next_free,
+        }.get(self.path)
+        if handler is None:
+            self.reply(404, {'error': f'Không có đường dẫn {self.path}'})
+            return
+        try:
+            self.reply(200, handler(payload))
+        except (KeyError, TypeError, ValueError) as e:
+            self.reply(400, {'error': f'Yêu cầu không hợp lệ: {e}'})
+        except Exception as e:
+            self.reply(500, {'error': str(e)})
+
+    def handle_append(self, payload):
+        row = self.server.writer.append(payload['sheet'], payload['start_row'], payload['start_col'],
+                                        payload['rows'], payload.get('stt_offset', 0))
+        return {'row': row}
+
+    def handle_submit(self, payload):
+        if payload['method'] not in SUBMIT_METHODS:
+            raise ValueError(f'không hỗ trợ {payload["method"]}')
+        return {'seq': self.server.writer.submit(payload['method'], *payload['args'])}
+
+    def handle_call(self, payload):
+        if payload['method'] not in CALL_METHODS:
+            raise ValueError(f'không hỗ trợ {payload["method"]}')
+        return {'result': self.server.writer.call(payload['method'], *payload['args'])}
+
+    def handle_flush(self, payload):
+        return {'seq': self.server.writer.flush()}
+
+    def handle_next_free(self, payload):
+        return {'row': self.server.writer.next_free(payload['sheet'], payload['start_col'], payload['start_row'])}
+
+    def reply(self, code, data):
+        body = json.dumps(data, ensure_ascii=False, default=json_default).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class EntryServer(ThreadingHTTPServer):
+    # Một tiến trình sở hữu ExcelManager (qua WriteBehindQueue); nhiều máy nhập liệu gửi dòng vào đây
+    daemon_threads = True
+
+    def __init__(self, writer, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        super().__init__((host, port), EntryRequestHandler)
+        self.writer = writer
+
+
+class RemoteManager:
+    # Đại diện ExcelManager phía máy khách: hàm truyền vào call_async(hàm) gọi các phương thức này qua máy chủ
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        if name not in CALL_METHODS:
+            raise AttributeError(name)
+        return lambda *args: self.client.call(name, *args)
+
+
+class EntryClient:
+    # Cùng API với WriteBehindQueue (append, submit, call, call_async, flush, status, ready, ...)
+    def __init__(self, url, timeout=30, workers=4):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.error = None
+        self.ready = threading.Event()
+        self.ready_at = None
+        self.last_status = {'ready': False, 'pending': 0, 'committed': 0, 'error': None}
+        self.manager = RemoteManager(self)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='entry-client')
+        self.closed = False
+        threading.Thread(target=self._poll_status, name='entry-client-status', daemon=True).start()
+
+    def _poll_status(self):
+        # Chờ máy chủ sẵn sàng (máy chủ có thể đang mở Excel) rồi cập nhật trạng thái định kỳ,
+        # để status() trên luồng giao diện không phải chờ HTTP
+        while not self.closed:
+            try:
+                status = self._request('/status', timeout=2)
+            except Exception as e:
+                self.error = f'Không kết nối được máy chủ nhập liệu {self.url}: {e}'
+                self.last_status = {'ready': False, 'pending': 0, 'committed': 0, 'error': self.error}
+                time.sleep(1)
+                continue
+            self.last_status = status
+            if status['ready'] and not self.ready.is_set():
+                self.error = None
+                self.ready_at = time.perf_counter()
+                self.ready.set()
+            time.sleep(STATUS_INTERVAL if self.ready.is_set() else 0.2)
+
+    def _request(self, path, payload=None, timeout=None):
+        data = None if payload is None else json.dumps(payload, ensure_ascii=False, default=json_default).encode('utf-8')
+        req = urllib.request.Request(self.url + path, data=data, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req, timeout=timeout or self.timeout) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read())['error']
+            except (ValueError, KeyError):
+                message = str(e)
+            raise Exception(message) from None
+
+    def status(self):
+        # Trạng thái lần cập nhật gần nhất của luồng nền (trễ tối đa STATUS_INTERVAL)
+        return self.last_status
+
+    def wait_ready(self):
+        self.ready.wait()
+        return self.manager
+
+    def submit(self, method, *args):
+        self.wait_ready()
+        return self._request('/submit', {'method': method, 'args': list(args)})['seq']
+
+    def append(self, sheet_name, start_row, start_col, rows, stt_offset=0):
+        self.wait_ready()
+        payload = {'sheet': sheet_name, 'start_row': start_row, 'start_col': start_col,
+                   'rows': [list(values) for values in rows], 'stt_offset': stt_offset}
+        return self._request('/append', payload)['row']
+
+    def next_free(self, sheet_name, start_col, start_row):
+        if not self.ready.is_set():
+            return None
+        return self._request('/next_free', {'sheet': sheet_name, 'start_col': start_col, 'start_row': start_row})['row']
+
+    def call(self, method, *args):
+        # method là tên phương thức trong CALL_METHODS hoặc hàm nhận excel_mgr (RemoteManager) làm tham số đầu
+        self.wait_ready()
+        if not isinstance(method, str):
+            return method(self.manager, *args)
+        return self._request('/call', {'method': method, 'args': list(args)})['result']
+
+    def call_async(self, method, *args):
+        return self.executor.submit(self.call, method, *args)
+
+    def flush(self):
+        self.wait_ready()
+        return self._request('/flush', {})['seq']
+
+    def close(self):
+        # Máy chủ vẫn chạy tiếp cho các máy khác; chỉ dừng các luồng phía máy khách
+        self.closed = True
+        self.executor.shutdown(wait=False)
+
+
+def main():
+    from change_watcher import ChangeWatcher
+    from excel_manager import ExcelManager
+    from workbook_meta import visible_sheet_names
+    from write_queue import WriteBehindQueue
+    parser = argparse.ArgumentParser(description='Máy chủ nhập liệu: một tiến trình giữ workbook, nhiều máy nhập cùng lúc')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workbook', default=EXCEL_FILE)
+    args = parser.parse_args()
+    settings = load_settings()
+    backend = settings.get('backend', 'xlwings')
+    write_behind = settings.get('write_behind', {})
+    writer = WriteBehindQueue(
+        lambda: ExcelManager(args.workbook, backend=backend),
+        args.workbook + '.journal',
+        max_delay=write_behind.get('max_delay', 2.0),
+        max_ops=write_behind.get('max_ops', 50),
+    )
+    writer.wait_ready()
+    # File bị sửa trực tiếp trong Excel: đọc lại và phát lại các dòng chưa lưu thay vì ghi đè
+    watcher = ChangeWatcher(args.workbook, settings, visible_sheet_names(args.workbook), writer)
+    watcher.start(lambda changes: print(f'File bị sửa bên ngoài, đã đọc lại các sheet: {", ".join(changes)}'))
+    server = EntryServer(writer, args.host, args.port)
+    print(f'Máy chủ nhập liệu cho {args.workbook} đang chạy tại http://{args.host}:{args.port} (Ctrl+C để dừng)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        writer.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,66 +1,243 @@
-import xlwings as xw
+import os
 
-class ExcelManager:
-    def __init__(self, file_path):
+from fill_index import FillIndex, file_stamp
+
+
+class XlwingsBackend:
+    # Engine dùng Excel thật qua COM (chỉ chạy trên Windows có cài Excel)
+    def __init__(self, file_path, book=None):
+        # book: Book đã mở sẵn (benchmark truyền Book giả để chạy không cần Excel)
         self.file_path = file_path
+        if book is not None:
+            self.app = None
+            self.wb = book
+            return
+        import xlwings as xw
         self.app = xw.App(visible=False, add_book=False)
         self.wb = self.app.books.open(file_path)
+
+    def get_sheet(self, sheet_name):
+        return self.wb.sheets[sheet_name]
+
+    def ensure_sheet(self, sheet_name):
+        if sheet_name not in [ws.name for ws in self.wb.sheets]:
+            self.wb.sheets.add(sheet_name, after=self.wb.sheets[-1])
+
+    def read_block(self, ws, row, col, nrows, ncols):
+        rng = ws.range((row, col), (row + nrows - 1, col + ncols - 1))
+        return rng.options(ndim=2).value
+
+    def last_row(self, ws):
+        return ws.used_range.last_cell.row
+
+    def write_block(self, ws, row, col, values):
+        ws.range((row, col)).value = values
+
+    def save(self):
+        self.wb.save()
+
+    def reload(self):
+        # Đóng rồi mở lại file từ đĩa (file bị sửa bên ngoài tool); thay đổi chưa lưu bị bỏ
+        self.wb.close()
+        self.wb = self.app.books.open(self.file_path)
+
+    def close(self):
+        self.wb.close()
+        if self.app is not None:
+            self.app.quit()
+
+
+class OpenpyxlBackend:
+    # Engine thuần Python: giữ workbook trong bộ nhớ, không cần Excel
+    def __init__(self, file_path):
+        from openpyxl import load_workbook
+        self.file_path = file_path
+        self.wb = load_workbook(file_path)
+
+    def get_sheet(self, sheet_name):
+        return self.wb[sheet_name]
+
+    def ensure_sheet(self, sheet_name):
+        if sheet_name not in self.wb.sheetnames:
+            self.wb.create_sheet(sheet_name)
+
+    def read_block(self, ws, row, col, nrows, ncols):
+        # Đọc thẳng từ ws._cells để không tạo thêm ô rỗng khi đọc ngoài vùng dữ liệu
+        cells = ws._cells
+        values = []
+        for r in range(row, row + nrows):
+            line = []
+            for c in range(col, col + ncols):
+                cell = cells.get((r, c))
+                line.append(cell.value if cell is not None else None)
+            values.append(line)
+        return values
+
+    def last_row(self, ws):
+        return ws.max_row
+
+    def write_block(self, ws, row, col, values):
+        # Gán .value trực tiếp: ws.cell(..., value=None) bỏ qua None nên không xoá được ô
+        for r, line in enumerate(values):
+            for c, value in enumerate(line):
+                ws.cell(row=row + r, column=col + c).value = value
+
+    def save(self):
+        # Ghi ra file tạm rồi thay thế để file gốc không bị hỏng nếu lưu giữa chừng thất bại
+        tmp_path = self.file_path + '.tmp'
+        self.wb.save(tmp_path)
+        os.replace(tmp_path, self.file_path)
+
+    def reload(self):
+        from openpyxl import load_workbook
+        self.wb.close()
+        self.wb = load_workbook(self.file_path)
+
+    def close(self):
+        self.wb.close()
+
+
+BACKENDS = {
+    'xlwings': XlwingsBackend,
+    'openpyxl': OpenpyxlBackend,
+}
+
+
+class ExcelManager:
+    def __init__(self, file_path, backend='xlwings'):
+        # backend là tên trong BACKENDS hoặc một backend đã tạo sẵn
+        stamp = file_stamp(file_path)
+        if isinstance(backend, str):
+            if backend not in BACKENDS:
+                raise ValueError(f'Không hỗ trợ backend "{backend}" (chọn một trong: {", ".join(BACKENDS)})')
+            backend = BACKENDS[backend](file_path)
+        self.file_path = file_path
+        self.backend = backend
         self.sheet_cache = {}
-        self.last_empty_row_cache = {}  # {sheet_name: last_empty_row}
+        # Dấu hiệu của file lúc mở/lưu gần nhất; file trên đĩa khác dấu hiệu này nghĩa là bị sửa bên ngoài tool
+        self.saved_stamp = stamp
+        # Chỉ mục dòng trống, lưu kèm file Excel nên mở lại không phải quét lại nếu file chưa đổi
+        self.fill_index = FillIndex(file_path + '.fillidx.json')
+        self.fill_index.load(stamp)
 
     def get_sheet(self, sheet_name):
         if sheet_name not in self.sheet_cache:
-            self.sheet_cache[sheet_name] = self.wb.sheets[sheet_name]
+            self.sheet_cache[sheet_name] = self.backend.get_sheet(sheet_name)
         return self.sheet_cache[sheet_name]
 
+    def ensure_sheet(self, sheet_name, track=True):
+        # Tạo sheet nếu chưa có (dùng cho sheet tổng hợp); track chỉ để cùng chữ ký khi phát lại nhật ký
+        self.backend.ensure_sheet(sheet_name)
+
+    def read_cell(self, sheet_name, row, col):
+        return self.read_rows(sheet_name, row, col, 1, 1)[0][0]
+
+    def read_rows(self, sheet_name, row, col, nrows, ncols):
+        # Đọc cả khối nrows x ncols trong một lần gọi backend
+        return self.backend.read_block(self.get_sheet(sheet_name), row, col, nrows, ncols)
+
+    def write_rows(self, sheet_name, row, col, rows, track=True):
+        # Ghi cả khối (danh sách các dòng cùng độ dài) trong một lần gọi backend.
+        # track=False khi chỉ mục dòng trống đã được người gọi cập nhật trước (hàng đợi ghi nền)
+        if rows:
+            self.backend.write_block(self.get_sheet(sheet_name), row, col, rows)
+            if track:
+                self.fill_index.update(sheet_name, row, col, rows)
+
+    def clear_rows(self, sheet_name, row, col, nrows, ncols, track=True):
+        self.write_rows(sheet_name, row, col, [[None] * ncols for _ in range(nrows)], track=track)
+
+    def last_row(self, sheet_name):
+        # Dòng cuối đang dùng của sheet
+        return self.backend.last_row(self.get_sheet(sheet_name))
+
+    def build_fill_index(self, sheet_name, col):
+        # Đọc cả cột trong một lần gọi rồi dựng chỉ mục
+        last_row = self.last_row(sheet_name)
+        values = [line[0] for line in self.read_rows(sheet_name, 1, col, last_row, 1)] if last_row else []
+        return self.fill_index.build(sheet_name, col, values)
+
     def get_last_empty_row(self, sheet_name, start_row, start_col, num_fields):
-        cache_key = (sheet_name, start_row, start_col, num_fields)
-        if cache_key in self.last_empty_row_cache:
-            return self.last_empty_row_cache[cache_key]
-        ws = self.get_sheet(sheet_name)
-        row = start_row
-        while ws.range((row, start_col)).value not in (None, ''):
-            row += 1
-        self.last_empty_row_cache[cache_key] = row
+        row = self.fill_index.next_free(sheet_name, start_col, start_row)
+        if row is None:
+            row = self.build_fill_index(sheet_name, start_col).next_free(start_row)
         return row
 
     def clear_last_empty_row_cache(self, sheet_name=None):
-        if sheet_name:
-            self.last_empty_row_cache = {k: v for k, v in self.last_empty_row_cache.items() if k[0] != sheet_name}
-        else:
-            self.last_empty_row_cache = {}
+        self.fill_index.invalidate(sheet_name)
 
     def write_row(self, sheet_name, start_row, start_col, data):
-        ws = self.get_sheet(sheet_name)
         row = self.get_last_empty_row(sheet_name, start_row, start_col, len(data))
-        for i in range(len(data)):
-            if ws.range((row, start_col + i)).value not in (None, ''):
+        current = self.read_rows(sheet_name, row, start_col, 1, len(data))[0]
+        for i, value in enumerate(current):
+            if value not in (None, ''):
                 raise Exception(f'Ô tại dòng {row}, cột {start_col + i} đã có dữ liệu!')
-        for i, value in enumerate(data):
-            ws.range((row, start_col + i)).value = value
-        self.clear_last_empty_row_cache(sheet_name)
+        self.write_rows(sheet_name, row, start_col, [list(data)])
         return row
 
     def undo_row(self, sheet_name, row, start_col, num_fields):
-        ws = self.get_sheet(sheet_name)
-        for i in range(num_fields):
-            ws.range((row, start_col + i)).value = None
-        self.clear_last_empty_row_cache(sheet_name)
+        self.clear_rows(sheet_name, row, start_col, 1, num_fields)
 
     def preview_rows(self, sheet_name, start_row, start_col, num_fields, preview_range=2):
-        ws = self.get_sheet(sheet_name)
         row = self.get_last_empty_row(sheet_name, start_row, start_col, num_fields)
         min_row = max(1, row - preview_range)
         max_row = row + preview_range
+        block = self.read_rows(sheet_name, min_row, start_col, max_row - min_row + 1, num_fields)
         cell_cache = {}
-        for c in range(start_col, start_col + num_fields):
-            for r in range(min_row, max_row + 1):
-                cell_cache[(r, c)] = ws.range((r, c)).value
+        for r, line in zip(range(min_row, max_row + 1), block):
+            for c, value in zip(range(start_col, start_col + num_fields), line):
+                cell_cache[(r, c)] = value
         return cell_cache, row, min_row, max_row
 
     def save(self):
-        self.wb.save()
+        # Không ghi đè thay đổi làm bên ngoài tool: ChangeWatcher đọc lại file, phát lại thao tác chưa lưu rồi mới lưu
+        if self.saved_stamp is not None and file_stamp(self.file_path) != self.saved_stamp:
+            raise Exception('File Excel vừa bị sửa bên ngoài tool, đang đọc lại trước khi lưu')
+        self.backend.save()
+        self.saved_stamp = file_stamp(self.file_path)
+        self.fill_index.save(self.saved_stamp)
+
+    def reload(self):
+        # Đọc lại workbook từ đĩa; các thao tác chưa lưu phải được người gọi phát lại (WriteBehindQueue.reload_workbook)
+        stamp = file_stamp(self.file_path)
+        self.backend.reload()
+        self.sheet_cache = {}
+        self.saved_stamp = stamp
 
     def close(self):
-        self.wb.close()
-        self.app.quit()
+        self.backend.close()
+
+
+class RowBuffer:
+    # Gom các dòng được stage lại, khi flush thì mỗi dải dòng liên tiếp chỉ ghi một lần
+    def __init__(self, excel_mgr, sheet_name, start_col):
+        self.excel_mgr = excel_mgr
+        self.sheet_name = sheet_name
+        self.start_col = start_col
+        self.rows = {}  # {row: values}
+
+    def stage(self, row, values):
+        self.rows[row] = list(values)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def runs(self):
+        # Trả về [(dòng đầu, [values, ...]), ...] theo từng dải liên tiếp cùng độ rộng
+        runs = []
+        for row in sorted(self.rows):
+            values = self.rows[row]
+            if runs:
+                first, block = runs[-1]
+                if first + len(block) == row and len(block[-1]) == len(values):
+                    block.append(values)
+                    continue
+            runs.append((row, [values]))
+        return runs
+
+    def flush(self):
+        runs = self.runs()
+        for first, block in runs:
+            self.excel_mgr.write_rows(self.sheet_name, first, self.start_col, block)
+        self.rows = {}
+        return runs
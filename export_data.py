@@ -0,0 +1,229 @@
+import argparse
+import bisect
+import csv
+import hashlib
+import importlib.util
+import json
+import os
+from datetime import datetime
+
+from container_fields import EXCEL_FILE, FIELDS, cell_to_str, load_settings, row_bytes
+from sheet_stream import iter_field_rows, open_workbook_stream
+from workbook_meta import visible_sheet_names
+
+CHUNK_SIZE = 5000
+BLOCK_ROWS = 1024  # số dòng mỗi khối hash của trạng thái xuất tăng dần
+COLUMNS = ['Sheet', 'Dòng'] + FIELDS
+FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+class CsvSink:
+    def __init__(self, path):
+        self.f = open(path, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.f)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.f.close()
+
+
+class ArrowSink:
+    # Ghi từng lô (record batch) cột chuỗi; pyarrow chỉ cần khi xuất parquet/arrow
+    def __init__(self, path, fmt):
+        import pyarrow as pa
+        self.pa = pa
+        self.schema = pa.schema([(name, pa.string()) for name in COLUMNS])
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self.writer = pa.ipc.new_file(path, self.schema)
+
+    def write(self, rows):
+        columns = [self.pa.array([row[i] for row in rows], type=self.pa.string()) for i in range(len(COLUMNS))]
+        self.writer.write_batch(self.pa.record_batch(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def open_sink(path, fmt):
+    if fmt == 'csv':
+        return CsvSink(path)
+    return ArrowSink(path, fmt)
+
+
+def in_ranges(ranges, row):
+    # ranges là các dải [đầu, cuối] tăng dần, không chồng nhau
+    i = bisect.bisect_right(ranges, [row, float('inf')]) - 1
+    return i >= 0 and ranges[i][0] <= row <= ranges[i][1]
+
+
+class ExportTracker:
+    # Theo dõi các dòng đã xuất của một sheet mà không giữ từng dòng: hash nối dần của từng khối BLOCK_ROWS dòng
+    # (chỉ các dòng đã xuất, kèm số dòng) và các dải dòng trống tới dòng cuối đã xuất. old là trạng thái lần trước.
+    # Dòng sau last_row cũ hoặc nằm trong dải trống cũ là dòng mới; khối có dòng đã xuất bị sửa/xoá thì không hợp lệ
+    def __init__(self, old=None):
+        self.old = old or {'last_row': 0, 'blocks': [], 'holes': []}
+        self.blocks = []
+        self.holes = []
+        self.last_row = 0
+        self.valid = True
+        self.block = 0
+        self.check = hashlib.sha1()  # các dòng đã xuất lần trước trong khối đang đọc
+        self.digest = hashlib.sha1()  # mọi dòng có dữ liệu trong khối đang đọc
+
+    def add(self, row_no, values):
+        # True nếu dòng chưa được xuất lần trước
+        self._close_blocks((row_no - 1) // BLOCK_ROWS)
+        if row_no > self.last_row + 1:
+            self.holes.append([self.last_row + 1, row_no - 1])
+        self.last_row = row_no
+        data = row_bytes(row_no, values)
+        self.digest.update(data)
+        if row_no > self.old['last_row'] or in_ranges(self.old['holes'], row_no):
+            return True
+        self.check.update(data)
+        return False
+
+    def _close_blocks(self, block):
+        while self.block < block:
+            old_blocks = self.old['blocks']
+            if self.block < len(old_blocks) and self.check.hexdigest() != old_blocks[self.block]:
+                self.valid = False
+            self.blocks.append(self.digest.hexdigest())
+            self.block += 1
+            self.check, self.digest = hashlib.sha1(), hashlib.sha1()
+
+    def finish(self):
+        # Trạng thái mới, hoặc None nếu dòng đã xuất bị sửa/xoá (kể cả các khối cũ nay trống hết)
+        self._close_blocks(max(len(self.old['blocks']), (self.last_row - 1) // BLOCK_ROWS + 1))
+        if not self.valid:
+            return None
+        return {'last_row': self.last_row, 'blocks': self.blocks, 'holes': self.holes}
+
+
+class ExportState:
+    # Trạng thái ExportTracker của từng sheet: {sheet: {'last_row', 'blocks', 'holes'}}
+    def __init__(self, path):
+        self.path = path
+        self.sheets = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.sheets = json.load(f).get('sheets', {})
+            except (OSError, ValueError):
+                self.sheets = {}
+
+    def exported(self, sheet_name):
+        # None nếu chưa xuất lần nào (hoặc state theo định dạng cũ)
+        state = self.sheets.get(sheet_name)
+        return state if state and 'blocks' in state else None
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'sheets': self.sheets}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def export_sheet(wb, sheet_name, settings, path, fmt, tracker=None, chunk_size=CHUNK_SIZE):
+    # Đọc tuần tự từng dòng, ghi theo lô chunk_size dòng nên bộ nhớ không phụ thuộc kích thước sheet.
+    # Có tracker (chế độ incremental) thì chỉ xuất dòng tracker báo là mới, kể cả dòng lấp vào lỗ trống.
+    # Trả về (số dòng đã xuất, trạng thái mới của tracker hoặc None nếu không có tracker), hoặc None
+    # nếu dòng đã xuất bị sửa/xoá/dồn lại (không xuất tăng dần được)
+    count = 0
+    sink = None
+    tmp_path = path + '.tmp'
+    chunk = []
+    try:
+        for row_no, values in iter_field_rows(wb, sheet_name, settings):
+            if tracker is not None:
+                is_new = tracker.add(row_no, values)
+                if not tracker.valid:
+                    break
+                if not is_new:
+                    continue
+            chunk.append([sheet_name, str(row_no)] + [cell_to_str(v) for v in values])
+            if len(chunk) >= chunk_size:
+                sink = sink or open_sink(tmp_path, fmt)
+                sink.write(chunk)
+                count += len(chunk)
+                chunk = []
+        marks = tracker.finish() if tracker is not None else None
+        if chunk and (tracker is None or marks is not None):
+            sink = sink or open_sink(tmp_path, fmt)
+            sink.write(chunk)
+            count += len(chunk)
+    finally:
+        if sink is not None:
+            sink.close()
+    if tracker is not None and marks is None:
+        if sink is not None:
+            os.remove(tmp_path)
+        return None
+    if sink is not None:
+        os.replace(tmp_path, path)
+    return count, marks
+
+
+def export_workbook(path, settings, out_dir, fmt='csv', incremental=False, sheet_names=None, state=None):
+    # Xuất mọi sheet (mỗi sheet một file); chế độ incremental chỉ xuất dòng chưa xuất lần trước vào
+    # <sheet>_<thời điểm>, khi không xuất tăng dần được thì xuất cả sheet vào <sheet>_full_<thời điểm>
+    os.makedirs(out_dir, exist_ok=True)
+    state = state or ExportState(path + '.export_state.json')
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    ext = FORMATS[fmt]
+    summary = []
+    wb = open_workbook_stream(path)
+    try:
+        for sheet_name in sheet_names or visible_sheet_names(path):
+            if sheet_name not in wb.sheetnames:
+                continue
+            if not incremental:
+                out_path = os.path.join(out_dir, f'{sheet_name}{ext}')
+                count, _ = export_sheet(wb, sheet_name, settings, out_path, fmt)
+                summary.append((sheet_name, count, out_path if count else None, ''))
+                continue
+            exported = state.exported(sheet_name)
+            result = None
+            note = ''
+            if exported is not None:
+                out_path = os.path.join(out_dir, f'{sheet_name}_{stamp}{ext}')
+                result = export_sheet(wb, sheet_name, settings, out_path, fmt, ExportTracker(exported))
+            if result is None:
+                # Lần đầu, hoặc dòng đã xuất bị xoá/lưu trữ/sửa tay: xuất lại cả sheet
+                out_path = os.path.join(out_dir, f'{sheet_name}_full_{stamp}{ext}')
+                note = 'xuất toàn bộ lần đầu' if exported is None else 'dữ liệu đã xuất bị thay đổi, xuất lại toàn bộ'
+                result = export_sheet(wb, sheet_name, settings, out_path, fmt, ExportTracker())
+            count, state.sheets[sheet_name] = result
+            summary.append((sheet_name, count, out_path if count else None, note))
+    finally:
+        wb.close()
+    if incremental:
+        state.save()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Xuất dữ liệu container từng sheet ra CSV/Parquet/Arrow (đọc tuần tự, ít bộ nhớ)')
+    parser.add_argument('--workbook', default=EXCEL_FILE)
+    parser.add_argument('--out', default='export', help='Thư mục chứa file xuất')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+    parser.add_argument('--incremental', action='store_true', help='Chỉ xuất các dòng chưa xuất ở lần trước')
+    parser.add_argument('--sheet', action='append', help='Chỉ xuất sheet này (có thể lặp lại)')
+    args = parser.parse_args()
+    if args.format != 'csv' and importlib.util.find_spec('pyarrow') is None:
+        parser.error(f'Xuất {args.format} cần cài pyarrow: pip install pyarrow')
+    settings = load_settings()
+    summary = export_workbook(args.workbook, settings, args.out, args.format, args.incremental, args.sheet)
+    for sheet_name, count, out_path, note in summary:
+        line = f'{sheet_name}: {count} dòng' + (f' -> {out_path}' if out_path else '')
+        print(line + (f' ({note})' if note else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+import bisect
+import json
+import os
+import threading
+
+
+def file_stamp(file_path):
+    # Dấu hiệu nhận biết file chưa bị thay đổi: (mtime_ns, size)
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def is_empty(value):
+    return value in (None, '')
+
+
+class ColumnFill:
+    # Trạng thái của một cột: mọi dòng >= end đều trống, holes là các dòng trống (đã sắp xếp) nằm trên end
+    def __init__(self, end=1, holes=None):
+        self.end = end
+        self.holes = holes or []
+
+    @classmethod
+    def from_values(cls, values):
+        # values là toàn bộ cột tính từ dòng 1
+        end = 1
+        holes = []
+        for offset, value in enumerate(values):
+            if not is_empty(value):
+                row = offset + 1
+                holes.extend(range(end, row))
+                end = row + 1
+        return cls(end, holes)
+
+    def next_free(self, start_row):
+        i = bisect.bisect_left(self.holes, start_row)
+        if i < len(self.holes):
+            return self.holes[i]
+        return max(self.end, start_row)
+
+    def next_run(self, start_row, count):
+        # Dòng đầu của dải count dòng trống liên tiếp đầu tiên từ start_row: một dải lỗ đủ dài,
+        # dải lỗ sát end (mọi dòng >= end đều trống) hoặc end
+        i = bisect.bisect_left(self.holes, start_row)
+        run_start, run_len = None, 0
+        for row in self.holes[i:]:
+            if run_start is not None and row == run_start + run_len:
+                run_len += 1
+            else:
+                run_start, run_len = row, 1
+            if run_len >= count:
+                return run_start
+        if run_start is not None and run_start + run_len == self.end:
+            return run_start
+        return max(self.end, start_row)
+
+    def mark_filled(self, row):
+        if row >= self.end:
+            self.holes.extend(range(self.end, row))
+            self.end = row + 1
+            return
+        i = bisect.bisect_left(self.holes, row)
+        if i < len(self.holes) and self.holes[i] == row:
+            del self.holes[i]
+
+    def mark_empty(self, row):
+        if row >= self.end:
+            return
+        if row == self.end - 1:
+            self.end = row
+            while self.holes and self.holes[-1] == self.end - 1:
+                self.end = self.holes.pop()
+            return
+        i = bisect.bisect_left(self.holes, row)
+        if i == len(self.holes) or self.holes[i] != row:
+            self.holes.insert(i, row)
+
+
+class FillIndex:
+    # Chỉ mục dòng trống theo (sheet, cột), cập nhật tại chỗ khi ghi/xoá và lưu cạnh file Excel
+    def __init__(self, path=None):
+        self.path = path
+        self.columns = {}  # {(sheet_name, col): ColumnFill}
+        # Có thể được đọc/ghi từ cả luồng giao diện lẫn luồng ghi Excel
+        self.lock = threading.Lock()
+
+    def get(self, sheet_name, col):
+        return self.columns.get((sheet_name, col))
+
+    def next_free(self, sheet_name, col, start_row):
+        # Trả về None nếu cột chưa được dựng chỉ mục
+        with self.lock:
+            fill = self.columns.get((sheet_name, col))
+            return fill.next_free(start_row) if fill is not None else None
+
+    def next_run(self, sheet_name, col, start_row, count):
+        # Như next_free nhưng cho cả khối count dòng (None nếu cột chưa được dựng chỉ mục)
+        with self.lock:
+            fill = self.columns.get((sheet_name, col))
+            return fill.next_run(start_row, count) if fill is not None else None
+
+    def reserve(self, sheet_name, col, row, count):
+        # Đánh dấu cả dải đã dùng (kể cả dòng có ô đầu trống) để lần cấp sau không ghi đè lên
+        with self.lock:
+            fill = self.columns.get((sheet_name, col))
+            if fill is not None:
+                for r in range(row, row + count):
+                    fill.mark_filled(r)
+
+    def build(self, sheet_name, col, values):
+        fill = ColumnFill.from_values(values)
+        with self.lock:
+            self.columns[(sheet_name, col)] = fill
+        return fill
+
+    def update(self, sheet_name, row, col, rows):
+        # rows là khối vừa được ghi bắt đầu từ (row, col); chỉ cập nhật những cột đang được theo dõi
+        if not rows:
+            return
+        with self.lock:
+            for (name, tracked_col), fill in self.columns.items():
+                if name != sheet_name:
+                    continue
+                offset = tracked_col - col
+                if offset < 0 or offset >= len(rows[0]):
+                    continue
+                for r, line in enumerate(rows):
+                    if is_empty(line[offset]):
+                        fill.mark_empty(row + r)
+                    else:
+                        fill.mark_filled(row + r)
+
+    def invalidate(self, sheet_name=None):
+        with self.lock:
+            if sheet_name:
+                self.columns = {k: v for k, v in self.columns.items() if k[0] != sheet_name}
+            else:
+                self.columns = {}
+
+    def load(self, stamp):
+        if not self.path or stamp is None or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('stamp') != stamp:
+            return False
+        with self.lock:
+            self.columns = {
+                (c['sheet'], c['col']): ColumnFill(c['end'], c['holes'])
+                for c in data.get('columns', [])
+            }
+        return True
+
+    def save(self, stamp):
+        if not self.path or stamp is None:
+            return
+        with self.lock:
+            data = {
+                'stamp': stamp,
+                'columns': [
+                    {'sheet': sheet, 'col': col, 'end': fill.end, 'holes': list(fill.holes)}
+                    for (sheet, col), fill in self.columns.items()
+                ],
+            }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,175 @@
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Các mốc (ms) của histogram độ trễ; phần tử cuối gom mọi giá trị lớn hơn mốc cuối
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+LOG_FILE = 'instrumentation.jsonl'
+
+# Các phương thức backend, mỗi lần gọi là một round trip tới Excel
+BACKEND_METHODS = ('get_sheet', 'ensure_sheet', 'read_block', 'last_row', 'write_block', 'save', 'reload')
+MANAGER_METHODS = ('read_rows', 'write_rows', 'clear_rows', 'last_row', 'build_fill_index', 'get_last_empty_row',
+                   'write_row', 'undo_row', 'preview_rows', 'save', 'reload')
+
+
+class OpStats:
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.round_trips = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, elapsed_ms, round_trips):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.round_trips += round_trips
+        self.buckets[bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+
+    def percentile(self, fraction):
+        # Ước lượng theo mốc trên của bucket chứa phân vị
+        target = fraction * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS_MS + (None,), self.buckets):
+            seen += n
+            if n and seen >= target:
+                return bound if bound is not None else round(self.max_ms, 1)
+        return 0
+
+    def summary(self):
+        labels = [f'<={b}' for b in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}']
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'round_trips': self.round_trips,
+            'round_trips_per_call': round(self.round_trips / self.count, 2) if self.count else 0,
+            'histogram': {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class Instrumentation:
+    # Chỉ được tạo khi settings.json có "instrumentation": true; khi tắt không bọc gì nên không tốn chi phí
+    def __init__(self, log_path=LOG_FILE, max_bytes=1024 * 1024, backups=3):
+        self.log_path = log_path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.lock = threading.Lock()
+        self.ops = {}
+        self.caches = {}  # {tên cache: [hit, miss]}
+        self.local = threading.local()  # số round trip đã gọi trên luồng hiện tại
+        self.started_at = time.time()
+
+    def trips(self):
+        return getattr(self.local, 'trips', 0)
+
+    def record(self, op, elapsed_ms, round_trips=0):
+        with self.lock:
+            stats = self.ops.get(op)
+            if stats is None:
+                stats = self.ops[op] = OpStats()
+            stats.add(elapsed_ms, round_trips)
+
+    def hit(self, cache, is_hit):
+        with self.lock:
+            counts = self.caches.setdefault(cache, [0, 0])
+            counts[0 if is_hit else 1] += 1
+
+    def wrap(self, op, func, round_trip=False):
+        # round_trip=True: mỗi lần gọi func tính là một round trip tới backend.
+        # Số round trip của một thao tác gồm cả các lần gọi lồng bên trong (đo trên cùng luồng)
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            local = self.local
+            before = getattr(local, 'trips', 0)
+            if round_trip:
+                local.trips = before + 1
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.record(op, elapsed_ms, getattr(local, 'trips', 0) - before)
+        return wrapper
+
+    def instrument_manager(self, excel_mgr):
+        # Bọc phương thức trên chính instance (backend và ExcelManager), class không bị sửa
+        backend = excel_mgr.backend
+        for name in BACKEND_METHODS:
+            setattr(backend, name, self.wrap(f'backend.{name}', getattr(backend, name), round_trip=True))
+        for name in MANAGER_METHODS:
+            setattr(excel_mgr, name, self.wrap(f'excel.{name}', getattr(excel_mgr, name)))
+
+        get_sheet = excel_mgr.get_sheet
+        get_last_empty_row = excel_mgr.get_last_empty_row
+
+        def tracked_get_sheet(sheet_name):
+            self.hit('sheet_cache', sheet_name in excel_mgr.sheet_cache)
+            return get_sheet(sheet_name)
+
+        def tracked_get_last_empty_row(sheet_name, start_row, start_col, num_fields):
+            self.hit('fill_index', excel_mgr.fill_index.get(sheet_name, start_col) is not None)
+            return get_last_empty_row(sheet_name, start_row, start_col, num_fields)
+
+        excel_mgr.get_sheet = tracked_get_sheet
+        excel_mgr.get_last_empty_row = tracked_get_last_empty_row
+        return excel_mgr
+
+    def instrument_handlers(self, obj, names):
+        # Bọc các hàm xử lý giao diện; phải gọi trước khi gán command= cho nút/menu
+        for name in names:
+            setattr(obj, name, self.wrap(f'ui.{name}', getattr(obj, name)))
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'time': round(time.time(), 3),
+                'uptime_s': round(time.time() - self.started_at, 1),
+                'ops': {op: stats.summary() for op, stats in sorted(self.ops.items())},
+                'caches': {
+                    name: {'hits': h, 'misses': m, 'hit_rate': round(h / (h + m), 3) if h + m else None}
+                    for name, (h, m) in sorted(self.caches.items())
+                },
+            }
+
+    def reset(self):
+        with self.lock:
+            self.ops = {}
+            self.caches = {}
+            self.started_at = time.time()
+
+    def write_log(self):
+        # Mỗi lần ghi thêm một dòng JSON (số liệu cộng dồn); file quá max_bytes thì xoay vòng .1, .2, ...
+        line = json.dumps(self.snapshot(), ensure_ascii=False) + '\n'
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) + len(line) > self.max_bytes:
+            self.rotate()
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+    def rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            src = f'{self.log_path}.{i}'
+            if os.path.exists(src):
+                os.replace(src, f'{self.log_path}.{i + 1}')
+        if self.backups:
+            os.replace(self.log_path, f'{self.log_path}.1')
+        else:
+            os.remove(self.log_path)
+
+
+def format_snapshot(snapshot):
+    # Bảng chữ cho cửa sổ debug
+    lines = [f'Thời gian chạy: {snapshot["uptime_s"]} s', '',
+             f'{"Thao tác":<32}{"Số lần":>8}{"TB ms":>10}{"p95 ms":>9}{"Max ms":>10}{"RT/lần":>8}']
+    for op, s in snapshot['ops'].items():
+        lines.append(f'{op:<32}{s["count"]:>8}{s["avg_ms"]:>10}{s["p95_ms"]:>9}{s["max_ms"]:>10}{s["round_trips_per_call"]:>8}')
+    lines += ['', f'{"Cache":<32}{"Hit":>8}{"Miss":>10}{"Tỉ lệ":>9}']
+    for name, c in snapshot['caches'].items():
+        lines.append(f'{name:<32}{c["hits"]:>8}{c["misses"]:>10}{str(c["hit_rate"]):>9}')
+    return '\n'.join(lines)
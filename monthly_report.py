@@ -0,0 +1,260 @@
+import argparse
+import hashlib
+import json
+import os
+from collections import Counter, defaultdict
+
+from archive import ARCHIVE_DIR, ARCHIVE_SETTINGS, ArchiveIndex
+from change_watcher import read_snapshot, strings_prefix_crc
+from container_fields import EXCEL_FILE, FIELDS, cell_to_str, load_settings, parse_date, row_bytes
+from sheet_stream import iter_field_rows, open_workbook_stream
+from workbook_meta import SUMMARY_PREFIX
+
+GROUP_FIELDS = ('CTY', 'NHÀ XE', 'Kích cỡ', 'Loại hình')
+_GROUP_POS = [FIELDS.index(f) for f in GROUP_FIELDS]
+_QTY_POS = FIELDS.index('Số lượng')
+_PICK_POS = FIELDS.index('NƠI LẤY CONT')
+_DROP_POS = FIELDS.index('NƠI HẠ CONT')
+
+
+def sheet_fingerprint(snapshot, sheet_name):
+    # Dấu nội dung của sheet (cách change_watcher so sánh): CRC xml của sheet trong mục lục zip,
+    # số chuỗi dùng chung và CRC của đoạn đầu sharedStrings.xml chứa các chuỗi đó
+    sheets, strings = snapshot
+    count = strings.count(b'</si>')
+    return [sheets.get(sheet_name), count, strings_prefix_crc(strings, count)]
+
+
+def fingerprint_matches(fingerprint, snapshot, sheet_name):
+    # Xml của sheet giữ nguyên và bảng chuỗi chỉ được thêm vào cuối: sheet đọc ra như cũ
+    sheets, strings = snapshot
+    crc, count, strings_crc = fingerprint
+    return crc is not None and sheets.get(sheet_name) == crc and strings_prefix_crc(strings, count) == strings_crc
+
+
+def to_quantity(value):
+    try:
+        return int(float(cell_to_str(value)))
+    except ValueError:
+        return 0
+
+
+def empty_month():
+    return {'counts': Counter(), 'pick': Counter(), 'drop': Counter()}
+
+
+def aggregate(rows, months):
+    # Gộp một lô dòng vào {tháng 'YYYY-MM': {'counts', 'pick', 'drop'}} theo từng cột
+    dates = [parse_date(values[0]) for values in rows]
+    month_keys = [d.strftime('%Y-%m') if d else None for d in dates]
+    groups = [tuple(cell_to_str(values[p]) for p in _GROUP_POS) for values in rows]
+    quantities = [to_quantity(values[_QTY_POS]) for values in rows]
+    picks = [cell_to_str(values[_PICK_POS]) for values in rows]
+    drops = [cell_to_str(values[_DROP_POS]) for values in rows]
+    for (month, group), n in Counter(zip(month_keys, groups)).items():
+        if month:
+            months.setdefault(month, empty_month())['counts'][group] += n
+    for column, key in ((picks, 'pick'), (drops, 'drop')):
+        sums = defaultdict(int)
+        for month, location, qty in zip(month_keys, column, quantities):
+            if month and location:
+                sums[(month, location)] += qty
+        for (month, location), total in sums.items():
+            months.setdefault(month, empty_month())[key][location] += total
+
+
+class AggregateCache:
+    # Kết quả gộp theo sheet/tháng lưu trên đĩa kèm dấu nội dung của sheet, dòng cuối đã gộp (last_row) và
+    # hash nối dần các dòng tới last_row (prefix_hash); lần chạy sau bỏ qua sheet chưa đổi, chỉ gộp dòng mới thêm
+    def __init__(self, path):
+        self.path = path
+        self.sheets = {}
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for sheet_name, state in data.get('sheets', {}).items():
+            if 'prefix_hash' not in state:
+                continue  # cache theo định dạng cũ: tính lại
+            months = {}
+            for month, agg in state['months'].items():
+                months[month] = {
+                    'counts': Counter({tuple(item[:-1]): item[-1] for item in agg['counts']}),
+                    'pick': Counter(agg['pick']),
+                    'drop': Counter(agg['drop']),
+                }
+            self.sheets[sheet_name] = {
+                'fingerprint': state['fingerprint'],
+                'last_row': state['last_row'],
+                'prefix_hash': state['prefix_hash'],
+                'months': months,
+            }
+
+    def save(self):
+        data = {'sheets': {}}
+        for sheet_name, state in self.sheets.items():
+            data['sheets'][sheet_name] = {
+                'fingerprint': state['fingerprint'],
+                'last_row': state['last_row'],
+                'prefix_hash': state['prefix_hash'],
+                'months': {
+                    month: {
+                        'counts': [list(group) + [n] for group, n in agg['counts'].items()],
+                        'pick': dict(agg['pick']),
+                        'drop': dict(agg['drop']),
+                    }
+                    for month, agg in state['months'].items()
+                },
+            }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def aggregate_rows(wb, sheet_name, settings, state=None, chunk_size=5000):
+    # Gộp các dòng sau state['last_row'] vào state['months']. Các dòng tới last_row chỉ được băm nối dần
+    # để so với prefix_hash: khác (dòng đã gộp bị sửa/xoá, dòng mới lấp vào lỗ trống) thì trả về None
+    if state is None:
+        state = {'last_row': 0, 'prefix_hash': hashlib.sha1().hexdigest(), 'months': {}}
+    digest = hashlib.sha1()
+    checked = False
+    last_row = state['last_row']
+    chunk = []
+    for row_no, values in iter_field_rows(wb, sheet_name, settings):
+        if not checked and row_no > state['last_row']:
+            if digest.hexdigest() != state['prefix_hash']:
+                return None
+            checked = True
+        digest.update(row_bytes(row_no, values))
+        if not checked:
+            continue
+        chunk.append(values)
+        last_row = row_no
+        if len(chunk) >= chunk_size:
+            aggregate(chunk, state['months'])
+            chunk = []
+    if not checked and digest.hexdigest() != state['prefix_hash']:
+        return None
+    if chunk:
+        aggregate(chunk, state['months'])
+    return {'last_row': last_row, 'prefix_hash': digest.hexdigest(), 'months': state['months']}
+
+
+def update_sheet(wb, sheet_name, settings, cache, snapshot, full=False, chunk_size=5000, key=None):
+    # Sheet chưa đổi nội dung thì dùng lại kết quả gộp trong cache; chỉ thêm dòng ở cuối thì gộp tiếp các dòng
+    # mới, đổi ở dòng đã gộp thì gộp lại cả sheet.
+    # snapshot = read_snapshot(file) đọc trước khi mở wb nên dấu nội dung không mới hơn dữ liệu đã đọc
+    key = key or sheet_name
+    state = None if full else cache.sheets.get(key)
+    if state is not None and fingerprint_matches(state['fingerprint'], snapshot, sheet_name):
+        return
+    result = aggregate_rows(wb, sheet_name, settings, state, chunk_size) if state is not None else None
+    if result is None:
+        result = aggregate_rows(wb, sheet_name, settings, chunk_size=chunk_size)
+    result['fingerprint'] = sheet_fingerprint(snapshot, sheet_name)
+    cache.sheets[key] = result
+
+
+def build_month_summary(path, settings, month, full=False, archive_index=None):
+    # Trả về (counts, pick, drop) của tháng 'YYYY-MM' trên mọi sheet khai báo trong settings.json,
+    # cộng cả workbook lưu trữ của tháng đó nếu đã được lưu trữ
+    cache = AggregateCache(path + '.report_cache.json')
+    if not full:
+        cache.load()
+    snapshot = read_snapshot(path)
+    wb = open_workbook_stream(path)
+    try:
+        for sheet_name in settings.get('sheets', {}):
+            if sheet_name in wb.sheetnames and not sheet_name.startswith(SUMMARY_PREFIX):
+                update_sheet(wb, sheet_name, settings, cache, snapshot, full=full)
+    finally:
+        wb.close()
+    if archive_index is not None and month in archive_index.months:
+        archive_path = archive_index.file_path(month)
+        snapshot = read_snapshot(archive_path)
+        wb = open_workbook_stream(archive_path)
+        try:
+            for sheet_name in archive_index.months[month]['sheets']:
+                update_sheet(wb, sheet_name, ARCHIVE_SETTINGS, cache, snapshot, full=full, key=f'archive:{month}:{sheet_name}')
+        finally:
+            wb.close()
+    cache.save()
+    total = empty_month()
+    for state in cache.sheets.values():
+        agg = state['months'].get(month)
+        if agg:
+            for key in total:
+                total[key].update(agg[key])
+    return total['counts'], total['pick'], total['drop']
+
+
+def summary_table(month, counts, pick, drop):
+    # Bảng tổng hợp dạng danh sách dòng cùng độ rộng để ghi bằng một lần write_rows
+    year, mon = month.split('-')
+    width = len(GROUP_FIELDS) + 1
+    table = [[f'TỔNG HỢP THÁNG {mon}/{year}'], [], list(GROUP_FIELDS) + ['Số container']]
+    table += [list(group) + [n] for group, n in sorted(counts.items())]
+    table += [['Tổng', '', '', '', sum(counts.values())], []]
+    for title, sums in (('NƠI LẤY CONT', pick), ('NƠI HẠ CONT', drop)):
+        table.append([title, 'Tổng Số lượng'])
+        table += [[location, qty] for location, qty in sorted(sums.items())]
+        table.append([])
+    return [line + [None] * (width - len(line)) for line in table]
+
+
+def summary_block(excel_mgr, sheet_name, table):
+    # Tạo sheet nếu chưa có; trả về khối cần ghi từ ô A1. Chỉ đọc nên chạy được cả qua máy chủ nhập liệu
+    excel_mgr.ensure_sheet(sheet_name)
+    old_rows = excel_mgr.last_row(sheet_name) or 0
+    # Phủ rỗng phần còn lại của bảng cũ (nếu bảng cũ dài hơn) trong cùng lần ghi
+    if old_rows > len(table):
+        table = table + [[None] * len(table[0]) for _ in range(old_rows - len(table))]
+    return table
+
+
+def write_summary(excel_mgr, sheet_name, table):
+    excel_mgr.write_rows(sheet_name, 1, 1, summary_block(excel_mgr, sheet_name, table))
+    excel_mgr.save()
+
+
+def summary_sheet_name(month):
+    year, mon = month.split('-')
+    return f'{SUMMARY_PREFIX}{mon}-{year}'
+
+
+def ensure_workbook(path):
+    if not os.path.exists(path):
+        from openpyxl import Workbook
+        Workbook().save(path)
+
+
+def main():
+    from excel_manager import ExcelManager
+    parser = argparse.ArgumentParser(description='Tổng hợp số container theo tháng từ NHAPCONTAINER.xlsx')
+    parser.add_argument('--month', required=True, help='Tháng cần tổng hợp, dạng YYYY-MM')
+    parser.add_argument('--workbook', default=EXCEL_FILE)
+    parser.add_argument('--output', help='Ghi ra workbook riêng thay vì thêm sheet vào workbook nguồn')
+    parser.add_argument('--full', action='store_true', help='Bỏ qua cache, đọc lại toàn bộ')
+    args = parser.parse_args()
+    settings = load_settings()
+    archive_index = ArchiveIndex(settings.get('archive', {}).get('dir', ARCHIVE_DIR), args.workbook)
+    counts, pick, drop = build_month_summary(args.workbook, settings, args.month, full=args.full, archive_index=archive_index)
+    table = summary_table(args.month, counts, pick, drop)
+    target = args.output or args.workbook
+    ensure_workbook(target)
+    excel_mgr = ExcelManager(target, backend=settings.get('backend', 'xlwings'))
+    try:
+        write_summary(excel_mgr, summary_sheet_name(args.month), table)
+    finally:
+        excel_mgr.close()
+    print(f'Đã ghi tổng hợp tháng {args.month} ({sum(counts.values())} container) vào {target}')
+
+
+if __name__ == '__main__':
+    main()
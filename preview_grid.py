@@ -0,0 +1,223 @@
+import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import Future
+from tkinter import ttk
+
+BLOCK_ROWS = 100
+
+
+def format_cell(value):
+    # Luôn hiển thị giá trị dưới dạng chuỗi, không hiển thị .0 (10000.0 -> '10000')
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def static_loader(rows):
+    # Nguồn dữ liệu có sẵn trong bộ nhớ (ví dụ kết quả lọc): dòng 1 của lưới là rows[0]
+    def loader(first_row, count):
+        future = Future()
+        future.set_result(rows[first_row - 1:first_row - 1 + count])
+        return future
+    return loader
+
+
+class RowBlockCache:
+    # LRU các khối BLOCK_ROWS dòng; mỗi khối được nạp bằng một lần đọc cả khối
+    def __init__(self, max_blocks=40, block_rows=BLOCK_ROWS):
+        self.max_blocks = max_blocks
+        self.block_rows = block_rows
+        self.blocks = OrderedDict()  # {số khối: [dòng, ...]}
+
+    def block_of(self, row):
+        return (row - 1) // self.block_rows
+
+    def block_range(self, block_no):
+        # (dòng đầu, số dòng) của khối
+        return block_no * self.block_rows + 1, self.block_rows
+
+    def get_row(self, row):
+        block_no = self.block_of(row)
+        block = self.blocks.get(block_no)
+        if block is None:
+            return None
+        self.blocks.move_to_end(block_no)
+        return block[(row - 1) % self.block_rows]
+
+    def put_block(self, block_no, rows):
+        self.blocks[block_no] = [list(r) for r in rows]
+        self.blocks.move_to_end(block_no)
+        while len(self.blocks) > self.max_blocks:
+            self.blocks.popitem(last=False)
+
+    def missing_blocks(self, first_row, count):
+        first = self.block_of(first_row)
+        last = self.block_of(first_row + count - 1)
+        return [b for b in range(first, last + 1) if b not in self.blocks]
+
+    def update_rows(self, first_row, rows):
+        # Áp dụng thay đổi vào các khối đang có trong cache (khối chưa nạp sẽ đọc mới khi cần)
+        for offset, values in enumerate(rows):
+            row = first_row + offset
+            block = self.blocks.get(self.block_of(row))
+            if block is not None:
+                block[(row - 1) % self.block_rows] = list(values)
+
+    def clear(self):
+        self.blocks.clear()
+
+
+class PreviewGrid(tk.Frame):
+    # Lưới xem trước ảo hoá: chỉ có đúng `height` dòng Treeview, dữ liệu lấy từ RowBlockCache theo vị trí cuộn
+    def __init__(self, master, height=25, prefetch_blocks=1, **kwargs):
+        super().__init__(master, **kwargs)
+        self.height = height
+        self.prefetch_blocks = prefetch_blocks
+        self.cache = RowBlockCache()
+        self.loader = None  # loader(dòng đầu, số dòng) -> Future trả về danh sách dòng
+        self.row_label = str
+        self.total_rows = 0
+        self.top = 1
+        self.highlight = None
+        self.pending = {}  # {số khối: Future}
+        self.on_loaded = None  # gọi một lần khi các khối đang chờ đã nạp xong
+        self.generation = 0
+        self.columns = []
+        self.char_widths = []
+        self.tree = ttk.Treeview(self, show='headings', height=height, selectmode='browse')
+        self.tree.tag_configure('next', background='#fff3b0')
+        self.vscroll = tk.Scrollbar(self, orient='vertical', command=self.yview)
+        self.hscroll = tk.Scrollbar(self, orient='horizontal', command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.hscroll.set)
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        self.vscroll.grid(row=0, column=1, sticky='ns')
+        self.hscroll.grid(row=1, column=0, sticky='ew')
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self.slots = [self.tree.insert('', tk.END, values=()) for _ in range(height)]
+        self.tree.bind('<MouseWheel>', lambda e: self.scroll_to(self.top - 3 * (1 if e.delta > 0 else -1)))
+        self.tree.bind('<Button-4>', lambda e: self.scroll_to(self.top - 3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll_to(self.top + 3))
+
+    def set_source(self, loader, total_rows, columns, row_label=str, highlight=None):
+        # Đổi nguồn dữ liệu (sheet khác, kết quả tìm kiếm, ...): bỏ cache cũ và bỏ qua các lần đọc còn dở
+        self.generation += 1
+        self.loader = loader
+        self.total_rows = total_rows
+        self.row_label = row_label
+        self.highlight = highlight
+        self.pending = {}
+        self.on_loaded = None
+        self.cache.clear()
+        if columns != self.columns:
+            self.columns = list(columns)
+            ids = ['#'] + [f'c{i}' for i in range(len(columns))]
+            self.tree.configure(columns=ids)
+            self.char_widths = [max(len(c), 5) for c in ['#'] + self.columns]
+            for col_id, title, width in zip(ids, ['#'] + self.columns, self.char_widths):
+                self.tree.heading(col_id, text=title)
+                self.tree.column(col_id, width=width * 8 + 10, anchor='center', stretch=False)
+        self.scroll_to(self.top)
+
+    def when_loaded(self, callback):
+        # callback() khi mọi khối đã yêu cầu (vùng nhìn thấy và prefetch) của nguồn hiện tại đã nạp xong
+        if self.pending:
+            self.on_loaded = callback
+        else:
+            callback()
+
+    def set_total_rows(self, total_rows):
+        self.total_rows = total_rows
+        self.update_scrollbar()
+
+    def set_highlight(self, row):
+        old, self.highlight = self.highlight, row
+        for r in (old, row):
+            if r is not None:
+                self.render_rows(r, 1)
+
+    def show_row(self, row):
+        # Cuộn để dòng row nằm giữa vùng nhìn thấy
+        self.scroll_to(row - self.height // 2)
+
+    def yview(self, *args):
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * self.total_rows) + 1)
+        elif args[0] == 'scroll':
+            step = self.height if args[2] == 'pages' else 1
+            self.scroll_to(self.top + int(args[1]) * step)
+
+    def scroll_to(self, top):
+        self.top = max(1, min(top, self.total_rows - self.height + 1))
+        self.render_rows(self.top, self.height)
+        self.update_scrollbar()
+        self.request_blocks()
+
+    def update_scrollbar(self):
+        if self.total_rows <= 0:
+            self.vscroll.set(0, 1)
+            return
+        self.vscroll.set((self.top - 1) / self.total_rows, min(1, (self.top - 1 + self.height) / self.total_rows))
+
+    def update_rows(self, first_row, rows):
+        # Sau khi sửa: chỉ cập nhật cache và vẽ lại đúng các dòng thay đổi
+        self.cache.update_rows(first_row, rows)
+        if first_row + len(rows) - 1 > self.total_rows:
+            self.set_total_rows(first_row + len(rows) - 1)
+        self.render_rows(first_row, len(rows))
+
+    def render_rows(self, first_row, count):
+        first = max(first_row, self.top)
+        last = min(first_row + count, self.top + self.height)
+        for row in range(first, last):
+            slot = self.slots[row - self.top]
+            if row > self.total_rows:
+                self.tree.item(slot, values=(), tags=())
+                continue
+            values = self.cache.get_row(row)
+            if values is None:
+                cells = ['…'] * len(self.columns)
+            else:
+                cells = [format_cell(v) for v in values]
+                self.grow_columns(cells)
+            tags = ('next',) if row == self.highlight else ()
+            self.tree.item(slot, values=[self.row_label(row)] + cells, tags=tags)
+
+    def grow_columns(self, cells):
+        # Chỉ nới rộng cột khi gặp giá trị dài hơn, không tính lại toàn bộ
+        for i, text in enumerate(cells, start=1):
+            if i < len(self.char_widths) and len(text) > self.char_widths[i]:
+                self.char_widths[i] = len(text)
+                self.tree.column(f'c{i - 1}', width=len(text) * 8 + 10)
+
+    def request_blocks(self):
+        # Nạp các khối đang nhìn thấy và prefetch các khối lân cận
+        if self.loader is None or self.total_rows <= 0:
+            return
+        margin = self.prefetch_blocks * self.cache.block_rows
+        first = max(1, self.top - margin)
+        count = min(self.total_rows, self.top + self.height + margin) - first + 1
+        for block_no in self.cache.missing_blocks(first, count):
+            if block_no in self.pending:
+                continue
+            block_first, block_count = self.cache.block_range(block_no)
+            future = self.loader(block_first, block_count)
+            self.pending[block_no] = future
+            self.poll_block(self.generation, block_no, future)
+
+    def poll_block(self, generation, block_no, future):
+        if generation != self.generation:
+            return
+        if not future.done():
+            self.after(20, self.poll_block, generation, block_no, future)
+            return
+        self.pending.pop(block_no, None)
+        if future.exception() is None:
+            self.cache.put_block(block_no, future.result())
+            block_first, block_count = self.cache.block_range(block_no)
+            self.render_rows(block_first, block_count)
+        if not self.pending and self.on_loaded is not None:
+            callback, self.on_loaded = self.on_loaded, None
+            callback()
@@ -0,0 +1,213 @@
+import threading
+from array import array
+from concurrent.futures import Future
+
+from container_fields import FIELDS, cell_to_str, fold_text, parse_date
+from sheet_stream import iter_field_rows, open_workbook_stream
+
+# Các cột lặp lại nhiều được lưu dạng mã số (categorical); NGÀY LẤY lưu thêm dạng số ngày (ordinal)
+CATEGORICAL_FIELDS = ('CTY', 'NHÀ XE', 'Kích cỡ', 'Loại hình', 'NƠI LẤY CONT', 'NƠI HẠ CONT')
+TEXT_FIELDS = tuple(f for f in FIELDS if f not in CATEGORICAL_FIELDS)
+NO_DATE = 0
+
+
+class Vocabulary:
+    # Giá trị <-> mã số, dùng chung cho mọi sheet để so sánh mã giữa các sheet
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def matching(self, predicate):
+        return {code for code, value in enumerate(self.values) if predicate(value)}
+
+
+class SheetColumns:
+    # Dữ liệu một sheet lưu theo cột; dòng bị xoá chỉ đánh dấu alive=0
+    def __init__(self, name, vocab):
+        self.name = name
+        self.vocab = vocab
+        self.rows = array('i')
+        self.alive = bytearray()
+        self.dates = array('i')
+        self.codes = {field: array('i') for field in CATEGORICAL_FIELDS}
+        self.text = {field: [] for field in TEXT_FIELDS}
+        self.position = {}  # {dòng Excel: vị trí trong các cột}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def upsert(self, row, values):
+        strings = dict(zip(FIELDS, map(cell_to_str, values)))
+        date = parse_date(values[0])
+        ordinal = date.toordinal() if date else NO_DATE
+        pos = self.position.get(row)
+        if pos is None:
+            self.position[row] = len(self.rows)
+            self.rows.append(row)
+            self.alive.append(1)
+            self.dates.append(ordinal)
+            for field in CATEGORICAL_FIELDS:
+                self.codes[field].append(self.vocab[field].code(strings[field]))
+            for field in TEXT_FIELDS:
+                self.text[field].append(strings[field])
+        else:
+            self.alive[pos] = 1
+            self.dates[pos] = ordinal
+            for field in CATEGORICAL_FIELDS:
+                self.codes[field][pos] = self.vocab[field].code(strings[field])
+            for field in TEXT_FIELDS:
+                self.text[field][pos] = strings[field]
+
+    def remove(self, row):
+        pos = self.position.get(row)
+        if pos is not None:
+            self.alive[pos] = 0
+
+    def values_at(self, pos):
+        return [self.vocab[f].values[self.codes[f][pos]] if f in self.codes else self.text[f][pos] for f in FIELDS]
+
+
+class ColumnStore:
+    # Bộ nhớ đệm dạng cột của các cột FIELDS trên mọi sheet, phục vụ lọc nhanh
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = settings
+        self.vocab = {field: Vocabulary() for field in CATEGORICAL_FIELDS}
+        self.sheets = {}
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.loading = False
+        self.pending_updates = []  # thay đổi do tool ghi trong lúc đang nạp, áp dụng sau khi nạp xong
+        self.error = None
+        self.archive_months = set()
+
+    def load(self, sheet_names):
+        # Đọc tuần tự (openpyxl read_only) từng sheet; chạy ở luồng riêng
+        with self.lock:
+            self.loading = True
+        try:
+            wb = open_workbook_stream(self.path)
+            try:
+                for sheet_name in sheet_names:
+                    sheet = SheetColumns(sheet_name, self.vocab)
+                    for row, values in iter_field_rows(wb, sheet_name, self.settings):
+                        sheet.upsert(row, values)
+                    with self.lock:
+                        self.sheets[sheet_name] = sheet
+            finally:
+                wb.close()
+        except Exception as e:
+            self.error = str(e)
+        with self.lock:
+            self.loading = False
+            for update in self.pending_updates:
+                self._apply(*update)
+            self.pending_updates = []
+        self.ready.set()
+
+    def start_loading(self, sheet_names):
+        threading.Thread(target=self.load, args=(sheet_names,), name='column-store', daemon=True).start()
+
+    def load_archive(self, archive_index, date_from=None, date_to=None):
+        # Nạp (một lần) các tháng lưu trữ giao với khoảng ngày, chỉ mở đúng các workbook tháng đó;
+        # mỗi sheet lưu trữ thành một sheet riêng tên 'SHEET (YYYY-MM)'
+        for month in archive_index.months_between(date_from, date_to):
+            if month in self.archive_months:
+                continue
+            sheets = {}
+            for sheet_name, row, values in archive_index.iter_rows(month):
+                name = f'{sheet_name} ({month})'
+                sheet = sheets.get(name)
+                if sheet is None:
+                    sheet = sheets[name] = SheetColumns(name, self.vocab)
+                sheet.upsert(row, values)
+            with self.lock:
+                self.sheets.update(sheets)
+                self.archive_months.add(month)
+
+    def load_archive_async(self, archive_index, date_from=None, date_to=None):
+        # Như load_archive nhưng đọc ở luồng riêng (mở workbook lưu trữ mất vài giây); trả về Future
+        # để giao diện chờ bằng when_done. Các tháng đã nạp hết thì Future xong ngay
+        future = Future()
+        if all(month in self.archive_months for month in archive_index.months_between(date_from, date_to)):
+            future.set_result(None)
+            return future
+
+        def run():
+            try:
+                self.load_archive(archive_index, date_from, date_to)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(None)
+
+        threading.Thread(target=run, name='column-store-archive', daemon=True).start()
+        return future
+
+    def _apply(self, sheet_name, first_row, rows):
+        sheet = self.sheets.get(sheet_name)
+        if sheet is None:
+            sheet = self.sheets[sheet_name] = SheetColumns(sheet_name, self.vocab)
+        for offset, values in enumerate(rows):
+            if all(v in (None, '') for v in values):
+                sheet.remove(first_row + offset)
+            else:
+                sheet.upsert(first_row + offset, values)
+
+    def update_rows(self, sheet_name, first_row, rows):
+        # rows theo thứ tự FIELDS; dòng toàn rỗng nghĩa là đã xoá
+        with self.lock:
+            if self.loading:
+                self.pending_updates.append((sheet_name, first_row, rows))
+            else:
+                self._apply(sheet_name, first_row, rows)
+
+    def distinct(self, field):
+        with self.lock:
+            return sorted(v for v in self.vocab[field].values if v)
+
+    def query(self, date_from=None, date_to=None, cty=None, nha_xe=None, size=None, loai_hinh=None, location=None, sheets=None):
+        # Lọc theo từng cột trên cả sheet (mỗi điều kiện là một lượt qua mảng mã số);
+        # trả về [(sheet, dòng, [giá trị theo FIELDS])] sắp theo ngày
+        filters = []
+        for field, wanted in (('CTY', cty), ('NHÀ XE', nha_xe), ('Kích cỡ', size), ('Loại hình', loai_hinh)):
+            if wanted:
+                filters.append((field, self.vocab[field].matching(lambda v, w=wanted: v == w)))
+        location_codes = None
+        if location:
+            needle = fold_text(location)
+            location_codes = {
+                field: self.vocab[field].matching(lambda v: needle in fold_text(v))
+                for field in ('NƠI LẤY CONT', 'NƠI HẠ CONT')
+            }
+        lo = date_from.toordinal() if date_from else None
+        hi = date_to.toordinal() if date_to else None
+        results = []
+        with self.lock:
+            for name, sheet in self.sheets.items():
+                if sheets and name not in sheets:
+                    continue
+                alive = sheet.alive
+                positions = [i for i in range(len(sheet)) if alive[i]]
+                if lo is not None or hi is not None:
+                    dates = sheet.dates
+                    lo_ = lo if lo is not None else 1
+                    hi_ = hi if hi is not None else 10 ** 7
+                    positions = [i for i in positions if lo_ <= dates[i] <= hi_]
+                for field, codes in filters:
+                    column = sheet.codes[field]
+                    positions = [i for i in positions if column[i] in codes]
+                if location_codes is not None:
+                    pick, drop = sheet.codes['NƠI LẤY CONT'], sheet.codes['NƠI HẠ CONT']
+                    pick_codes, drop_codes = location_codes['NƠI LẤY CONT'], location_codes['NƠI HẠ CONT']
+                    positions = [i for i in positions if pick[i] in pick_codes or drop[i] in drop_codes]
+                results.extend((sheet.dates[i], name, sheet.rows[i], sheet.values_at(i)) for i in positions)
+        results.sort(key=lambda r: r[:3])
+        return [(name, row, values) for _, name, row, values in results]
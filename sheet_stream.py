@@ -0,0 +1,29 @@
+from container_fields import FIELDS, fold_text, sheet_layout
+
+_CONTAINER_POS = FIELDS.index('MÃ SỐ CONTAINER')
+_CONTAINER_HEADER = fold_text('MÃ SỐ CONTAINER')
+
+
+def open_workbook_stream(path):
+    # Mở workbook chế độ read_only: đọc tuần tự từng dòng, bộ nhớ không tăng theo kích thước file
+    from openpyxl import load_workbook
+    return load_workbook(path, read_only=True, data_only=True)
+
+
+def is_header_row(values):
+    value = values[_CONTAINER_POS]
+    return isinstance(value, str) and fold_text(value) == _CONTAINER_HEADER
+
+
+def iter_field_rows(wb, sheet_name, settings, first_row=1):
+    # (số dòng Excel, [giá trị theo FIELDS]) cho từng dòng có dữ liệu trong khối FIELDS của sheet
+    _, start_col, _ = sheet_layout(settings, sheet_name)
+    ws = wb[sheet_name]
+    rows = ws.iter_rows(min_row=first_row, min_col=start_col, max_col=start_col + len(FIELDS) - 1, values_only=True)
+    for row_no, values in enumerate(rows, start=first_row):
+        if all(v in (None, '') for v in values) or is_header_row(values):
+            continue
+        values = list(values)
+        if len(values) < len(FIELDS):
+            values.extend([None] * (len(FIELDS) - len(values)))
+        yield row_no, values
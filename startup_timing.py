@@ -0,0 +1,30 @@
+import json
+import time
+from datetime import datetime
+
+STARTUP_LOG = 'startup_timing.jsonl'
+
+
+class StartupTimer:
+    # Ghi lại các mốc khởi động (ms tính từ lúc bắt đầu chạy) để theo dõi khi khởi động chậm đi
+    def __init__(self, started_at, log_path=STARTUP_LOG):
+        self.started_at = started_at
+        self.log_path = log_path
+        self.marks = {}
+        self.logged = False
+
+    def mark(self, name, at=None):
+        at = time.perf_counter() if at is None else at
+        self.marks[name] = round((at - self.started_at) * 1000, 1)
+
+    def summary(self):
+        return ', '.join(f'{name}={ms}ms' for name, ms in self.marks.items())
+
+    def log(self):
+        self.logged = True
+        record = {'time': datetime.now().isoformat(timespec='seconds'), 'marks_ms': self.marks}
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError:
+            pass
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+# Các module của tool nằm phẳng ở thư mục gốc repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from container_fields import FIELDS  # noqa: E402
+
+SHEET = 'DATA'
+# Bảng bắt đầu ở cột A, dòng 1 là tiêu đề FIELDS
+SETTINGS = {'sheets': {SHEET: {'start_row': 2, 'start_col': 1}}}
+
+
+def make_row(tag, date='15/10/2026', sheet=SHEET):
+    # Một dòng theo thứ tự FIELDS; tag giúp nhận ra dòng trong kết quả
+    return [date, sheet, 'GH', f'BK-{tag}', f'CONT-{tag}', f'SEAL-{tag}', 'X', '1', '40', 'CAT LAI', 'ICD']
+
+
+@pytest.fixture
+def settings():
+    return {'sheets': {name: dict(s) for name, s in SETTINGS['sheets'].items()}}
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    # create({sheet: [dòng hoặc None cho dòng trống]}) -> đường dẫn file xlsx có tiêu đề ở dòng 1
+    openpyxl = pytest.importorskip('openpyxl')
+
+    def create(rows_by_sheet, name='book.xlsx'):
+        wb = openpyxl.Workbook()
+        wb.remove(wb.active)
+        for sheet_name, rows in rows_by_sheet.items():
+            ws = wb.create_sheet(sheet_name)
+            for c, field in enumerate(FIELDS, start=1):
+                ws.cell(row=1, column=c).value = field
+            for r, values in enumerate(rows, start=2):
+                for c, value in enumerate(values or [], start=1):
+                    ws.cell(row=r, column=c).value = value
+        path = str(tmp_path / name)
+        wb.save(path)
+        return path
+
+    return create
+
+
+@pytest.fixture
+def fake_manager(tmp_path):
+    # ExcelManager trên Book giả của benchmarks (không cần Excel/openpyxl)
+    from benchmarks.fake_xlwings import FakeBook
+    from excel_manager import ExcelManager, XlwingsBackend
+
+    def create(rows_by_sheet):
+        book = FakeBook()
+        for sheet_name, rows in rows_by_sheet.items():
+            book.add_sheet(sheet_name, [list(FIELDS)] + [list(values) if values else [] for values in rows])
+        path = str(tmp_path / 'fake.xlsx')
+        return ExcelManager(path, backend=XlwingsBackend(path, book=book))
+
+    return create
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import pytest
+
+from archive import ArchiveIndex, apply_result, archive_before, split_sheet
+from conftest import SHEET, make_row
+from container_fields import FIELDS
+
+
+def test_rows_above_start_row_are_archived(fake_manager, settings):
+    # start_row đã trôi xuống dòng 6: các dòng cũ ở dòng 2-5 vẫn phải được xét
+    settings['sheets'][SHEET].update({'start_row': 6, 'first_row': 6})
+    rows = [make_row('A', '01/01/2026'), make_row('B', '20/06/2026'), None,
+            make_row('C', '02/02/2026'), make_row('D', '05/07/2026')]
+    excel_mgr = fake_manager({SHEET: rows})
+    first_row, nrows, old, keep = split_sheet(excel_mgr, settings, SHEET, datetime(2026, 6, 1))
+    assert (first_row, nrows) == (2, 5)
+    assert {month: [r[4] for r in rows] for month, rows in old.items()} == {
+        '2026-01': ['CONT-A'], '2026-02': ['CONT-C']}
+    assert [r[4] for r in keep] == ['CONT-B', 'CONT-D']
+
+
+def test_archive_compacts_sheet_below_header(tmp_path, fake_manager, settings):
+    pytest.importorskip('openpyxl')
+    settings['sheets'][SHEET].update({'start_row': 5, 'first_row': 5})
+    excel_mgr = fake_manager({SHEET: [make_row('A', '01/01/2026'), make_row('B', '20/06/2026'),
+                                      make_row('C', '02/02/2026')]})
+    index = ArchiveIndex(str(tmp_path / 'archive'), excel_mgr.file_path)
+    result = archive_before(excel_mgr, settings, [SHEET], datetime(2026, 6, 1), index)
+    assert result[SHEET] == {'archived': 2, 'kept': 1, 'start_row': 3}
+    assert excel_mgr.read_rows(SHEET, 1, 5, 3, 1) == [['MÃ SỐ CONTAINER'], ['CONT-B'], [None]]
+    assert excel_mgr.read_rows(SHEET, 1, 1, 1, len(FIELDS))[0] == list(FIELDS)
+    assert [r[4] for r in index.read_rows('2026-01', SHEET)] == ['CONT-A']
+
+    apply_result(settings, result)
+    assert settings['sheets'][SHEET] == {'start_row': 3, 'start_col': 1}
@@ -0,0 +1,45 @@
+import csv
+
+from bulk_import import container_check_digit, import_file, is_valid_container
+from conftest import SHEET, make_row
+from container_fields import FIELDS
+from write_queue import WriteBehindQueue
+
+
+def container(n):
+    base = f'ABCU{n:06d}'
+    return base + str(container_check_digit(base))
+
+
+def write_source(path, containers):
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        for code in containers:
+            writer.writerow(['16/10/2026', SHEET, 'GH', 'BK1', code, 'S-' + code, 'Xuất', '1', '40', 'A', 'B'])
+
+
+def test_check_digit():
+    assert is_valid_container('MSKU1234565')
+    assert not is_valid_container('MSKU1234560')
+    assert not is_valid_container('MSK1234565')
+
+
+def test_import_does_not_overwrite_rows_below_a_hole(tmp_path, fake_manager, settings):
+    excel_mgr = fake_manager({SHEET: [make_row(f'OLD{r}') for r in range(2, 11)]})
+    excel_mgr.clear_rows(SHEET, 5, 1, 1, len(FIELDS))
+    writer = WriteBehindQueue(lambda: excel_mgr, excel_mgr.file_path + '.journal')
+    source = str(tmp_path / 'list.csv')
+    write_source(source, [container(1), 'BADCODE', container(2), container(3)])
+
+    first_row, count, rejects, report_path = import_file(source, SHEET, settings, writer)
+    writer.flush()
+    writer.close()
+
+    assert (first_row, count) == (11, 3)
+    assert [line_no for line_no, _, _ in rejects] == [3]
+    assert report_path.endswith('.errors.csv')
+    containers = [line[0] for line in excel_mgr.read_rows(SHEET, 2, 5, 12, 1)]
+    assert containers[:9] == ['CONT-OLD2', 'CONT-OLD3', 'CONT-OLD4', None, 'CONT-OLD6', 'CONT-OLD7',
+                              'CONT-OLD8', 'CONT-OLD9', 'CONT-OLD10']
+    assert containers[9:] == [container(1), container(2), container(3)]
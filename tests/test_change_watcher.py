@@ -0,0 +1,51 @@
+import pytest
+
+from change_watcher import ChangeWatcher, changed_sheets, diff_rows, make_baseline, read_snapshot
+from conftest import SHEET, make_row
+from excel_manager import ExcelManager
+from write_queue import WriteBehindQueue
+
+
+def test_diff_rows_groups_changed_runs():
+    old = [make_row(i) for i in range(600)]
+    new = [list(row) for row in old] + [make_row('new')]
+    new[3][4] = 'X'
+    new[4][4] = 'Y'
+    new[300][5] = 'Z'
+    runs = diff_rows(old, new)
+    assert [(offset, len(new_rows)) for offset, _, new_rows in runs] == [(3, 2), (300, 1), (600, 1)]
+    assert runs[-1][1] == [[None] * len(make_row(0))]
+
+
+def test_only_edited_sheet_is_reported(workbook):
+    openpyxl = pytest.importorskip('openpyxl')
+    path = workbook({SHEET: [make_row(1)], 'OTHER': [make_row(2)]})
+    baseline = make_baseline(*read_snapshot(path))
+    wb = openpyxl.load_workbook(path)
+    wb['OTHER'].cell(row=2, column=8).value = 5
+    wb.save(path)
+    assert changed_sheets(baseline, *read_snapshot(path)) == {'OTHER'}
+
+
+def test_external_edit_is_merged_with_pending_writes(workbook, settings):
+    openpyxl = pytest.importorskip('openpyxl')
+    path = workbook({SHEET: [make_row(1), make_row(2)]})
+    writer = WriteBehindQueue(lambda: ExcelManager(path, backend='openpyxl'), path + '.journal', max_delay=60, max_ops=1000)
+    writer.wait_ready()
+    watcher = ChangeWatcher(path, settings, [SHEET], writer)
+    assert watcher.poll() is None  # lần đầu: ghi nhận mốc
+    writer.call(lambda excel_mgr: None)
+    assert writer.append(SHEET, 2, 1, [make_row(3)]) == 4
+    writer.call(lambda excel_mgr: None)
+
+    wb = openpyxl.load_workbook(path)
+    wb[SHEET].cell(row=2, column=5).value = 'EDITED'
+    wb.save(path)
+    changes = watcher.poll().result()
+    assert [(first, old[0][4], new[0][4]) for first, old, new in changes[SHEET]] == [(2, 'CONT-1', 'EDITED')]
+    assert writer.status()['pending'] == 0
+    assert watcher.poll() is None  # lần lưu của chính tool không bị coi là sửa bên ngoài
+    writer.close()
+
+    ws = openpyxl.load_workbook(path)[SHEET]
+    assert [ws.cell(row=r, column=5).value for r in (2, 3, 4)] == ['EDITED', 'CONT-2', 'CONT-3']
@@ -0,0 +1,43 @@
+import threading
+
+import pytest
+
+from conftest import SHEET, make_row
+from entry_server import EntryClient, EntryServer
+from write_queue import WriteBehindQueue
+
+
+@pytest.fixture
+def served(fake_manager):
+    excel_mgr = fake_manager({SHEET: [make_row(1)]})
+    writer = WriteBehindQueue(lambda: excel_mgr, excel_mgr.file_path + '.journal', max_delay=60, max_ops=1000)
+    server = EntryServer(writer, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = EntryClient(f'http://127.0.0.1:{server.server_address[1]}')
+    client.wait_ready()
+    yield excel_mgr, client
+    client.close()
+    server.shutdown()
+    server.server_close()
+    writer.close()
+
+
+def test_writes_only_go_through_submit(served):
+    excel_mgr, client = served
+    for method, args in (('write_rows', [SHEET, 3, 1, [make_row(2)]]), ('save', []), ('preview_rows', [SHEET, 2, 1, 11])):
+        with pytest.raises(Exception, match='không hỗ trợ'):
+            client.call(method, *args)
+    with pytest.raises(AttributeError):
+        client.manager.write_rows
+
+    assert client.append(SHEET, 2, 1, [make_row(2)]) == 3
+    assert client.flush() == 1
+    assert excel_mgr.backend.wb.saves == 1
+    assert client.call('read_rows', SHEET, 2, 5, 2, 1) == [['CONT-1'], ['CONT-2']]
+
+
+def test_status_is_polled_in_background(served):
+    _, client = served
+    client.closed = True  # luồng nền dừng: status() vẫn trả về ngay giá trị đã lưu
+    status = client.status()
+    assert status['ready'] and status['error'] is None
@@ -0,0 +1,73 @@
+import pytest
+
+from conftest import SHEET, make_row
+from container_fields import FIELDS
+from excel_manager import ExcelManager, RowBuffer
+from fill_index import ColumnFill, FillIndex
+
+
+def test_column_fill_tracks_holes():
+    fill = ColumnFill.from_values(['H', 'a', None, 'b', '', 'c'])
+    assert (fill.end, fill.holes) == (7, [3, 5])
+    assert fill.next_free(2) == 3
+    fill.mark_filled(3)
+    assert fill.next_free(2) == 5
+    fill.mark_empty(6)
+    assert (fill.end, fill.holes) == (5, [])
+
+
+def test_fill_index_persists_with_stamp(tmp_path):
+    index = FillIndex(str(tmp_path / 'idx.json'))
+    index.build(SHEET, 1, ['H', 'a', None, 'b'])
+    index.save([1, 2])
+    loaded = FillIndex(index.path)
+    assert not loaded.load([1, 3])
+    assert loaded.load([1, 2])
+    assert loaded.next_free(SHEET, 1, 2) == 3
+
+
+def test_openpyxl_backend_round_trip(workbook):
+    path = workbook({SHEET: [make_row(1), make_row(2)]})
+    excel_mgr = ExcelManager(path, backend='openpyxl')
+    assert excel_mgr.read_rows(SHEET, 2, 1, 1, len(FIELDS))[0] == make_row(1)
+    assert excel_mgr.get_last_empty_row(SHEET, 2, 1, len(FIELDS)) == 4
+    excel_mgr.write_rows(SHEET, 4, 1, [make_row(3)])
+    excel_mgr.clear_rows(SHEET, 2, 1, 1, len(FIELDS))
+    assert excel_mgr.get_last_empty_row(SHEET, 2, 1, len(FIELDS)) == 2
+    excel_mgr.save()
+    excel_mgr.close()
+
+    reopened = ExcelManager(path, backend='openpyxl')
+    assert reopened.read_rows(SHEET, 2, 1, 3, 1) == [[None], ['15/10/2026'], ['15/10/2026']]
+    assert reopened.read_cell(SHEET, 4, 5) == 'CONT-3'
+
+
+def test_save_refuses_to_overwrite_external_edit(workbook):
+    openpyxl = pytest.importorskip('openpyxl')
+    path = workbook({SHEET: [make_row(1)]})
+    excel_mgr = ExcelManager(path, backend='openpyxl')
+    excel_mgr.write_rows(SHEET, 3, 1, [make_row(2)])
+    wb = openpyxl.load_workbook(path)
+    wb[SHEET].cell(row=2, column=5).value = 'EDITED'
+    wb.save(path)
+    with pytest.raises(Exception):
+        excel_mgr.save()
+    excel_mgr.reload()
+    assert excel_mgr.read_cell(SHEET, 2, 5) == 'EDITED'
+    excel_mgr.save()
+
+
+def test_unknown_backend_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ExcelManager(str(tmp_path / 'x.xlsx'), backend='nope')
+
+
+def test_row_buffer_writes_each_run_once(fake_manager):
+    excel_mgr = fake_manager({SHEET: []})
+    stats = excel_mgr.backend.wb.stats
+    buffer = RowBuffer(excel_mgr, SHEET, 1)
+    for row in (2, 3, 4, 8):
+        buffer.stage(row, make_row(row))
+    before = stats.calls['range.value.set']
+    assert [(first, len(block)) for first, block in buffer.flush()] == [(2, 3), (8, 1)]
+    assert stats.calls['range.value.set'] - before == 2
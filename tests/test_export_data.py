@@ -0,0 +1,88 @@
+import csv
+import os
+
+import pytest
+
+import export_data
+from conftest import SHEET, make_row
+from export_data import ExportState, export_workbook
+
+
+def read_export(path):
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return [(line[1], line[6]) for line in list(csv.reader(f))[1:]]
+
+
+def edit(path, row, col, value):
+    openpyxl = pytest.importorskip('openpyxl')
+    wb = openpyxl.load_workbook(path)
+    wb[SHEET].cell(row=row, column=col).value = value
+    wb.save(path)
+
+
+def export(path, settings, out_dir):
+    state = ExportState(path + '.export_state.json')
+    return export_workbook(path, settings, str(out_dir), incremental=True, sheet_names=[SHEET], state=state)
+
+
+def test_incremental_export_picks_up_hole_fills(tmp_path, workbook, settings):
+    path = workbook({SHEET: [make_row(1), None, make_row(3)]})
+    [(_, count, out_path, _)] = export(path, settings, tmp_path / 'first')
+    assert count == 2 and os.path.basename(out_path).startswith(f'{SHEET}_full_')
+
+    edit(path, 3, 5, 'CONT-HOLE')  # dòng mới lấp vào lỗ trống phía trên dòng cuối đã xuất
+    edit(path, 5, 5, 'CONT-5')
+    [(_, count, out_path, note)] = export(path, settings, tmp_path / 'second')
+    assert (count, note) == (2, '')
+    assert '_full_' not in out_path
+    assert read_export(out_path) == [('3', 'CONT-HOLE'), ('5', 'CONT-5')]
+
+    [(_, count, out_path, _)] = export(path, settings, tmp_path / 'third')
+    assert (count, out_path) == (0, None)
+
+
+def test_edited_export_falls_back_to_full_file(tmp_path, workbook, settings):
+    path = workbook({SHEET: [make_row(1), make_row(2)]})
+    export(path, settings, tmp_path / 'first')
+    edit(path, 2, 5, 'CONT-EDITED')
+    [(_, count, out_path, note)] = export(path, settings, tmp_path / 'second')
+    assert count == 2 and note
+    assert os.path.basename(out_path).startswith(f'{SHEET}_full_')
+    assert read_export(out_path) == [('2', 'CONT-EDITED'), ('3', 'CONT-2')]
+    assert os.listdir(tmp_path / 'second') == [os.path.basename(out_path)]
+
+
+def test_deleted_row_falls_back_to_full_file(tmp_path, workbook, settings):
+    path = workbook({SHEET: [make_row(1), make_row(2), make_row(3)]})
+    export(path, settings, tmp_path / 'first')
+    openpyxl = pytest.importorskip('openpyxl')
+    wb = openpyxl.load_workbook(path)
+    for c in range(1, 12):
+        wb[SHEET].cell(row=3, column=c).value = None
+    wb.save(path)
+    [(_, count, out_path, _)] = export(path, settings, tmp_path / 'second')
+    assert count == 2 and '_full_' in out_path
+
+
+def test_state_is_kept_per_block(tmp_path, workbook, settings, monkeypatch):
+    monkeypatch.setattr(export_data, 'BLOCK_ROWS', 4)
+    rows = [make_row(i) for i in range(2, 12)]
+    rows[3] = None  # dòng 5 trống
+    path = workbook({SHEET: rows})
+    export(path, settings, tmp_path / 'first')
+    state = ExportState(path + '.export_state.json').sheets[SHEET]
+    assert (state['last_row'], len(state['blocks']), state['holes']) == (11, 3, [[1, 1], [5, 5]])
+
+    edit(path, 5, 5, 'CONT-HOLE')
+    edit(path, 13, 5, 'CONT-13')
+    [(_, count, out_path, _)] = export(path, settings, tmp_path / 'second')
+    assert read_export(out_path) == [('5', 'CONT-HOLE'), ('13', 'CONT-13')]
+    state = ExportState(path + '.export_state.json').sheets[SHEET]
+    assert (state['last_row'], len(state['blocks']), state['holes']) == (13, 4, [[1, 1], [12, 12]])
+
+
+def test_plain_export_keeps_no_state(tmp_path, workbook, settings):
+    path = workbook({SHEET: [make_row(1)]})
+    [(_, count, out_path, _)] = export_workbook(path, settings, str(tmp_path / 'out'), sheet_names=[SHEET])
+    assert count == 1 and os.path.basename(out_path) == f'{SHEET}.csv'
+    assert not os.path.exists(path + '.export_state.json')
@@ -0,0 +1,52 @@
+import pytest
+
+import monthly_report
+from conftest import SHEET, make_row
+from monthly_report import build_month_summary, summary_sheet_name
+from workbook_meta import visible_sheet_names
+
+
+def test_edit_above_last_row_invalidates_cache(workbook, settings):
+    openpyxl = pytest.importorskip('openpyxl')
+    path = workbook({SHEET: [make_row(1), make_row(2), make_row('9', date='01/09/2026')]})
+    counts, pick, _ = build_month_summary(path, settings, '2026-10')
+    assert counts == {(SHEET, 'GH', '40', 'X'): 2}
+    assert pick == {'CAT LAI': 2}
+
+    # Dòng cuối giữ nguyên, chỉ sửa một dòng phía trên
+    wb = openpyxl.load_workbook(path)
+    wb[SHEET].cell(row=2, column=10).value = 'HIEP PHUOC'
+    wb.save(path)
+    counts, pick, _ = build_month_summary(path, settings, '2026-10')
+    assert counts == {(SHEET, 'GH', '40', 'X'): 2}
+    assert pick == {'CAT LAI': 1, 'HIEP PHUOC': 1}
+
+
+def test_appended_rows_are_aggregated_incrementally(workbook, settings, monkeypatch):
+    openpyxl = pytest.importorskip('openpyxl')
+    path = workbook({SHEET: [make_row(1), None, make_row(3)]})
+    build_month_summary(path, settings, '2026-10')
+
+    chunks = []
+    aggregate = monthly_report.aggregate
+    monkeypatch.setattr(monthly_report, 'aggregate', lambda rows, months: chunks.append(len(rows)) or aggregate(rows, months))
+    wb = openpyxl.load_workbook(path)
+    wb[SHEET].append(make_row(5))
+    wb.save(path)
+    counts, _, _ = build_month_summary(path, settings, '2026-10')
+    assert counts == {(SHEET, 'GH', '40', 'X'): 3}
+    assert chunks == [1]  # chỉ dòng mới được gộp
+
+    # Dòng mới lấp vào lỗ trống phía trên: gộp lại cả sheet
+    wb = openpyxl.load_workbook(path)
+    for c, value in enumerate(make_row(2), start=1):
+        wb[SHEET].cell(row=3, column=c).value = value
+    wb.save(path)
+    counts, _, _ = build_month_summary(path, settings, '2026-10')
+    assert counts == {(SHEET, 'GH', '40', 'X'): 4}
+    assert chunks == [1, 4]
+
+
+def test_summary_sheets_are_not_data_sheets(workbook):
+    path = workbook({SHEET: [make_row(1)], summary_sheet_name('2026-10'): []})
+    assert visible_sheet_names(path) == [SHEET]
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+import pytest
+
+from archive import ArchiveIndex
+from conftest import SHEET, make_row
+from query_engine import ColumnStore
+
+
+def test_archive_months_load_in_background(tmp_path, workbook, settings):
+    pytest.importorskip('openpyxl')
+    path = workbook({SHEET: [make_row(1)]})
+    index = ArchiveIndex(str(tmp_path / 'archive'), path)
+    index.write_month('2026-01', {SHEET: [make_row('OLD', '05/01/2026')]})
+    store = ColumnStore(path, settings)
+    store.load([SHEET])
+
+    future = store.load_archive_async(index, datetime(2026, 1, 1), datetime(2026, 1, 31))
+    assert future.result(timeout=10) is None
+    results = store.query(date_from=datetime(2026, 1, 1), date_to=datetime(2026, 1, 31))
+    assert [(sheet, values[4]) for sheet, _, values in results] == [(f'{SHEET} (2026-01)', 'CONT-OLD')]
+    assert store.load_archive_async(index, datetime(2026, 1, 1)).done()  # tháng đã nạp: không mở lại
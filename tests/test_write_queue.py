@@ -0,0 +1,132 @@
+import json
+
+import pytest
+
+from conftest import SHEET, make_row
+from container_fields import FIELDS
+from excel_manager import ExcelManager
+from fill_index import ColumnFill
+from write_queue import Journal, WriteBehindQueue
+
+
+def open_queue(path, **kwargs):
+    kwargs.setdefault('max_delay', 60)
+    kwargs.setdefault('max_ops', 1000)
+    return WriteBehindQueue(lambda: ExcelManager(path, backend='openpyxl'), path + '.journal', **kwargs)
+
+
+def read_column(path, col, first_row, last_row):
+    openpyxl = pytest.importorskip('openpyxl')
+    ws = openpyxl.load_workbook(path)[SHEET]
+    return [ws.cell(row=r, column=col).value for r in range(first_row, last_row + 1)]
+
+
+def test_journal_skips_torn_last_line(tmp_path):
+    path = str(tmp_path / 'j.journal')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'seq': 1, 'method': 'write_rows', 'args': [SHEET, 2, 1, [['a']]]}) + '\n')
+        f.write(json.dumps({'commit': 1}) + '\n')
+        f.write(json.dumps({'seq': 2, 'method': 'write_rows', 'args': [SHEET, 3, 1, [['b']]]}) + '\n')
+        f.write('{"seq": 3, "meth')
+    entries, committed = Journal(path).read()
+    assert committed == 1
+    assert [e['seq'] for e in entries] == [1, 2]
+
+
+def test_append_is_replayed_after_crash(workbook):
+    path = workbook({SHEET: [make_row(1)]})
+    crashed = open_queue(path)
+    assert crashed.append(SHEET, 2, 1, [make_row(2), make_row(3)]) == 3
+    crashed.call(lambda excel_mgr: None)  # đã áp dụng vào bộ nhớ nhưng chưa lưu
+    assert read_column(path, 5, 2, 4) == ['CONT-1', None, None]
+
+    # Mở lại như sau khi chương trình bị tắt ngang: nhật ký được phát lại rồi lưu
+    writer = open_queue(path)
+    writer.wait_ready()
+    assert writer.status()['pending'] == 0
+    writer.close()
+    assert read_column(path, 5, 2, 4) == ['CONT-1', 'CONT-2', 'CONT-3']
+
+
+def test_failed_replay_reports_error_and_keeps_journal(workbook):
+    path = workbook({SHEET: [make_row(1)]})
+    with open(path + '.journal', 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'seq': 1, 'method': 'write_rows', 'args': ['MISSING', 2, 1, [make_row(2)]]}) + '\n')
+    writer = open_queue(path)
+    assert writer.ready.wait(10)
+    with pytest.raises(Exception, match='MISSING'):
+        writer.wait_ready()
+    with pytest.raises(Exception):
+        writer.call('last_row', SHEET)
+    assert writer.status()['error']
+    writer.close()
+    assert Journal(path + '.journal').read() == ([{'seq': 1, 'method': 'write_rows', 'args': ['MISSING', 2, 1, [make_row(2)]]}], 0)
+
+
+def test_new_sheet_is_replayed_after_crash(workbook):
+    openpyxl = pytest.importorskip('openpyxl')
+    path = workbook({SHEET: [make_row(1)]})
+    crashed = open_queue(path)
+    crashed.submit('ensure_sheet', 'TONG HOP 10-2026')
+    crashed.submit('write_rows', 'TONG HOP 10-2026', 1, 1, [['TỔNG HỢP THÁNG 10/2026']])
+    crashed.call(lambda excel_mgr: None)
+
+    writer = open_queue(path)
+    writer.wait_ready()
+    writer.close()
+    assert openpyxl.load_workbook(path)['TONG HOP 10-2026'].cell(row=1, column=1).value == 'TỔNG HỢP THÁNG 10/2026'
+
+
+def test_writes_are_grouped_into_one_save(fake_manager):
+    excel_mgr = fake_manager({SHEET: [make_row(1)]})
+    writer = WriteBehindQueue(lambda: excel_mgr, excel_mgr.file_path + '.journal', max_delay=60, max_ops=1000)
+    for i in range(5):
+        writer.append(SHEET, 2, 1, [make_row(i + 2)])
+    assert writer.flush() == 5
+    writer.close()
+    assert excel_mgr.backend.wb.saves == 1
+    assert excel_mgr.read_rows(SHEET, 2, 5, 6, 1) == [[f'CONT-{i}'] for i in range(1, 7)]
+
+
+def test_append_writes_stt_column(fake_manager):
+    excel_mgr = fake_manager({SHEET: []})
+    writer = WriteBehindQueue(lambda: excel_mgr, excel_mgr.file_path + '.journal')
+    row = writer.append(SHEET, 2, 2, [make_row(1)[:len(FIELDS)]], stt_offset=1)
+    writer.flush()
+    writer.close()
+    assert excel_mgr.read_rows(SHEET, row, 1, 1, 2) == [['1', '15/10/2026']]
+
+
+def test_block_append_skips_holes_too_small(fake_manager):
+    # Dòng 5 bị xoá (hoàn tác) giữa các dòng 2-10: khối 3 dòng không được ghi đè các dòng 6, 7
+    excel_mgr = fake_manager({SHEET: [make_row(f'OLD{r}') for r in range(2, 11)]})
+    excel_mgr.clear_rows(SHEET, 5, 1, 1, len(FIELDS))
+    writer = WriteBehindQueue(lambda: excel_mgr, excel_mgr.file_path + '.journal')
+    first = writer.append(SHEET, 2, 1, [make_row(f'NEW{i}') for i in range(3)])
+    assert first == 11
+    assert writer.append(SHEET, 2, 1, [make_row('ONE')]) == 5  # một dòng vẫn lấp được lỗ
+    writer.flush()
+    writer.close()
+    containers = [line[0] for line in excel_mgr.read_rows(SHEET, 2, 5, 12, 1)]
+    assert containers == ['CONT-OLD2', 'CONT-OLD3', 'CONT-OLD4', 'CONT-ONE', 'CONT-OLD6', 'CONT-OLD7',
+                          'CONT-OLD8', 'CONT-OLD9', 'CONT-OLD10', 'CONT-NEW0', 'CONT-NEW1', 'CONT-NEW2']
+
+
+def test_block_append_uses_long_enough_hole(fake_manager):
+    rows = [make_row(f'OLD{r}') for r in range(2, 11)]
+    excel_mgr = fake_manager({SHEET: rows})
+    excel_mgr.clear_rows(SHEET, 4, 1, 3, len(FIELDS))
+    writer = WriteBehindQueue(lambda: excel_mgr, excel_mgr.file_path + '.journal')
+    assert writer.append(SHEET, 2, 1, [make_row('A'), make_row('B')]) == 4
+    # Dòng 6 còn trống nhưng đã bị giữ chỗ: khối tiếp theo không được chồng lên dòng 4-5
+    assert writer.append(SHEET, 2, 1, [[''] + make_row('C')[1:]]) == 6
+    assert writer.append(SHEET, 2, 1, [make_row('D')]) == 11
+    writer.close()
+
+
+def test_fill_run_reaches_past_end():
+    fill = ColumnFill(10, [3, 8, 9])
+    assert fill.next_run(2, 1) == 3
+    assert fill.next_run(2, 2) == 8
+    assert fill.next_run(2, 5) == 8
+    assert fill.next_run(12, 2) == 12
@@ -0,0 +1,71 @@
+import json
+import os
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+from fill_index import file_stamp
+
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+# Sheet báo cáo tháng (monthly_report) không chứa dữ liệu container
+SUMMARY_PREFIX = 'TONG HOP '
+
+
+def read_sheet_states(path):
+    # Đọc thẳng xl/workbook.xml trong file xlsx: [(tên sheet, 'visible'|'hidden'|'veryHidden'), ...]
+    with zipfile.ZipFile(path) as archive:
+        root = ET.fromstring(archive.read('xl/workbook.xml'))
+    sheets = root.find(f'{_MAIN_NS}sheets')
+    if sheets is None:
+        return []
+    return [(sheet.get('name'), sheet.get('state', 'visible')) for sheet in sheets.findall(f'{_MAIN_NS}sheet')]
+
+
+def read_sheet_parts(archive):
+    # {tên sheet: đường dẫn file xml của sheet trong xlsx} từ workbook.xml và workbook.xml.rels (archive là ZipFile đã mở)
+    root = ET.fromstring(archive.read('xl/workbook.xml'))
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    targets = {rel.get('Id'): rel.get('Target') for rel in rels.findall(f'{_PKG_REL_NS}Relationship')}
+    sheets = root.find(f'{_MAIN_NS}sheets')
+    parts = {}
+    for sheet in sheets.findall(f'{_MAIN_NS}sheet') if sheets is not None else []:
+        target = targets.get(sheet.get(f'{_REL_NS}id'))
+        if not target:
+            continue
+        # Excel ghi đường dẫn tương đối với xl/, openpyxl ghi đường dẫn tuyệt đối /xl/...
+        parts[sheet.get('name')] = target[1:] if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+    return parts
+
+
+def load_sheet_states(path):
+    # Như read_sheet_states nhưng dùng lại kết quả trong <file>.meta.json nếu file chưa đổi (mtime/size)
+    stamp = file_stamp(path)
+    if stamp is None:
+        return []
+    meta_path = path + '.meta.json'
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('stamp') == stamp:
+            return [tuple(item) for item in meta['sheets']]
+    except (OSError, ValueError, KeyError):
+        pass
+    try:
+        states = read_sheet_states(path)
+    except (OSError, KeyError, zipfile.BadZipFile, ET.ParseError):
+        return []
+    try:
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'stamp': stamp, 'sheets': states}, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+    except OSError:
+        pass
+    return states
+
+
+def visible_sheet_names(path):
+    # Các sheet dữ liệu đang hiện: bỏ sheet ẩn và sheet tổng hợp tháng
+    return [name for name, state in load_sheet_states(path) if state == 'visible' and not name.startswith(SUMMARY_PREFIX)]
@@ -0,0 +1,324 @@
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from excel_manager import RowBuffer
+
+_STOP = object()
+
+
+class Journal:
+    # Nhật ký chỉ ghi nối: mỗi thao tác một dòng JSON, thêm dòng {"commit": seq} sau mỗi lần lưu workbook
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def read(self):
+        entries = []
+        committed = 0
+        if not os.path.exists(self.path):
+            return entries, committed
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Dòng cuối có thể bị cắt dở nếu chương trình chết khi đang ghi
+                    break
+                if 'commit' in record:
+                    committed = max(committed, record['commit'])
+                else:
+                    entries.append(record)
+        return entries, committed
+
+    def open(self):
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def append(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def truncate(self):
+        self.file.close()
+        self.file = open(self.path, 'w', encoding='utf-8')
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class WriteBehindQueue:
+    # Luồng nền sở hữu ExcelManager: thao tác ghi được ghi nhật ký rồi trả về ngay,
+    # luồng nền gom lại ghi theo lô và chỉ lưu workbook theo thời gian/số lượng thao tác
+    def __init__(self, factory, journal_path, max_delay=2.0, max_ops=50):
+        self.factory = factory
+        self.max_delay = max_delay
+        self.max_ops = max_ops
+        self.queue = queue.Queue()
+        self.excel_mgr = None
+        self.error = None
+        self.failed = False
+        self.ready = threading.Event()
+        self.ready_at = None  # time.perf_counter() lúc mở xong Excel
+        self.lock = threading.Lock()  # bảo vệ seq và file nhật ký
+        self.alloc_lock = threading.Lock()  # cấp phát dòng trống là nguyên tử
+        self.journal = Journal(journal_path)
+        self.replay, self.committed_seq = self.journal.read()
+        self.replay = [e for e in self.replay if e['seq'] > self.committed_seq]
+        self.seq = max([self.committed_seq] + [e['seq'] for e in self.replay])
+        self.applied_seq = self.committed_seq  # thao tác cuối đã áp dụng vào workbook (chỉ luồng nền ghi)
+        self.journal.open()
+        self.thread = threading.Thread(target=self._run, name='excel-writer', daemon=True)
+        self.thread.start()
+
+    # ---- API cho luồng giao diện ----
+
+    def status(self):
+        return {
+            'ready': self.ready.is_set(),
+            'pending': self.seq - self.committed_seq,
+            'committed': self.committed_seq,
+            'error': self.error,
+        }
+
+    def wait_ready(self):
+        self.ready.wait()
+        if self.excel_mgr is None:
+            raise Exception(f'Không mở được file Excel: {self.error}')
+        return self.excel_mgr
+
+    def submit(self, method, *args):
+        # Chỉ dành cho thao tác phát lại được nhiều lần: ghi có vị trí tuyệt đối (write_rows, clear_rows)
+        # và ensure_sheet (để lần phát lại sau có sẵn sheet cho các write_rows phía sau)
+        excel_mgr = self.wait_ready()
+        if method == 'write_rows':
+            sheet_name, row, col, rows = args
+            excel_mgr.fill_index.update(sheet_name, row, col, rows)
+        elif method == 'clear_rows':
+            sheet_name, row, col, nrows, ncols = args
+            excel_mgr.fill_index.update(sheet_name, row, col, [[None] * ncols for _ in range(nrows)])
+        with self.lock:
+            self.seq += 1
+            record = {'seq': self.seq, 'method': method, 'args': list(args)}
+            self.journal.append(record)
+            self.queue.put(('op', record))
+        return record['seq']
+
+    def append(self, sheet_name, start_row, start_col, rows, stt_offset=0):
+        # Cấp phát dải len(rows) dòng trống liên tiếp và ghi cả khối rows vào đó; trả về dòng đầu tiên.
+        # Lỗ một dòng (do hoàn tác/xoá) không đủ chỗ cho cả khối thì bỏ qua, không ghi đè các dòng bên dưới
+        excel_mgr = self.wait_ready()
+        width = len(rows[0])
+        with self.alloc_lock:
+            row = excel_mgr.fill_index.next_run(sheet_name, start_col, start_row, len(rows))
+            if row is None:
+                self.call('get_last_empty_row', sheet_name, start_row, start_col, width)  # dựng chỉ mục
+                row = excel_mgr.fill_index.next_run(sheet_name, start_col, start_row, len(rows))
+            block = [list(values) for values in rows]
+            if stt_offset:
+                for i, values in enumerate(block):
+                    values.insert(0, str(row + i - start_row + 1))  # STT vào cột A
+            self.submit('write_rows', sheet_name, row, start_col - stt_offset, block)
+            excel_mgr.fill_index.reserve(sheet_name, start_col, row, len(block))
+        return row
+
+    def next_free(self, sheet_name, start_col, start_row):
+        # Dòng trống tiếp theo theo chỉ mục (None nếu chưa mở xong Excel hoặc cột chưa có chỉ mục)
+        if self.excel_mgr is None:
+            return None
+        return self.excel_mgr.fill_index.next_free(sheet_name, start_col, start_row)
+
+    def call_async(self, method, *args):
+        # method là tên phương thức của ExcelManager hoặc hàm nhận excel_mgr làm tham số đầu
+        future = Future()
+        self.queue.put(('call', (method, args, future)))
+        return future
+
+    def call(self, method, *args):
+        return self.call_async(method, *args).result()
+
+    def flush(self):
+        future = Future()
+        self.queue.put(('flush', future))
+        return future.result()
+
+    def reload_workbook(self, excel_mgr):
+        # Chỉ gọi trên luồng nền (trong hàm truyền cho call/call_async): đọc lại file bị sửa bên ngoài tool,
+        # phát lại các thao tác đã áp dụng nhưng chưa lưu (còn trong nhật ký) rồi lưu ngay
+        excel_mgr.reload()
+        entries, _ = self.journal.read()
+        for record in entries:
+            if self.committed_seq < record['seq'] <= self.applied_seq:
+                getattr(excel_mgr, record['method'])(*record['args'], track=False)
+        self.error = None
+        self._commit(self.applied_seq)
+
+    def close(self):
+        self.queue.put((_STOP, None))
+        self.thread.join()
+        self.journal.close()
+
+    # ---- Luồng nền ----
+
+    def _run(self):
+        try:
+            import pythoncom  # xlwings cần khởi tạo COM trong từng luồng
+            pythoncom.CoInitialize()
+        except ImportError:
+            pythoncom = None
+        try:
+            self.excel_mgr = self.factory()
+        except Exception as e:
+            self.error = str(e)
+            self.ready_at = time.perf_counter()
+            self.ready.set()
+            self._fail_pending()
+            return
+        self.applied_seq = self.committed_seq
+        if self.replay:
+            # Phát lại các thao tác đã ghi nhật ký nhưng chưa kịp lưu vào workbook
+            try:
+                for record in self.replay:
+                    getattr(self.excel_mgr, record['method'])(*record['args'])
+            except Exception as e:
+                # Giữ nguyên nhật ký (không lưu workbook) và báo lỗi thay vì để luồng nền chết khi chưa sẵn sàng
+                self.error = f'Lỗi phát lại nhật ký {self.journal.path}: {e}'
+                self.failed = True
+                self.excel_mgr.close()
+                self.excel_mgr = None
+                self.ready_at = time.perf_counter()
+                self.ready.set()
+                self._fail_pending()
+                return
+            self.applied_seq = self.replay[-1]['seq']
+            self._commit(self.applied_seq)
+        self.replay = []
+        self.ready_at = time.perf_counter()
+        self.ready.set()
+        deadline = None
+        uncommitted = 0
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                kind, payload = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                self._commit(self.applied_seq)
+                deadline, uncommitted = None, 0
+                continue
+            if kind == 'op':
+                ops = [payload]
+                # Gom luôn các thao tác ghi đang chờ để áp dụng thành một lô
+                following = None
+                while following is None:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item[0] == 'op':
+                        ops.append(item[1])
+                    else:
+                        following = item
+                self._apply(ops)
+                self.applied_seq = ops[-1]['seq']
+                uncommitted += len(ops)
+                if deadline is None:
+                    deadline = time.monotonic() + self.max_delay
+                if uncommitted >= self.max_ops:
+                    self._commit(self.applied_seq)
+                    deadline, uncommitted = None, 0
+                if following is None:
+                    continue
+                kind, payload = following
+            if kind is _STOP:
+                self._commit(self.applied_seq)
+                break
+            if kind == 'call':
+                method, args, future = payload
+                try:
+                    if isinstance(method, str):
+                        result = getattr(self.excel_mgr, method)(*args)
+                    else:
+                        result = method(self.excel_mgr, *args)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            elif kind == 'flush':
+                self._commit(self.applied_seq)
+                deadline, uncommitted = None, 0
+                if self.error:
+                    payload.set_exception(Exception(self.error))
+                else:
+                    payload.set_result(self.applied_seq)
+        try:
+            self.excel_mgr.close()
+        finally:
+            if pythoncom:
+                pythoncom.CoUninitialize()
+
+    def _apply(self, ops):
+        # Các write_rows liên tiếp cùng sheet/cột được gộp qua RowBuffer thành ít lần ghi nhất
+        buffer = None
+        for record in ops:
+            method, args = record['method'], record['args']
+            if method == 'write_rows':
+                sheet_name, row, col, rows = args
+                if buffer is None or (buffer.sheet_name, buffer.start_col) != (sheet_name, col):
+                    self._flush_buffer(buffer)
+                    buffer = RowBuffer(self.excel_mgr, sheet_name, col)
+                for i, values in enumerate(rows):
+                    buffer.stage(row + i, values)
+                continue
+            self._flush_buffer(buffer)
+            buffer = None
+            try:
+                getattr(self.excel_mgr, method)(*args, track=False)
+            except Exception as e:
+                self._apply_failed(e)
+        self._flush_buffer(buffer)
+
+    def _flush_buffer(self, buffer):
+        if buffer is None:
+            return
+        try:
+            for first, block in buffer.runs():
+                self.excel_mgr.write_rows(buffer.sheet_name, first, buffer.start_col, block, track=False)
+        except Exception as e:
+            self._apply_failed(e)
+
+    def _apply_failed(self, error):
+        # Không lưu workbook nữa để nhật ký còn nguyên, lần mở sau sẽ phát lại
+        self.error = f'Lỗi ghi Excel: {error}'
+        self.failed = True
+
+    def _commit(self, applied_seq):
+        if self.failed or applied_seq <= self.committed_seq:
+            return
+        try:
+            self.excel_mgr.save()
+        except Exception as e:
+            self.error = str(e)
+            return
+        with self.lock:
+            self.committed_seq = applied_seq
+            if self.committed_seq == self.seq:
+                # Mọi thao tác đã nằm trong workbook, nhật ký có thể làm rỗng
+                self.journal.truncate()
+            else:
+                self.journal.append({'commit': applied_seq})
+        self.error = None
+
+    def _fail_pending(self):
+        while True:
+            kind, payload = self.queue.get()
+            if kind is _STOP:
+                return
+            if kind == 'call':
+                payload[2].set_exception(Exception(self.error))
+            elif kind == 'flush':
+                payload.set_exception(Exception(self.error))